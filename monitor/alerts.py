@@ -10,6 +10,7 @@ from .whatsapp_utils import (
     send_website_recovered_alert,
     send_heartbeat_missed_alert,
     send_heartbeat_recovered_alert,
+    send_certificate_expiry_alert,
     format_interval
 )
 from django.contrib.contenttypes.models import ContentType
@@ -20,6 +21,7 @@ import logging
 from .email_templates import (
     website_downtime_email,
     website_recovery_email,
+    certificate_expiry_email,
     heartbeat_missed_email,
     heartbeat_recovery_email,
     test_notification_email,
@@ -241,6 +243,14 @@ def send_whatsapp_alert_task(self, phone_number, alert_type, target_data):
                 downtime_duration=target_data['downtime_duration'],
                 recovered_at=target_data['recovered_at']
             )
+        elif alert_type == "website_cert_expiry":
+            send_certificate_expiry_alert(
+                to_number=phone_number,
+                website_name=target_data['name'],
+                website_url=target_data['url'],
+                days_left=target_data['days_left'],
+                expires_at=target_data['expires_at']
+            )
         elif alert_type == "heartbeat_downtime":
             send_heartbeat_missed_alert(
                 to_number=phone_number,
@@ -359,6 +369,32 @@ def handle_alert(target, alert_type):
             notify_users(target, "recovery")
             logger.info(f"[✓] Recovery alert sent for {target}")
 
+    elif alert_type == "cert_expiry":
+        # Sent once per certificate; check_certificate_expiry clears the
+        # alert when the certificate is renewed
+        if Alert.objects.filter(
+            content_type=content_type,
+            object_id=target.id,
+            alert_type="cert_expiry",
+            is_active=True
+        ).exists():
+            return
+
+        Alert.objects.create(
+            content_type=content_type,
+            object_id=target.id,
+            alert_type="cert_expiry",
+            is_active=True,
+            last_sent_at=now()
+        )
+        notify_users(target, "cert_expiry")
+        logger.warning(f"[!] Certificate expiry alert sent for {target}")
+
+
+def certificate_days_left(website):
+    """Whole days until the website's certificate expires (negative once expired)."""
+    return (website.cert_expires_at - now()).days
+
 
 def build_email_alert(target, alert_type):
     """
@@ -397,6 +433,16 @@ def build_email_alert(target, alert_type):
             )
             return subject, html_content
 
+        elif alert_type == "cert_expiry":
+            subject = f"🔒 Certificate expiring: {target.name or target.url}"
+            html_content = certificate_expiry_email(
+                website_name=target.name or target.url,
+                website_url=target.url,
+                days_left=certificate_days_left(target),
+                expires_at=target.cert_expires_at.strftime("%Y-%m-%d %H:%M:%S UTC")
+            )
+            return subject, html_content
+
     elif isinstance(target, HeartBeat):
         if alert_type == "downtime":
             subject = f"💔 Heartbeat MISSED: {target.name}"
@@ -455,6 +501,13 @@ def prepare_whatsapp_data(target, alert_type):
                 'downtime_duration': downtime_duration or "Unknown",
                 'recovered_at': target.last_recovered_at.strftime("%Y-%m-%d %H:%M:%S UTC") if target.last_recovered_at else now().strftime("%Y-%m-%d %H:%M:%S UTC")
             }
+        elif alert_type == "cert_expiry":
+            return {
+                'name': target.name or target.url,
+                'url': target.url,
+                'days_left': certificate_days_left(target),
+                'expires_at': target.cert_expires_at.strftime("%Y-%m-%d %H:%M:%S UTC")
+            }
     
     elif isinstance(target, HeartBeat):
         if alert_type == "downtime":
@@ -501,6 +554,11 @@ def build_slack_message(target, alert_type):
             return f"*🚨 Website DOWN!*\n{target.url}\nTime: {now().strftime('%Y-%m-%d %H:%M:%S UTC')}"
         elif alert_type == "recovery":
             return f"*✅ Website RECOVERED!*\n{target.url}\nTime: {now().strftime('%Y-%m-%d %H:%M:%S UTC')}"
+        elif alert_type == "cert_expiry":
+            return (
+                f"*🔒 Certificate expires in {certificate_days_left(target)} days!*\n{target.url}\n"
+                f"Expires: {target.cert_expires_at.strftime('%Y-%m-%d %H:%M:%S UTC')}"
+            )
 
     elif isinstance(target, HeartBeat):
         if alert_type == "downtime":
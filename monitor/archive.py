@@ -0,0 +1,248 @@
+"""
+Archive of expired check results and ping logs as Parquet files.
+
+With ARCHIVE_EXPIRED_LOGS on, cleanup_old_logs first archives every whole
+UTC day that has expired, then deletes (or drops the partitions of) only
+rows an archive already holds. Each day is streamed from the database with
+a server-side cursor, ordered by website, and written as one zstd-compressed
+Parquet file per website and day:
+
+    check_results/date=2030-06-01/website=42/part-1000-1999.parquet
+    ping_logs/date=2030-06-01/heartbeat=7/part-5000-5099.parquet
+
+Files go to a Django storage backend (ARCHIVE_STORAGE, the local filesystem
+under ARCHIVE_ROOT by default), so any backend with save / open / listdir,
+e.g. django-storages' S3Storage, works unchanged. Part names carry the ids
+they hold, so re-archiving a day after a crash writes the same files again.
+
+`archived_uptime` answers "uptime of website X from Y to Z" from the files
+alone, long after the rows are gone.
+"""
+
+import io
+import time
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from monitor.models import Checkpoint, ErrorMessage, PingLog, UptimeCheckResult
+from monitor.rollups import Aggregate
+
+logger = logging.getLogger('monitor')
+
+# Archived models: (directory, the column rows belong to a day by, the column they are filed under)
+ARCHIVES = {
+    UptimeCheckResult: ("check_results", "checked_at", "website"),
+    PingLog: ("ping_logs", "timestamp", "heartbeat"),
+}
+
+
+def archive_enabled():
+    return getattr(settings, "ARCHIVE_EXPIRED_LOGS", False)
+
+
+def archive_storage():
+    """The storage backend archives are written to (see ARCHIVE_STORAGE)."""
+    config = getattr(settings, "ARCHIVE_STORAGE", None) or {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+        "OPTIONS": {"location": getattr(settings, "ARCHIVE_ROOT", "archive")},
+    }
+    return import_string(config["BACKEND"])(**config.get("OPTIONS", {}))
+
+
+def _arrow_type(field):
+    if isinstance(field, models.DateTimeField):
+        return pa.timestamp("us", tz="UTC")
+    if isinstance(field, (models.AutoField, models.ForeignKey, models.IntegerField)):
+        return pa.int64()
+    if isinstance(field, models.FloatField):
+        return pa.float64()
+    if isinstance(field, models.BooleanField):
+        return pa.bool_()
+    return pa.string()
+
+
+def _is_error(field):
+    return isinstance(field, models.ForeignKey) and field.related_model is ErrorMessage
+
+
+def arrow_schema(model):
+    """
+    Parquet schema of `model`'s archived rows: every concrete column, with
+    error messages as their text so the files stand alone.
+    """
+    return pa.schema([
+        ("error_message", pa.string()) if _is_error(field) else (field.attname, _arrow_type(field))
+        for field in model._meta.concrete_fields
+    ])
+
+
+def _archived_values(model):
+    """values() arguments that fetch the columns of arrow_schema(model)."""
+    columns, expressions = [], {}
+    for field in model._meta.concrete_fields:
+        if _is_error(field):
+            expressions["error_message"] = Coalesce(
+                f"{field.name}__message", Value(""), output_field=models.TextField()
+            )
+        else:
+            columns.append(field.attname)
+    return columns, expressions
+
+
+def day_directory(model, day):
+    return f"{ARCHIVES[model][0]}/date={day:%Y-%m-%d}"
+
+
+def owner_directory(model, day, owner_id):
+    return f"{day_directory(model, day)}/{ARCHIVES[model][2]}={owner_id}"
+
+
+def _write(storage, model, day, owner_id, rows, schema):
+    ids = [row["id"] for row in rows]
+    path = f"{owner_directory(model, day, owner_id)}/part-{min(ids)}-{max(ids)}.parquet"
+    if storage.exists(path):
+        return path
+
+    buffer = io.BytesIO()
+    pq.write_table(pa.Table.from_pylist(rows, schema=schema), buffer, compression="zstd")
+    storage.save(path, ContentFile(buffer.getvalue()))
+    return path
+
+
+def archive_day(model, day, storage=None, chunk_size=2000):
+    """
+    Write `model`'s rows of the UTC day starting at `day` to the archive,
+    one file per website (or heartbeat). Returns (rows, files) written.
+    """
+    storage = storage or archive_storage()
+    _, column, owner = ARCHIVES[model]
+    owner_column = model._meta.get_field(owner).attname
+    schema = arrow_schema(model)
+    columns, expressions = _archived_values(model)
+
+    rows = model.objects.filter(**{
+        f"{column}__gte": day, f"{column}__lt": day + timedelta(days=1),
+    }).order_by(owner_column, column).values(*columns, **expressions)
+
+    archived = files = 0
+    batch = []
+    # Server-side cursor on PostgreSQL: one owner's rows in memory at a time
+    for row in rows.iterator(chunk_size=chunk_size):
+        if batch and row[owner_column] != batch[0][owner_column]:
+            _write(storage, model, day, batch[0][owner_column], batch, schema)
+            archived, files = archived + len(batch), files + 1
+            batch = []
+        batch.append(row)
+    if batch:
+        _write(storage, model, day, batch[0][owner_column], batch, schema)
+        archived, files = archived + len(batch), files + 1
+    return archived, files
+
+
+def checkpoint_name(model):
+    return f"archive:{model._meta.db_table}"
+
+
+def archived_until(model):
+    """Rows of `model` before this moment are archived (None if none are)."""
+    checkpoint = Checkpoint.objects.filter(name=checkpoint_name(model)).first()
+    until = checkpoint.position.get("archived_until") if checkpoint else None
+    return datetime.fromisoformat(until) if until else None
+
+
+def archive_expired(model, cutoff, storage=None, deadline=None):
+    """
+    Archive every whole UTC day of `model`'s rows that ended by `cutoff` and
+    is not archived yet, stopping between days once `deadline` (a
+    time.monotonic() value) passes. Returns the number of rows archived.
+    """
+    storage = storage or archive_storage()
+    _, column, _ = ARCHIVES[model]
+    last_day = cutoff.astimezone(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    day = archived_until(model)
+    if day is None:
+        # The oldest row by id is about the oldest by time; start a day early
+        oldest = model.objects.order_by('pk').values_list(column, flat=True).first()
+        if oldest is None:
+            return 0
+        day = min(oldest, last_day).astimezone(dt_timezone.utc).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        ) - timedelta(days=1)
+
+    checkpoint, _ = Checkpoint.objects.get_or_create(name=checkpoint_name(model))
+    total = 0
+    while day < last_day and (deadline is None or time.monotonic() < deadline):
+        rows, files = archive_day(model, day, storage)
+        total += rows
+        day += timedelta(days=1)
+        checkpoint.position = {"archived_until": day.isoformat()}
+        checkpoint.save(update_fields=["position", "updated_at"])
+        if rows:
+            logger.info(
+                f"Archived {rows} {model._meta.db_table} rows of "
+                f"{day - timedelta(days=1):%Y-%m-%d} in {files} files"
+            )
+    return total
+
+
+def _part_names(storage, directory):
+    """
+    Parquet files in `directory`. Object stores have no directories, and
+    S3Storage.exists() is False for a key prefix, so listdir is asked
+    directly; a missing directory lists nothing (or raises on a filesystem).
+    """
+    try:
+        return [name for name in storage.listdir(directory)[1] if name.endswith(".parquet")]
+    except FileNotFoundError:
+        return []
+
+
+def read_archive(model, owner_id, start, end, columns=None, storage=None):
+    """Archived rows of one website (or heartbeat) from start to end, as a pyarrow Table."""
+    storage = storage or archive_storage()
+    _, column, _ = ARCHIVES[model]
+    schema = arrow_schema(model)
+    if columns is not None:
+        schema = pa.schema([schema.field(name) for name in dict.fromkeys([column, *columns])])
+
+    tables = []
+    day = start.astimezone(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    while day < end:
+        directory = owner_directory(model, day, owner_id)
+        for name in sorted(_part_names(storage, directory)):
+            with storage.open(f"{directory}/{name}") as f:
+                # Unsafe: files from before 0020 hold fractional response times
+                tables.append(pq.read_table(f, columns=schema.names).cast(schema, safe=False))
+        day += timedelta(days=1)
+
+    table = pa.concat_tables(tables) if tables else schema.empty_table()
+    moments = table.column(column).to_pylist()
+    keep = [start <= moment < end for moment in moments]
+    return table.filter(pa.array(keep, type=pa.bool_()))
+
+
+def archived_uptime(website_id, start, end=None, storage=None):
+    """Checks, uptime and response times of a website from start to end, from the archive."""
+    end = end or timezone.now()
+    table = read_archive(
+        UptimeCheckResult, website_id, start, end,
+        columns=["status_code", "error_message", "response_time_ms"], storage=storage,
+    )
+    aggregate = Aggregate()
+    for status_code, error_message, ms in zip(
+        table.column("status_code").to_pylist(),
+        table.column("error_message").to_pylist(),
+        table.column("response_time_ms").to_pylist(),
+    ):
+        # Same rule as rollups.PASSED_CHECK
+        aggregate.add(200 <= status_code < 300 and not error_message, ms)
+    return aggregate
@@ -0,0 +1,115 @@
+"""
+Per host:port cache of TLS certificate metadata.
+
+Certificate expiry alerts need the certificate of every https:// and tls://
+monitor, but a handshake per check just to read it would be wasted work:
+most checks reuse a pooled connection. Instead both engines read the peer
+certificate whenever a check opens a new TLS connection, which it has just
+verified anyway, and store it here for CHECK_CERT_CACHE_TTL_SECONDS. Pooled
+connections are recycled every CHECK_POOL_MAX_AGE_SECONDS, so an active host
+is seen again well within the TTL.
+
+`check_certificate_expiry` reads the cache once a day and only handshakes
+with the hosts missing from it. Without Redis, or on a Redis error, nothing
+is cached and the daily task handshakes with every host itself.
+"""
+
+import json
+import socket
+import ssl
+import logging
+from datetime import datetime, timezone as dt_timezone
+from urllib.parse import urlparse
+import redis
+from django.conf import settings
+from monitor import redis_utils
+
+logger = logging.getLogger('monitor')
+
+CERT_KEY = "tlscert:{}:{}"
+
+TLS_SCHEMES = {"https": 443, "tls": None}
+
+
+def cert_target(url):
+    """(host, port) whose certificate a monitor of `url` sees, or None without TLS."""
+    parsed = urlparse(url)
+    scheme = parsed.scheme.lower()
+    if scheme not in TLS_SCHEMES or not parsed.hostname:
+        return None
+    return parsed.hostname.lower(), parsed.port or TLS_SCHEMES[scheme]
+
+
+def _name(rdns, attribute):
+    """First `attribute` (e.g. commonName) of a getpeercert() subject / issuer."""
+    for rdn in rdns or ():
+        for key, value in rdn:
+            if key == attribute:
+                return value
+    return ""
+
+
+def certificate_metadata(ssl_object):
+    """Expiry, subject and issuer of a verified peer certificate, or None."""
+    cert = ssl_object.getpeercert() if ssl_object is not None else None
+    if not cert or "notAfter" not in cert:
+        return None
+    not_after = datetime.fromtimestamp(
+        ssl.cert_time_to_seconds(cert["notAfter"]), tz=dt_timezone.utc
+    )
+    issuer = cert.get("issuer")
+    return {
+        "not_after": not_after.isoformat(),
+        "subject": _name(cert.get("subject"), "commonName"),
+        "issuer": _name(issuer, "organizationName") or _name(issuer, "commonName"),
+    }
+
+
+def certificate_expiry(metadata):
+    """notAfter of cached certificate metadata as an aware datetime."""
+    if not metadata:
+        return None
+    return datetime.fromisoformat(metadata["not_after"])
+
+
+def cache_ttl():
+    return getattr(settings, "CHECK_CERT_CACHE_TTL_SECONDS", 2 * 24 * 3600)
+
+
+def remember_certificate(target, ssl_object):
+    """
+    Cache the certificate of a new TLS connection to `target` (host, port).
+    Returns its metadata, or None if the connection had no certificate.
+    """
+    metadata = certificate_metadata(ssl_object)
+    if target is None or metadata is None or redis_utils.r is None:
+        return metadata
+    try:
+        redis_utils.r.set(CERT_KEY.format(*target), json.dumps(metadata), ex=cache_ttl())
+    except redis.RedisError as e:
+        logger.error(f"Redis error caching certificate of {target[0]}:{target[1]}: {e}")
+    return metadata
+
+
+def cached_certificate(host, port):
+    """Cached metadata of host:port's certificate, or None."""
+    if redis_utils.r is None:
+        return None
+    try:
+        cached = redis_utils.r.get(CERT_KEY.format(host, port))
+    except redis.RedisError as e:
+        logger.error(f"Redis error reading certificate of {host}:{port}: {e}")
+        return None
+    return json.loads(cached) if cached else None
+
+
+def fetch_certificate(host, port, timeout=5):
+    """Handshake with host:port to read its certificate. None if that fails."""
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            context = ssl.create_default_context()
+            with context.wrap_socket(sock, server_hostname=host) as tls_sock:
+                return remember_certificate((host, port), tls_sock)
+    except OSError as e:  # includes ssl.SSLError
+        logger.warning(f"Could not read the certificate of {host}:{port}: {e}")
+        return None
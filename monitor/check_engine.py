@@ -0,0 +1,196 @@
+"""
+Asyncio batch check engine.
+
+The legacy engine runs one Celery task per website and blocks a prefork
+slot on `requests.get` for the whole round trip. This engine takes a batch
+of websites and probes them concurrently inside a single event loop, so one
+worker slot can keep hundreds of checks in flight. tcp:// and tls://
+monitors get a bare connect / TLS handshake instead (see socket_checks).
+
+Only the network I/O happens inside the loop. Loading websites, saving
+results and alerting stay synchronous in the calling task. The loop and its
+connection pool live for the whole worker process (see http_pool).
+"""
+
+import asyncio
+import time
+import logging
+import aiohttp
+from django.conf import settings
+from .utils import BODY_CHUNK_BYTES, KeywordMatcher, ProbeResult, failure_message
+from .http_pool import CheckTrace, get_async_session, get_resolver, run_in_worker_loop
+from .helpers import track_website_check
+from .dns_cache import bypass_dns_cache
+from .host_limiter import HostLimiter
+from .socket_checks import probe_socket
+from .cert_cache import cert_target, certificate_expiry, remember_certificate
+
+logger = logging.getLogger('monitor')
+
+DEFAULT_BATCH_CONCURRENCY = 100
+
+
+def _peer_ip(response):
+    """IP address the response actually came from."""
+    # A small body is buffered and its connection released right away, but
+    # the protocol (and its transport) stays attached to the response.
+    protocol = getattr(response, "_protocol", None)
+    transport = getattr(protocol, "transport", None)
+    if transport is None:
+        return None
+    peer = transport.get_extra_info("peername")
+    return peer[0] if peer else None
+
+
+def _note_certificate(website, response):
+    """
+    Cache the certificate of the new TLS connection a response came over.
+    Returns its expiry if it is the website's own certificate (not that of
+    a host it redirected to).
+    """
+    target = cert_target(str(response.url))
+    if target is None:
+        return None
+    transport = getattr(getattr(response, "_protocol", None), "transport", None)
+    if transport is None:
+        return None
+    metadata = remember_certificate(target, transport.get_extra_info("ssl_object"))
+    return certificate_expiry(metadata) if target == cert_target(website.url) else None
+
+
+async def read_body_capped(response, max_bytes, matcher=None):
+    """
+    Stream at most `max_bytes` of the response body, chunk by chunk, stopping
+    early once `matcher` has decided. The session's total timeout bounds the
+    read. Returns the bytes read.
+    """
+    read = 0
+    while read < max_bytes:
+        chunk = await response.content.read(min(BODY_CHUNK_BYTES, max_bytes - read))
+        if not chunk:
+            break
+        read += len(chunk)
+        if matcher is not None and matcher.feed(chunk):
+            break
+    return read
+
+
+async def _request(session, website):
+    """HTTP check of a website, honouring its own timeout and DNS cache switch."""
+    timeout = aiohttp.ClientTimeout(total=website.timeout_ms / 1000)
+    trace = CheckTrace()
+    matcher = KeywordMatcher.for_website(website)
+    timings = {}
+    ip = None
+    cert_expires_at = None
+
+    # Each probe runs in its own task, so this only affects this website
+    bypass_dns_cache.set(not website.use_dns_cache)
+
+    start = time.perf_counter()
+    error_message = ""
+    try:
+        async with session.request(
+            "HEAD" if website.request_method == "HEAD" else "GET",
+            website.url,
+            timeout=timeout,
+            trace_request_ctx=trace
+        ) as response:
+            headers_at = time.perf_counter()
+            status_code = response.status
+            ip = _peer_ip(response)
+            if trace.connection_reused is False:
+                # Only a new connection has just been through a handshake
+                cert_expires_at = _note_certificate(website, response)
+            if website.request_method == "GET_CAPPED":
+                await read_body_capped(response, website.max_body_bytes, matcher)
+            # Leaving the block with body left unread closes the
+            # connection instead of downloading the rest
+            timings = trace.phase_timings(
+                response, headers_at, time.perf_counter()
+            )
+        if matcher is not None:
+            error_message = matcher.error_message
+    except asyncio.TimeoutError:
+        status_code = 0  # 0 = failed to connect
+        error_message = f"Timed out after {website.timeout_ms}ms"
+    except aiohttp.ClientError as e:
+        status_code = 0
+        error_message = failure_message(e)
+
+    return ProbeResult(
+        status_code=status_code,
+        response_time_ms=round((time.perf_counter() - start) * 1000, 2),
+        error_message=error_message,
+        connection_reused=trace.connection_reused,
+        ip=ip,
+        timings=timings,
+        cert_expires_at=cert_expires_at,
+    )
+
+
+async def _probe_website(session, semaphore, limiter, website):
+    """Probe a single website: HTTP, or TCP / TLS for tcp:// and tls:// URLs."""
+    with track_website_check(website.id, website.name or website.url) as tracker:
+        # Wait for the host's shared budget before taking a slot of our own
+        async with limiter.limit_async(website.url):
+            queued_at = time.perf_counter()
+            async with semaphore:
+                start = time.perf_counter()
+                if website.monitor_type == "http":
+                    result = await _request(session, website)
+                else:
+                    result = await probe_socket(website, get_resolver())
+
+        # Time spent waiting for a free slot shows when this worker is saturated
+        tracker.record_phases(result.timings, queue=start - queued_at)
+        if result.failure_reason:
+            tracker.record_failure(result.failure_reason)
+        else:
+            tracker.record_success(result.response_time_ms / 1000, result.status_code)
+
+    return result
+
+
+async def _probe_all(websites, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = HostLimiter()
+    session = await get_async_session()
+    results = await asyncio.gather(
+        *(_probe_website(session, semaphore, limiter, website) for website in websites),
+        return_exceptions=True
+    )
+
+    probed = {}
+    for website, result in zip(websites, results):
+        if isinstance(result, BaseException):
+            logger.error(
+                f"[!] Unexpected error checking {website.url}: {result}",
+                exc_info=result
+            )
+            result = ProbeResult(
+                status_code=0,
+                response_time_ms=0,
+                error_message=failure_message(result),
+            )
+        probed[website.id] = result
+    return probed
+
+
+def probe_websites(websites, concurrency=None):
+    """
+    Probe a batch of websites concurrently.
+
+    Returns a dict mapping website id -> ProbeResult. At most `concurrency`
+    requests are in flight at once (CHECK_BATCH_CONCURRENCY by default).
+    """
+    if concurrency is None:
+        concurrency = getattr(
+            settings, "CHECK_BATCH_CONCURRENCY", DEFAULT_BATCH_CONCURRENCY
+        )
+
+    websites = list(websites)
+    if not websites:
+        return {}
+
+    return run_in_worker_loop(_probe_all(websites, concurrency))
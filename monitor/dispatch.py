@@ -0,0 +1,69 @@
+"""
+Bulk publishing for the periodic dispatchers.
+
+`check_due_websites` and `check_due_heartbeats` used to call `.delay()` once
+per due row, acquiring a broker connection for every message. All messages
+of one dispatcher run now go out over a single producer, and in "chunked"
+mode (CHECK_DISPATCH_MODE) only one message per CHECK_DISPATCH_CHUNK_SIZE
+monitors is published; chunk tasks fan out or process the rest on workers.
+
+Every run reports its duration and item count to Prometheus.
+"""
+
+import time
+from contextlib import contextmanager
+from celery import current_app
+from django.conf import settings
+from monitor.helpers import record_dispatch
+
+
+def dispatch_mode():
+    return getattr(settings, "CHECK_DISPATCH_MODE", "single")
+
+
+def dispatch_chunk_size():
+    return getattr(settings, "CHECK_DISPATCH_CHUNK_SIZE", 500)
+
+
+def chunked(items, size):
+    """Yield lists of at most `size` items."""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Dispatch:
+    """One dispatcher run: publishes tasks over a shared producer."""
+
+    def __init__(self, monitor_type, producer):
+        self.monitor_type = monitor_type
+        self.producer = producer
+        self.items = 0
+        self.messages = 0
+        self.duration = 0.0
+
+    def send(self, task, args, items=1, **options):
+        """Publish `task` carrying `items` monitors."""
+        task.apply_async(args, producer=self.producer, **options)
+        self.items += items
+        self.messages += 1
+
+
+@contextmanager
+def bulk_dispatch(monitor_type):
+    """
+    Publish every task of a dispatcher run over one broker connection and
+    record how long the run took and how many monitors it queued.
+    """
+    started = time.perf_counter()
+    with current_app.producer_or_acquire() as producer:
+        dispatch = Dispatch(monitor_type, producer)
+        yield dispatch
+
+    dispatch.duration = time.perf_counter() - started
+    record_dispatch(monitor_type, dispatch.duration, dispatch.items)
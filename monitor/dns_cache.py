@@ -0,0 +1,194 @@
+"""
+TTL-aware DNS cache for the async check engine.
+
+Thousands of monitors point at the same handful of hostnames, so every
+worker keeps one bounded cache of resolved addresses:
+
+- positive answers live for the record TTL (clamped to
+  CHECK_DNS_MIN_TTL..CHECK_DNS_MAX_TTL),
+- failed lookups (NXDOMAIN, no records) are cached for CHECK_DNS_NEGATIVE_TTL,
+- at most CHECK_DNS_CACHE_MAX_ENTRIES hostnames are kept (least recently
+  used are evicted first),
+- concurrent lookups for the same hostname share one query.
+
+Monitors with `use_dns_cache=False` bypass the cache, so the lookup time
+counts as part of their check.
+"""
+
+import asyncio
+import contextvars
+import socket
+import time
+import ipaddress
+import logging
+from collections import OrderedDict
+import dns.asyncresolver
+import dns.exception
+import dns.resolver
+from aiohttp.abc import AbstractResolver
+from django.conf import settings
+
+logger = logging.getLogger('monitor')
+
+# Set per check by the engine; resolver lookups in that task skip the cache
+bypass_dns_cache = contextvars.ContextVar("bypass_dns_cache", default=False)
+
+
+class DNSLookupError(OSError):
+    """Raised when a hostname has no usable address (possibly from the negative cache)."""
+
+
+class DNSCache:
+    """Bounded LRU cache of hostname -> addresses, expiring by record TTL."""
+
+    def __init__(self, max_entries=10000, min_ttl=5, max_ttl=3600, negative_ttl=60):
+        self.max_entries = max_entries
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        # host -> (expires_at, addresses, family); addresses is None for a negative entry
+        self._entries = OrderedDict()
+
+    def get(self, host):
+        """Return the cached (addresses, family) for `host`, or None on a miss."""
+        entry = self._entries.get(host)
+        if entry is None:
+            return None
+
+        expires_at, addresses, family = entry
+        if expires_at <= time.monotonic():
+            del self._entries[host]
+            return None
+
+        self._entries.move_to_end(host)
+        return addresses, family
+
+    def set(self, host, addresses, family, ttl):
+        ttl = min(max(ttl, self.min_ttl), self.max_ttl)
+        self._entries[host] = (time.monotonic() + ttl, addresses, family)
+        self._entries.move_to_end(host)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def set_negative(self, host):
+        self._entries[host] = (time.monotonic() + self.negative_ttl, None, None)
+        self._entries.move_to_end(host)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CachingResolver(AbstractResolver):
+    """aiohttp resolver that answers from a DNSCache and honours record TTLs."""
+
+    def __init__(self, cache, timeout=5):
+        self.cache = cache
+        self._resolver = dns.asyncresolver.Resolver()
+        self._resolver.lifetime = timeout
+        self._inflight = {}
+
+    async def _query(self, host):
+        """
+        Look up A, then AAAA records, then fall back to the system resolver.
+        Returns (addresses, family, ttl).
+        """
+        for rdtype, family in (("A", socket.AF_INET), ("AAAA", socket.AF_INET6)):
+            try:
+                answer = await self._resolver.resolve(host, rdtype)
+            except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
+                continue
+            return [record.address for record in answer], family, answer.rrset.ttl
+
+        # Names only known to the system resolver (/etc/hosts, search domains).
+        # These carry no TTL, so they are kept for the minimum TTL only.
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(
+                host, None, type=socket.SOCK_STREAM
+            )
+        except socket.gaierror:
+            return None, None, None
+        family = infos[0][0]
+        addresses = [info[4][0] for info in infos if info[0] == family]
+        return list(dict.fromkeys(addresses)), family, self.cache.min_ttl
+
+    async def _lookup(self, host):
+        try:
+            addresses, family, ttl = await self._query(host)
+        except dns.exception.DNSException as e:
+            # Timeouts and server failures are not cached
+            raise DNSLookupError(f"DNS lookup failed for {host}: {e}")
+
+        if not addresses:
+            self.cache.set_negative(host)
+            raise DNSLookupError(f"DNS lookup failed for {host}: no A/AAAA records")
+
+        self.cache.set(host, addresses, family, ttl)
+        return addresses, family
+
+    async def resolve_addresses(self, host):
+        """Return (addresses, family) for `host`, from the cache when allowed."""
+        if bypass_dns_cache.get():
+            return await self._lookup(host)
+
+        cached = self.cache.get(host)
+        if cached is not None:
+            addresses, family = cached
+            if addresses is None:
+                raise DNSLookupError(f"DNS lookup failed for {host} (cached)")
+            return addresses, family
+
+        # Share one query between concurrent checks of the same host
+        pending = self._inflight.get(host)
+        if pending is None:
+            pending = asyncio.ensure_future(self._lookup(host))
+            self._inflight[host] = pending
+            pending.add_done_callback(lambda _: self._inflight.pop(host, None))
+        return await asyncio.shield(pending)
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        try:
+            ipaddress.ip_address(host)
+            return [_resolve_result(host, host, port, family)]
+        except ValueError:
+            pass
+
+        addresses, address_family = await self.resolve_addresses(host)
+        return [
+            _resolve_result(host, address, port, address_family)
+            for address in addresses
+        ]
+
+    async def close(self):
+        pass
+
+
+def _resolve_result(hostname, address, port, family):
+    return {
+        "hostname": hostname,
+        "host": address,
+        "port": port,
+        "family": family,
+        "proto": 0,
+        "flags": socket.AI_NUMERICHOST,
+    }
+
+
+_dns_cache = None
+
+
+def get_dns_cache():
+    """Return this worker's shared DNS cache."""
+    global _dns_cache
+    if _dns_cache is None:
+        _dns_cache = DNSCache(
+            max_entries=getattr(settings, "CHECK_DNS_CACHE_MAX_ENTRIES", 10000),
+            min_ttl=getattr(settings, "CHECK_DNS_MIN_TTL", 5),
+            max_ttl=getattr(settings, "CHECK_DNS_MAX_TTL", 3600),
+            negative_ttl=getattr(settings, "CHECK_DNS_NEGATIVE_TTL", 60),
+        )
+    return _dns_cache
@@ -201,6 +201,64 @@ def website_recovery_email(website_name, website_url, downtime_duration, recover
     return get_base_template(content)
 
 
+def certificate_expiry_email(website_name, website_url, days_left, expires_at):
+    """Email template for TLS certificate expiry warning"""
+    content = f"""
+    <div style="padding: 40px 30px;">
+        <!-- Warning Badge -->
+        <div style="text-align: center; margin-bottom: 30px;">
+            <div style="display: inline-block; background: rgba(251, 191, 36, 0.1); border: 2px solid #fbbf24; border-radius: 50%; padding: 20px;">
+                <span style="font-size: 48px;">🔒</span>
+            </div>
+        </div>
+        
+        <!-- Main Message -->
+        <h2 style="color: #fbbf24; text-align: center; margin: 0 0 10px 0; font-size: 28px; font-weight: 700;">
+            Certificate expires in {days_left} days
+        </h2>
+        <p style="color: #94a3b8; text-align: center; font-size: 15px; margin: 0 0 30px 0;">
+            Renew it before visitors start seeing security warnings
+        </p>
+        
+        <!-- Details Card -->
+        <div style="background: rgba(15, 23, 42, 0.6); border: 1px solid #334155; border-radius: 12px; padding: 25px; margin-bottom: 25px;">
+            <div style="margin-bottom: 20px;">
+                <p style="color: #64748b; font-size: 12px; text-transform: uppercase; letter-spacing: 0.5px; margin: 0 0 8px 0;">MONITOR NAME</p>
+                <p style="color: #ffffff; font-size: 18px; font-weight: 600; margin: 0;">{website_name}</p>
+            </div>
+            
+            <div style="margin-bottom: 20px;">
+                <p style="color: #64748b; font-size: 12px; text-transform: uppercase; letter-spacing: 0.5px; margin: 0 0 8px 0;">URL</p>
+                <p style="color: #3b82f6; font-size: 14px; margin: 0; word-break: break-all;">
+                    <a href="{website_url}" style="color: #3b82f6; text-decoration: none;">{website_url}</a>
+                </p>
+            </div>
+            
+            <div>
+                <p style="color: #64748b; font-size: 12px; text-transform: uppercase; letter-spacing: 0.5px; margin: 0 0 8px 0;">EXPIRES AT</p>
+                <p style="color: #e2e8f0; font-size: 14px; margin: 0;">🕒 {expires_at}</p>
+            </div>
+        </div>
+        
+        <!-- Action Button -->
+        <div style="text-align: center; margin-bottom: 20px;">
+            <a href="https://alivechecks.com/dashboard" style="display: inline-block; background: #fbbf24; color: #0f172a; padding: 14px 32px; border-radius: 10px; text-decoration: none; font-weight: 600; font-size: 15px; box-shadow: 0 4px 6px -1px rgba(251, 191, 36, 0.3);">
+                View Details →
+            </a>
+        </div>
+        
+        <!-- Info Box -->
+        <div style="background: rgba(251, 191, 36, 0.05); border-left: 3px solid #fbbf24; padding: 15px 20px; border-radius: 6px;">
+            <p style="color: #94a3b8; font-size: 13px; margin: 0; line-height: 1.6;">
+                <strong style="color: #e2e8f0;">We'll only tell you once</strong><br>
+                This alert clears itself once we see the renewed certificate.
+            </p>
+        </div>
+    </div>
+    """
+    return get_base_template(content)
+
+
 # ============================================
 # HEARTBEAT MONITORING EMAILS
 # ============================================
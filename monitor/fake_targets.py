@@ -0,0 +1,197 @@
+"""
+Local fleet of fake targets for load-testing the check engines.
+
+One threaded HTTP server on 127.0.0.1 plays every kind of site a monitor
+can meet, by path:
+
+    /ok        200 with a small body
+    /slow      200 after `slow_ms`
+    /hang      reads the request and never answers, so the check times out
+    /redirect  302 to /ok
+    /error     503
+
+A second server answers the same paths over HTTPS with a throwaway
+self-signed certificate ("tls" targets). Checks only trust it when the
+process running them points REQUESTS_CA_BUNDLE and SSL_CERT_FILE at
+`ca_file` (aiohttp reads SSL_CERT_FILE once, when it is imported);
+otherwise TLS checks still do the handshake but fail to verify.
+"""
+
+import datetime
+import ipaddress
+import os
+import ssl
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+KINDS = ("ok", "slow", "hang", "tls", "redirect", "error")
+DEFAULT_MIX = "ok=70,slow=10,hang=5,tls=5,redirect=5,error=5"
+
+
+def parse_mix(mix):
+    """{kind: weight} from "ok=70,slow=10,..."."""
+    weights = {}
+    for part in mix.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in KINDS:
+            raise ValueError(f"Unknown target kind {kind!r}, expected one of {', '.join(KINDS)}")
+        weights[kind] = int(weight or 1)
+    return weights
+
+
+class FakeTargetServer(ThreadingHTTPServer):
+    daemon_threads = True
+    block_on_close = False  # don't wait for hanging requests
+    request_queue_size = 1024  # a whole batch connects at once
+
+
+class FakeTargetHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like most real sites
+
+    def respond(self, send_body=True):
+        path = self.path.partition("?")[0].strip("/")
+        if path == "hang":
+            # Hold the connection until the checker gives up
+            time.sleep(self.server.hang_seconds)
+            self.close_connection = True
+            return
+        if path == "slow":
+            time.sleep(self.server.slow_ms / 1000)
+
+        status = {"redirect": 302, "error": 503}.get(path, 200)
+        body = b"ok" if status == 200 else b""
+        self.send_response(status)
+        if status == 302:
+            self.send_header("Location", "/ok")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self.respond()
+
+    def do_HEAD(self):
+        self.respond(send_body=False)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _self_signed_certificate(directory):
+    """Write a certificate for 127.0.0.1 / localhost and its key; return both paths."""
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=5))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([
+            x509.DNSName("localhost"),
+            x509.IPAddress(ipaddress.ip_address("127.0.0.1")),
+        ]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+
+    cert_file = os.path.join(directory, "fake-targets.crt")
+    key_file = os.path.join(directory, "fake-targets.key")
+    with open(cert_file, "wb") as f:
+        f.write(certificate.public_bytes(serialization.Encoding.PEM))
+    with open(key_file, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ))
+    return cert_file, key_file
+
+
+class FakeTargetFleet:
+    """
+    Starts the fake target servers; use as a context manager.
+
+        with FakeTargetFleet(slow_ms=500) as fleet:
+            urls = fleet.urls(1000, parse_mix(DEFAULT_MIX))
+    """
+
+    def __init__(self, slow_ms=500, hang_seconds=30, tls=True):
+        self.slow_ms = slow_ms
+        self.hang_seconds = hang_seconds
+        self.tls = tls
+        self.http = None
+        self.https = None
+        self.ca_file = None
+        self._directory = None
+
+    def _serve(self, ssl_context=None):
+        server = FakeTargetServer(("127.0.0.1", 0), FakeTargetHandler)
+        server.slow_ms = self.slow_ms
+        server.hang_seconds = self.hang_seconds
+        if ssl_context is not None:
+            # Handshake in the request's thread, not the accept loop
+            server.socket = ssl_context.wrap_socket(
+                server.socket, server_side=True, do_handshake_on_connect=False
+            )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def start(self):
+        self.http = self._serve()
+        if self.tls:
+            self._directory = tempfile.TemporaryDirectory()
+            self.ca_file, key_file = _self_signed_certificate(self._directory.name)
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(self.ca_file, key_file)
+            self.https = self._serve(context)
+        return self
+
+    def stop(self):
+        for server in (self.http, self.https):
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+        if self._directory is not None:
+            self._directory.cleanup()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def url(self, kind, site=None):
+        """URL of a `kind` target; `site` makes it unique to one monitor."""
+        if kind == "tls":
+            base = f"https://127.0.0.1:{self.https.server_address[1]}/ok"
+        else:
+            base = f"http://127.0.0.1:{self.http.server_address[1]}/{kind}"
+        return base if site is None else f"{base}?site={site}"
+
+    def urls(self, count, weights, unique=True):
+        """
+        `count` (kind, url) pairs spread over the kinds by weight. With
+        `unique`, every URL is distinct so no two monitors share a probe.
+        """
+        total = sum(weights.values())
+        kinds = []
+        for kind, weight in weights.items():
+            kinds += [kind] * round(count * weight / total)
+        # Rounding can leave a few short or over
+        kinds = (kinds + [next(iter(weights))] * count)[:count]
+        return [
+            (kind, self.url(kind, site if unique else None))
+            for site, kind in enumerate(kinds)
+        ]
@@ -21,6 +21,7 @@ def track_website_check(monitor_id: str, monitor_name: str):
         with track_website_check(website.id, website.name) as tracker:
             response = requests.get(website.url)
             tracker.record_success(response.elapsed.total_seconds(), response.status_code)
+            tracker.record_phases({'ttfb': 120, 'download': 30})
     """
     start_time = time.time()
     
@@ -56,6 +57,21 @@ def track_website_check(monitor_id: str, monitor_name: str):
                 monitor_id=str(monitor_id),
                 monitor_name=monitor_name
             ).observe(duration)
+
+        def record_phases(self, timings: dict, queue: float = None):
+            """
+            Record per-phase timings (milliseconds, None = phase not run)
+            plus the seconds the check waited for a free worker slot.
+            """
+            for phase, ms in timings.items():
+                if ms is not None:
+                    metrics.website_check_phase_seconds.labels(
+                        phase=phase
+                    ).observe(ms / 1000)
+            if queue is not None:
+                metrics.website_check_phase_seconds.labels(
+                    phase='queue'
+                ).observe(queue)
     
     tracker = Tracker()
     try:
@@ -342,6 +358,67 @@ def get_redis_queue_length(redis_client, queue_name='celery'):
         raise
 
 
+def record_dispatch(monitor_type: str, duration_seconds: float, count: int):
+    """Record one dispatcher run and how many monitors it queued."""
+    metrics.dispatch_duration_seconds.labels(
+        monitor_type=monitor_type
+    ).observe(duration_seconds)
+    metrics.dispatched_monitors_total.labels(
+        monitor_type=monitor_type
+    ).inc(count)
+
+
+def record_reclaimed_leases(count: int):
+    """Record website checks reclaimed after their lease expired."""
+    metrics.check_leases_reclaimed_total.inc(count)
+
+
+def update_owned_shards(node: str, count: int):
+    """Update how many shards a scheduler node owns."""
+    metrics.scheduler_owned_shards.labels(node=node).set(count)
+
+
+def record_shared_probes(count: int):
+    """Record website checks that reused another monitor's probe."""
+    metrics.check_probes_shared_total.inc(count)
+
+
+def record_host_throttle(waited_seconds: float):
+    """Record a website check that had to wait for its host's budget."""
+    metrics.check_host_throttled_total.inc()
+    metrics.check_host_throttle_wait_seconds.observe(waited_seconds)
+
+
+def record_result_flush(count: int, duration_seconds: float, pending: int):
+    """Record one flush of the check result buffer."""
+    metrics.check_results_flushed_total.inc(count)
+    metrics.check_result_flush_duration_seconds.observe(duration_seconds)
+    metrics.check_result_buffer_pending.set(pending)
+
+
+def record_schedule_lag(interval_seconds: int, queue: str, lag_seconds: float):
+    """Record how late a website check started compared with its slot."""
+    metrics.check_schedule_lag_seconds.labels(
+        interval=str(interval_seconds),
+        queue=queue
+    ).observe(lag_seconds)
+
+
+def record_confirmation(failed: bool):
+    """Record the outcome of a confirmation re-check."""
+    metrics.check_confirmations_total.labels(
+        outcome="failed" if failed else "passed"
+    ).inc()
+
+
+def record_retention_chunk(table: str, rows: int, duration_seconds: float, checkpoint_id: int):
+    """Record one chunk of expired rows deleted from `table`."""
+    metrics.retention_deleted_rows_total.labels(table=table).inc(rows)
+    if duration_seconds > 0:
+        metrics.retention_delete_rate.labels(table=table).set(rows / duration_seconds)
+    metrics.retention_checkpoint_id.labels(table=table).set(checkpoint_id)
+
+
 # =====================================================
 # BUSINESS METRICS HELPERS
 # =====================================================
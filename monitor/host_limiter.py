@@ -0,0 +1,193 @@
+"""
+Per-host politeness budget for website checks.
+
+Many users monitor URLs on the same host, and firing all of those checks at
+once gets our workers rate-limited or blocked by the target, which shows up
+as false downtime. Before each probe both engines take a slot from a budget
+that every worker shares through Redis:
+
+- at most CHECK_HOST_MAX_CONCURRENCY checks in flight per host, and per
+  resolved IP once the worker's DNS cache knows the address,
+- at most CHECK_HOST_MAX_RPS checks started per second per host / IP.
+
+A check that finds the budget spent waits for up to
+CHECK_HOST_MAX_WAIT_SECONDS and then runs anyway, so throttling delays a
+check but never fails it. Slots expire after CHECK_HOST_SLOT_TTL_SECONDS in
+case a worker dies holding one. Without Redis, or on a Redis error, checks
+are not limited.
+"""
+
+import asyncio
+import time
+import uuid
+import logging
+from contextlib import asynccontextmanager, contextmanager
+from urllib.parse import urlparse
+import redis
+from django.conf import settings
+from monitor import redis_utils
+from monitor.dns_cache import get_dns_cache
+from monitor.helpers import record_host_throttle
+
+logger = logging.getLogger('monitor')
+
+SLOTS_KEY = "hostlimit:{}:slots"
+RATE_KEY = "hostlimit:{}:rate:{}"
+
+# Seconds between attempts while waiting for the budget
+POLL_SECONDS = 0.05
+
+# KEYS are (slots, rate) pairs, one per host / IP. Take a slot in all of
+# them, or in none if any is full. ARGV: now, slot expiry, max concurrency,
+# max rps, token
+ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local limit = tonumber(ARGV[3])
+local rps = tonumber(ARGV[4])
+for i = 1, #KEYS, 2 do
+    redis.call('ZREMRANGEBYSCORE', KEYS[i], '-inf', now)
+    if limit > 0 and redis.call('ZCARD', KEYS[i]) >= limit then
+        return 0
+    end
+    if rps > 0 and tonumber(redis.call('GET', KEYS[i + 1]) or '0') >= rps then
+        return 0
+    end
+end
+for i = 1, #KEYS, 2 do
+    redis.call('ZADD', KEYS[i], ARGV[2], ARGV[5])
+    redis.call('EXPIREAT', KEYS[i], math.ceil(tonumber(ARGV[2])))
+    if rps > 0 then
+        redis.call('INCR', KEYS[i + 1])
+        redis.call('EXPIRE', KEYS[i + 1], 2)
+    end
+end
+return 1
+"""
+
+
+def limit_targets(url):
+    """The budgets a check of `url` draws from: its host and, if known, its IP."""
+    host = (urlparse(url).hostname or "").lower()
+    targets = [f"host:{host}"]
+
+    cached = get_dns_cache().get(host)
+    if cached is not None and cached[0]:
+        targets.append(f"ip:{cached[0][0]}")
+    return targets
+
+
+class HostLimiter:
+    """Shared per-host / per-IP concurrency and rate budget."""
+
+    def __init__(self, redis_client=None, max_concurrency=None, max_rps=None,
+                 max_wait=None, slot_ttl=None):
+        self.redis = redis_client if redis_client is not None else redis_utils.r
+        self.max_concurrency = (
+            max_concurrency if max_concurrency is not None
+            else getattr(settings, "CHECK_HOST_MAX_CONCURRENCY", 4)
+        )
+        self.max_rps = (
+            max_rps if max_rps is not None
+            else getattr(settings, "CHECK_HOST_MAX_RPS", 5)
+        )
+        self.max_wait = (
+            max_wait if max_wait is not None
+            else getattr(settings, "CHECK_HOST_MAX_WAIT_SECONDS", 2)
+        )
+        self.slot_ttl = slot_ttl or getattr(settings, "CHECK_HOST_SLOT_TTL_SECONDS", 60)
+
+    @property
+    def enabled(self):
+        return self.redis is not None and bool(self.max_concurrency or self.max_rps)
+
+    def try_acquire(self, targets, token):
+        """Take a slot in every target's budget. False if any is spent."""
+        now = time.time()
+        keys = []
+        for target in targets:
+            keys += [SLOTS_KEY.format(target), RATE_KEY.format(target, int(now))]
+        try:
+            return bool(self.redis.eval(
+                ACQUIRE_SCRIPT,
+                len(keys),
+                *keys,
+                now,
+                now + self.slot_ttl,
+                self.max_concurrency,
+                self.max_rps,
+                token,
+            ))
+        except redis.RedisError as e:
+            # Fail open: an unlimited check beats a missed one
+            logger.error(f"Redis error taking host budget for {targets[0]}: {e}")
+            return True
+
+    def release(self, targets, token):
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for target in targets:
+                pipe.zrem(SLOTS_KEY.format(target), token)
+            pipe.execute()
+        except redis.RedisError as e:
+            # The slot expires on its own after slot_ttl
+            logger.error(f"Redis error releasing host budget for {targets[0]}: {e}")
+
+    @contextmanager
+    def limit(self, url):
+        """Hold a slot of `url`'s budget for the duration of the block."""
+        if not self.enabled:
+            yield
+            return
+
+        targets = limit_targets(url)
+        token = uuid.uuid4().hex
+        started = time.monotonic()
+        acquired = self.try_acquire(targets, token)
+        if not acquired:
+            while time.monotonic() - started < self.max_wait:
+                time.sleep(POLL_SECONDS)
+                acquired = self.try_acquire(targets, token)
+                if acquired:
+                    break
+            self.throttled(targets, started)
+
+        try:
+            yield
+        finally:
+            if acquired:
+                self.release(targets, token)
+
+    def throttled(self, targets, started):
+        # Hosts are unbounded, so they go to the log rather than a metric label
+        waited = time.monotonic() - started
+        logger.info(f"Check of {targets[0].split(':', 1)[1]} waited {waited:.2f}s for its host budget")
+        record_host_throttle(waited)
+
+    @asynccontextmanager
+    async def limit_async(self, url):
+        """
+        `limit` for the async engine. The Redis calls run in the loop's
+        default executor and waiting yields, so neither holds up (or skews
+        the timings of) the other probes in flight.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        targets = limit_targets(url)
+        token = uuid.uuid4().hex
+        started = time.monotonic()
+        acquired = await asyncio.to_thread(self.try_acquire, targets, token)
+        if not acquired:
+            while time.monotonic() - started < self.max_wait:
+                await asyncio.sleep(POLL_SECONDS)
+                acquired = await asyncio.to_thread(self.try_acquire, targets, token)
+                if acquired:
+                    break
+            self.throttled(targets, started)
+
+        try:
+            yield
+        finally:
+            if acquired:
+                await asyncio.to_thread(self.release, targets, token)
@@ -0,0 +1,321 @@
+"""
+Worker-lifetime HTTP connection pools for uptime checks.
+
+Both check engines keep their connections open between checks instead of
+paying a fresh TCP + TLS handshake on every request:
+
+- the legacy engine uses one pooled `requests.Session` per worker process,
+- the async engine uses one `aiohttp.ClientSession` bound to a long-lived
+  event loop per worker process.
+
+Pools are limited per host, recycled after CHECK_POOL_MAX_AGE_SECONDS (or
+on demand via `recycle_session()`), and dropped in every freshly forked
+Celery child so sockets are never shared between processes.
+"""
+
+import asyncio
+import functools
+import time
+import logging
+from http.cookiejar import DefaultCookiePolicy
+import aiohttp
+from aiohttp.client_proto import ResponseHandler
+import requests
+from requests.adapters import HTTPAdapter
+from celery.signals import worker_process_init, worker_process_shutdown
+from django.conf import settings
+from .dns_cache import CachingResolver, get_dns_cache
+
+logger = logging.getLogger('monitor')
+
+_session = None
+_session_created_at = 0.0
+
+_loop = None
+_async_session = None
+_async_session_created_at = 0.0
+_resolver = None
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _is_expired(created_at):
+    max_age = _setting("CHECK_POOL_MAX_AGE_SECONDS", 3600)
+    return bool(max_age) and time.monotonic() - created_at > max_age
+
+
+# =====================================================
+# LEGACY ENGINE (requests)
+# =====================================================
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that flags whether each response went over a pooled
+    keep-alive connection (`response.connection_reused`).
+    """
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        pool = self.get_connection_with_tls_context(
+            request, verify, proxies=proxies, cert=cert
+        )
+        opened_before = pool.num_connections
+
+        response = super().send(
+            request,
+            stream=stream,
+            timeout=timeout,
+            verify=verify,
+            cert=cert,
+            proxies=proxies
+        )
+        response.connection_reused = pool.num_connections == opened_before
+        return response
+
+
+def _build_session():
+    session = requests.Session()
+    adapter = PooledHTTPAdapter(
+        pool_connections=_setting("CHECK_POOL_MAX_HOSTS", 500),
+        pool_maxsize=_setting("CHECK_POOL_MAX_PER_HOST", 4),
+        max_retries=0,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    # Checks for different users must never share cookies
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+
+def get_session():
+    """Return this worker's pooled requests session."""
+    global _session, _session_created_at
+
+    if _session is not None and _is_expired(_session_created_at):
+        logger.info("Recycling pooled HTTP session after max age")
+        _session.close()
+        _session = None
+
+    if _session is None:
+        _session = _build_session()
+        _session_created_at = time.monotonic()
+
+    return _session
+
+
+# =====================================================
+# ASYNC ENGINE (aiohttp)
+# =====================================================
+
+class CheckTrace:
+    """
+    Per-request trace context (passed as `trace_request_ctx`).
+    Collects connection reuse and phase start/end times for one check.
+    """
+
+    def __init__(self):
+        self.connection_reused = None
+        self.dns_ms = None
+        self.dns_finished_at = None
+        self.connect_started_at = None
+        self.headers_sent_at = None
+        self._dns_started_at = None
+
+    def phase_timings(self, response, headers_at, finished_at):
+        """
+        Return {phase: milliseconds} for the final request of the check.
+        Connection phases are only present when a new connection was opened.
+        """
+        timings = {
+            "dns": None,
+            "connect": None,
+            "tls": None,
+            "ttfb": None,
+            "download": (finished_at - headers_at) * 1000,
+        }
+        if self.headers_sent_at is not None:
+            timings["ttfb"] = (headers_at - self.headers_sent_at) * 1000
+
+        protocol = getattr(response, "_protocol", None)
+        tcp_connected_at = getattr(protocol, "tcp_connected_at", None)
+        if self.connection_reused is False and tcp_connected_at is not None:
+            timings["dns"] = self.dns_ms
+            connect_started_at = self.dns_finished_at or self.connect_started_at
+            timings["connect"] = (tcp_connected_at - connect_started_at) * 1000
+            if response.url.scheme == "https":
+                timings["tls"] = (protocol.ready_at - tcp_connected_at) * 1000
+
+        return {
+            phase: round(ms) if ms is not None else None
+            for phase, ms in timings.items()
+        }
+
+
+class TimedResponseHandler(ResponseHandler):
+    """
+    Protocol that notes when its socket finished the TCP connect (the
+    factory runs right after it) and when the connection became usable
+    (`connection_made` runs after the TLS handshake for https).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tcp_connected_at = time.perf_counter()
+        self.ready_at = None
+
+    def connection_made(self, transport):
+        self.ready_at = time.perf_counter()
+        super().connection_made(transport)
+
+
+class TimedTCPConnector(aiohttp.TCPConnector):
+    """TCPConnector whose connections report TCP and TLS timings."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._factory = functools.partial(TimedResponseHandler, loop=self._loop)
+
+
+def _trace_ctx(trace_config_ctx):
+    ctx = trace_config_ctx.trace_request_ctx
+    return ctx if isinstance(ctx, CheckTrace) else None
+
+
+async def _on_connection_reused(session, trace_config_ctx, params):
+    ctx = _trace_ctx(trace_config_ctx)
+    if ctx is not None:
+        ctx.connection_reused = True
+
+
+async def _on_connection_create_start(session, trace_config_ctx, params):
+    ctx = _trace_ctx(trace_config_ctx)
+    if ctx is not None:
+        ctx.connect_started_at = time.perf_counter()
+        ctx.dns_ms = None
+        ctx.dns_finished_at = None
+
+
+async def _on_connection_created(session, trace_config_ctx, params):
+    ctx = _trace_ctx(trace_config_ctx)
+    if ctx is not None:
+        ctx.connection_reused = False
+
+
+async def _on_dns_start(session, trace_config_ctx, params):
+    ctx = _trace_ctx(trace_config_ctx)
+    if ctx is not None:
+        ctx._dns_started_at = time.perf_counter()
+
+
+async def _on_dns_end(session, trace_config_ctx, params):
+    ctx = _trace_ctx(trace_config_ctx)
+    if ctx is not None and ctx._dns_started_at is not None:
+        ctx.dns_finished_at = time.perf_counter()
+        ctx.dns_ms = (ctx.dns_finished_at - ctx._dns_started_at) * 1000
+
+
+async def _on_headers_sent(session, trace_config_ctx, params):
+    ctx = _trace_ctx(trace_config_ctx)
+    if ctx is not None:
+        ctx.headers_sent_at = time.perf_counter()
+
+
+def _build_trace_config():
+    """
+    Record connection reuse and phase times on the CheckTrace passed as
+    `trace_request_ctx` to each request.
+    """
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_connection_reuseconn.append(_on_connection_reused)
+    trace_config.on_connection_create_start.append(_on_connection_create_start)
+    trace_config.on_connection_create_end.append(_on_connection_created)
+    trace_config.on_dns_resolvehost_start.append(_on_dns_start)
+    trace_config.on_dns_resolvehost_end.append(_on_dns_end)
+    trace_config.on_request_headers_sent.append(_on_headers_sent)
+    return trace_config
+
+
+def run_in_worker_loop(coro):
+    """
+    Run `coro` on this worker's long-lived event loop, so the pooled async
+    session (and its open connections) survives between batches.
+    """
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+    return _loop.run_until_complete(coro)
+
+
+def get_resolver():
+    """This worker's caching DNS resolver, shared by the async session and socket checks."""
+    global _resolver
+    if _resolver is None:
+        _resolver = CachingResolver(
+            get_dns_cache(),
+            timeout=_setting("CHECK_DNS_TIMEOUT_SECONDS", 5)
+        )
+    return _resolver
+
+
+async def get_async_session():
+    """Return this worker's pooled aiohttp session. Call inside the worker loop."""
+    global _async_session, _async_session_created_at
+
+    if _async_session is not None and _is_expired(_async_session_created_at):
+        logger.info("Recycling pooled async HTTP session after max age")
+        await _async_session.close()
+        _async_session = None
+
+    if _async_session is None:
+        connector = TimedTCPConnector(
+            limit=_setting("CHECK_POOL_MAX_CONNECTIONS", 500),
+            limit_per_host=_setting("CHECK_POOL_MAX_PER_HOST", 4),
+            keepalive_timeout=_setting("CHECK_POOL_KEEPALIVE_SECONDS", 75),
+            resolver=get_resolver(),
+            use_dns_cache=False,  # CachingResolver honours record TTLs instead
+        )
+        _async_session = aiohttp.ClientSession(
+            connector=connector,
+            cookie_jar=aiohttp.DummyCookieJar(),
+            trace_configs=[_build_trace_config()],
+        )
+        _async_session_created_at = time.monotonic()
+
+    return _async_session
+
+
+# =====================================================
+# RECYCLING
+# =====================================================
+
+def recycle_session():
+    """
+    Close every pooled connection held by this worker.
+    The next check opens fresh ones.
+    """
+    global _session, _async_session
+
+    if _session is not None:
+        _session.close()
+        _session = None
+
+    if _async_session is not None:
+        if _loop is not None and not _loop.is_closed() and not _loop.is_running():
+            _loop.run_until_complete(_async_session.close())
+        _async_session = None
+
+
+@worker_process_init.connect
+def _reset_pools_after_fork(**kwargs):
+    """Forked children start with empty pools instead of the parent's sockets."""
+    global _session, _loop, _async_session
+    _session = None
+    _loop = None
+    _async_session = None
+
+
+@worker_process_shutdown.connect
+def _close_pools_on_shutdown(**kwargs):
+    recycle_session()
@@ -0,0 +1,38 @@
+from datetime import datetime, timezone as dt_timezone
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from monitor.archive import archived_uptime
+
+
+def utc_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=dt_timezone.utc)
+    except ValueError:
+        raise CommandError(f"Dates look like 2030-06-01, not {value!r}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Shows a website's uptime and response times over a period from the "
+        "Parquet archive of expired check results"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('website_id', type=int)
+        parser.add_argument('--start', required=True, help='First UTC day, e.g. 2030-06-01.')
+        parser.add_argument('--end', help='UTC day to stop before. Default is now.')
+
+    def handle(self, *args, **options):
+        start = utc_date(options['start'])
+        end = utc_date(options['end']) if options['end'] else timezone.now()
+        aggregate = archived_uptime(options['website_id'], start, end)
+
+        self.stdout.write(
+            f"Website {options['website_id']} from {start:%Y-%m-%d} to {end:%Y-%m-%d}: "
+            f"{aggregate.checks} archived checks"
+        )
+        if aggregate.checks:
+            self.stdout.write(f"Uptime: {aggregate.uptime_percentage:.2f}%")
+            self.stdout.write(
+                f"Response time: avg {aggregate.avg_ms:.0f} ms, p95 {aggregate.percentile(95):.0f} ms"
+            )
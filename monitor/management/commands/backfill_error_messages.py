@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from monitor.models import Checkpoint, ErrorMessage, UptimeCheckResult
+import logging
+
+logger = logging.getLogger('monitor')
+
+CHECKPOINT = "backfill:error_messages"
+
+
+class Command(BaseCommand):
+    help = (
+        "Points the check results saved before migration 0019 at their "
+        "ErrorMessage rows, a batch per transaction, resuming where the last "
+        "run stopped. Run it between migrations 0019 and 0020, so 0020 finds "
+        "nothing left to move while it holds the results table locked"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Check results per transaction. Default is 10000.'
+        )
+
+    def handle(self, *args, **options):
+        table = UptimeCheckResult._meta.db_table
+        with connection.cursor() as cursor:
+            columns = [column.name for column in connection.introspection.get_table_description(cursor, table)]
+        if "error_message" not in columns:
+            self.stdout.write("Nothing to backfill: migration 0020 has already moved the error messages")
+            return
+
+        checkpoint, _ = Checkpoint.objects.get_or_create(name=CHECKPOINT)
+        last_id = checkpoint.position.get("last_id", 0)
+        total = 0
+        while True:
+            with transaction.atomic():
+                rows, moved = self.backfill_batch(table, last_id, options['batch_size'])
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                checkpoint.position = {"last_id": last_id}
+                checkpoint.save(update_fields=["position", "updated_at"])
+            total += moved
+            self.stdout.write(f"Moved {total} error messages so far (up to id {last_id})")
+
+        message = f"[✓] Moved {total} error messages; migration 0020 can run"
+        logger.info(message)
+        self.stdout.write(self.style.SUCCESS(message))
+
+    def backfill_batch(self, table, last_id, size):
+        """Move the error messages of the `size` results after `last_id`."""
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT id, error_message, error_id FROM {quote(table)} "
+                f"WHERE id > %s ORDER BY id LIMIT %s",
+                [last_id, size],
+            )
+            rows = cursor.fetchall()
+
+        results = {}  # message: ids of the results that have it
+        for pk, message, error_id in rows:
+            if message and error_id is None:
+                results.setdefault(message, []).append(pk)
+        ErrorMessage.objects.bulk_create(
+            [ErrorMessage(id=ErrorMessage.key(message), message=message) for message in results],
+            ignore_conflicts=True,
+        )
+        for message, ids in results.items():
+            UptimeCheckResult.objects.filter(pk__in=ids).update(error_id=ErrorMessage.key(message))
+        return rows, sum(len(ids) for ids in results.values())
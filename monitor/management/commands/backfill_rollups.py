@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from monitor.rollups import rollup_batch_size, rollup_check_results
+import logging
+
+logger = logging.getLogger('monitor')
+
+
+class Command(BaseCommand):
+    help = (
+        "Folds every check result not rolled up yet into the hourly and daily "
+        "rollups, e.g. the existing history after the rollups are introduced"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Results per transaction. Defaults to ROLLUP_BATCH_SIZE.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size'] or rollup_batch_size()
+        max_batches = 10
+
+        # A first run only fences the results saved so far
+        total = rollup_check_results(batch_size, max_batches)
+        while True:
+            rolled_up = rollup_check_results(batch_size, max_batches)
+            total += rolled_up
+            self.stdout.write(f"Rolled up {total} check results so far")
+            # A run stops short of its batches once it has caught up
+            if rolled_up < batch_size * max_batches:
+                break
+
+        message = f"[✓] Rolled up {total} check results"
+        logger.info(message)
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,297 @@
+import os
+import time
+from contextlib import contextmanager
+from celery import current_app
+from celery.signals import task_postrun, task_prerun
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from monitor.http_pool import recycle_session
+from monitor.fake_targets import DEFAULT_MIX, FakeTargetFleet, parse_mix
+from monitor.models import Website, UptimeCheckResult
+from monitor.schedule_wheel import redis_backend_enabled, sync_website
+from monitor.tasks import check_due_websites
+import logging
+
+logger = logging.getLogger('monitor')
+
+User = get_user_model()
+
+BENCHMARK_EMAIL = "benchmark@fake-targets.invalid"
+CHECK_TASKS = {"monitor.tasks.check_single_website", "monitor.tasks.check_website_batch"}
+
+# Measure the engine alone. The fake targets share 127.0.0.1 but stand in
+# for many hosts, so per-host budgets and pool limits are lifted; and no
+# confirmation re-checks add checks of their own.
+BENCHMARK_SETTINGS = {
+    "CHECK_POOL_MAX_PER_HOST": 1000,
+    "CHECK_HOST_MAX_CONCURRENCY": 0,
+    "CHECK_HOST_MAX_RPS": 0,
+    "CHECK_CONFIRM_RECHECKS": 0,
+    "CHECK_DISPATCH_LOOKAHEAD_SECONDS": 0,
+}
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of `values`, or None if there are none."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+class TaskTimer:
+    """Wall time of every check task run in this process (eager mode)."""
+
+    def __init__(self):
+        self.started = {}
+        self.runs = []  # (website ids, seconds)
+
+    def prerun(self, task_id=None, task=None, **kwargs):
+        if task.name in CHECK_TASKS:
+            self.started[task_id] = time.perf_counter()
+
+    def postrun(self, task_id=None, task=None, args=None, **kwargs):
+        started = self.started.pop(task_id, None)
+        if started is None:
+            return
+        ids = args[0] if isinstance(args[0], list) else [args[0]]
+        self.runs.append((ids, time.perf_counter() - started))
+
+    @contextmanager
+    def timing(self):
+        task_prerun.connect(self.prerun, weak=False)
+        task_postrun.connect(self.postrun, weak=False)
+        try:
+            yield self
+        finally:
+            task_prerun.disconnect(self.prerun)
+            task_postrun.disconnect(self.postrun)
+
+
+@contextmanager
+def eager_tasks(ca_file):
+    """Run queued tasks inline, trusting the fake targets' certificate."""
+    conf = current_app.conf
+    saved_conf = conf.task_always_eager
+    saved_env = {name: os.environ.get(name) for name in ("REQUESTS_CA_BUNDLE", "SSL_CERT_FILE")}
+    conf.task_always_eager = True
+    if ca_file:
+        os.environ.update({name: ca_file for name in saved_env})
+    try:
+        yield
+    finally:
+        conf.task_always_eager = saved_conf
+        for name, value in saved_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-tests the check engine: seeds websites against a local fleet of fake "
+        "targets, runs check_due_websites and reports throughput, scheduler lag, "
+        "per-check overhead and DB queries per check. Use a dedicated database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--websites',
+            type=int,
+            default=500,
+            help='Websites to seed. Default is 500.'
+        )
+        parser.add_argument(
+            '--mix',
+            default=DEFAULT_MIX,
+            help=f'Target kinds by weight. Default is "{DEFAULT_MIX}".'
+        )
+        parser.add_argument(
+            '--engine',
+            choices=['legacy', 'async'],
+            help='Check engine. Defaults to CHECK_ENGINE.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Websites per async batch. Defaults to CHECK_BATCH_SIZE.'
+        )
+        parser.add_argument(
+            '--eager',
+            action='store_true',
+            help='Run the check tasks in this process instead of on Celery workers. '
+            'Only eager runs report check overhead and DB queries.'
+        )
+        parser.add_argument(
+            '--timeout-ms',
+            type=int,
+            default=2000,
+            help='Timeout of the seeded websites. Default is 2000.'
+        )
+        parser.add_argument(
+            '--slow-ms',
+            type=int,
+            default=500,
+            help='How long slow targets take to answer. Default is 500.'
+        )
+        parser.add_argument(
+            '--shared-urls',
+            action='store_true',
+            help='Give websites of the same kind the same URL, so they share probes.'
+        )
+        parser.add_argument(
+            '--wait',
+            type=int,
+            default=300,
+            help='Seconds to wait for workers to check every website. Default is 300.'
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the seeded websites and results afterwards.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            weights = parse_mix(options['mix'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        # Eager runs would check real websites inline, workers would check them for real
+        others = Website.objects.filter(is_active=True).exclude(user__email=BENCHMARK_EMAIL)
+        if others.exists():
+            raise CommandError(
+                "The database has active websites of its own; run the benchmark "
+                "against a dedicated database."
+            )
+
+        hang_seconds = options['timeout_ms'] / 1000 + 5
+        with FakeTargetFleet(slow_ms=options['slow_ms'], hang_seconds=hang_seconds) as fleet:
+            user, kinds, due_at = self.seed(fleet, weights, options)
+            try:
+                if options['eager']:
+                    report = self.run_eager(fleet, options)
+                else:
+                    self.stdout.write(
+                        "Workers must trust the TLS targets' certificate, e.g. "
+                        f"REQUESTS_CA_BUNDLE={fleet.ca_file} SSL_CERT_FILE={fleet.ca_file}, "
+                        "and should run without per-host limits (CHECK_POOL_MAX_PER_HOST=1000 "
+                        "CHECK_HOST_MAX_CONCURRENCY=0 CHECK_HOST_MAX_RPS=0)."
+                    )
+                    report = self.run_on_workers(user, options)
+                self.report(user, kinds, due_at, options, **report)
+            finally:
+                if not options['keep']:
+                    user.delete()
+
+    def seed(self, fleet, weights, options):
+        User.objects.filter(email=BENCHMARK_EMAIL).delete()
+        user = User.objects.create(email=BENCHMARK_EMAIL)
+
+        due_at = timezone.now()
+        targets = fleet.urls(options['websites'], weights, unique=not options['shared_urls'])
+        websites = Website.objects.bulk_create([
+            Website(
+                user=user,
+                url=url,
+                name=f"benchmark {kind} {i}",
+                check_interval=60,  # so nothing comes due twice in one run
+                timeout_ms=options['timeout_ms'],
+                next_check_at=due_at,
+            )
+            for i, (kind, url) in enumerate(targets)
+        ], batch_size=1000)
+        if redis_backend_enabled():
+            for website in websites:
+                sync_website(website)  # bulk_create sends no post_save
+
+        self.stdout.write(f"Seeded {len(websites)} websites against fake targets on 127.0.0.1")
+        return user, {url: kind for kind, url in targets}, due_at
+
+    def run_eager(self, fleet, options):
+        timer = TaskTimer()
+        with override_settings(**BENCHMARK_SETTINGS), eager_tasks(fleet.ca_file), \
+                timer.timing(), CaptureQueriesContext(connection) as queries:
+            # Pools are built on first use, with the benchmark's limits
+            recycle_session()
+            started = time.perf_counter()
+            check_due_websites(engine=options['engine'], batch_size=options['batch_size'])
+            elapsed = time.perf_counter() - started
+            recycle_session()
+        return {"elapsed": elapsed, "runs": timer.runs, "queries": len(queries)}
+
+    def run_on_workers(self, user, options):
+        started = time.perf_counter()
+        check_due_websites(engine=options['engine'], batch_size=options['batch_size'])
+        checked = 0
+        while time.perf_counter() - started < options['wait']:
+            checked = UptimeCheckResult.objects.filter(
+                website__user=user
+            ).values('website').distinct().count()
+            if checked >= options['websites']:
+                break
+            time.sleep(0.5)
+        else:
+            self.stdout.write(self.style.WARNING(
+                f"Gave up after {options['wait']}s with {checked} websites checked"
+            ))
+        return {"elapsed": time.perf_counter() - started, "runs": None, "queries": None}
+
+    def report(self, user, kinds, due_at, options, elapsed, runs, queries):
+        # The first result of each website is its check from this run
+        results = {}
+        for result in UptimeCheckResult.objects.filter(
+            website__user=user
+        ).select_related('website', 'error').only(
+            'website__url', 'status_code', 'response_time_ms', 'error__message', 'checked_at'
+        ).order_by('checked_at'):
+            results.setdefault(result.website_id, result)
+
+        checks = len(results)
+        engine = options['engine'] or "default"
+        mode = "eager" if options['eager'] else "workers"
+        self.stdout.write(
+            f"Checked {checks} websites ({engine} engine, {mode}) in {elapsed:.2f}s: "
+            f"{checks / elapsed if elapsed else 0:.1f} checks/s"
+        )
+
+        lags = [
+            (result.checked_at - due_at).total_seconds() - result.response_time_ms / 1000
+            for result in results.values()
+        ]
+        self.stdout.write("Scheduler lag: " + self.summary(lags, "s"))
+
+        if runs is not None:
+            probe_seconds = {
+                website_id: result.response_time_ms / 1000
+                for website_id, result in results.items()
+            }
+            overhead = []
+            for ids, seconds in runs:
+                probe = max((probe_seconds.get(i, 0) for i in ids), default=0)
+                overhead += [(seconds - probe) / len(ids) * 1000] * len(ids)
+            self.stdout.write("Check overhead: " + self.summary(overhead, "ms"))
+            self.stdout.write(f"DB queries per check: {queries / checks if checks else 0:.1f}")
+
+        outcomes = {}
+        for result in results.values():
+            kind = kinds.get(result.website.url, "?")
+            passed = result.status_code == 200 and not result.error_message
+            counts = outcomes.setdefault(kind, [0, 0])
+            counts[0 if passed else 1] += 1
+        self.stdout.write("Outcomes: " + ", ".join(
+            f"{kind} {up} up / {down} down" for kind, (up, down) in sorted(outcomes.items())
+        ))
+
+    @staticmethod
+    def summary(values, unit):
+        if not values:
+            return "no checks"
+        return (
+            f"p50 {percentile(values, 50):.2f}{unit}, p99 {percentile(values, 99):.2f}{unit}, "
+            f"max {max(values):.2f}{unit}"
+        )
@@ -0,0 +1,167 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from monitor.models import ErrorMessage, UptimeCheckResult
+
+# Typical errors as checks store them; each failed check repeats one of them
+MESSAGES = [
+    "ConnectionError: [Errno 111] Connection refused",
+    "Timed out after 5000ms",
+    "ConnectionError: [Errno -2] Name or service not known",
+    "Keyword 'healthy' not found in response body",
+    "SSLError: [SSL: CERTIFICATE_VERIFY_FAILED] certificate verify failed: certificate has expired (_ssl.c:1000)",
+    "ServerDisconnectedError: Server disconnected",
+]
+
+# The table as it was before migrations 0019 and 0020
+BEFORE_TABLE = """
+CREATE TEMP TABLE result_storage_before (
+    id bigint PRIMARY KEY,
+    status_code integer NOT NULL,
+    error_message text NOT NULL,
+    ip inet NULL,
+    response_time_ms double precision NOT NULL,
+    website_id bigint NOT NULL,
+    connection_reused boolean NULL,
+    connect_ms integer NULL,
+    dns_ms integer NULL,
+    download_ms integer NULL,
+    tls_ms integer NULL,
+    ttfb_ms integer NULL,
+    checked_at timestamp with time zone NOT NULL
+)
+"""
+
+SOURCE_TABLE = """
+CREATE TEMP TABLE result_storage_source AS
+SELECT g AS id,
+       1 + g %% %s AS website_id,
+       random() < %s AS failed,
+       floor(random() * %s)::int + 1 AS message_no,
+       5 + random() * 995 AS ms,
+       now() - g * interval '1 second' AS checked_at
+FROM generate_series(1, %s) AS g
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills a copy of the check result table in its old layout and one in "
+        "its current layout with the same synthetic rows (PostgreSQL), and "
+        "compares their heap and index sizes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=1000000,
+            help='Check results per table. Default is 1000000.'
+        )
+        parser.add_argument(
+            '--websites',
+            type=int,
+            default=1000,
+            help='Websites the results are spread over. Default is 1000.'
+        )
+        parser.add_argument(
+            '--error-rate',
+            type=float,
+            default=0.05,
+            help='Share of results with an error message. Default is 0.05.'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("The storage benchmark needs PostgreSQL.")
+
+        self.stdout.write(
+            f"Filling both layouts with {options['rows']} check results "
+            f"({options['error_rate']:.0%} with an error)..."
+        )
+        try:
+            before, after, messages = self.fill(options)
+        finally:
+            self.execute_sql(
+                "DROP TABLE IF EXISTS result_storage_source, result_storage_before, "
+                "result_storage_after, result_storage_messages"
+            )
+        self.report(options['rows'], before, after, messages)
+
+    def execute_sql(self, sql, params=None):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def fill(self, options):
+        """Create and fill the tables; returns the (heap, indexes, total) sizes of each."""
+        quote = connection.ops.quote_name
+        keys = [ErrorMessage.key(message) for message in MESSAGES]
+
+        self.execute_sql("SELECT setseed(0.42)")
+        self.execute_sql(SOURCE_TABLE, [
+            options['websites'], options['error_rate'], len(MESSAGES), options['rows'],
+        ])
+
+        self.execute_sql(BEFORE_TABLE)
+        self.execute_sql("CREATE INDEX ON result_storage_before (website_id)")
+        self.execute_sql("CREATE INDEX ON result_storage_before (website_id, checked_at)")
+        self.execute_sql(
+            "INSERT INTO result_storage_before (id, status_code, error_message, ip, "
+            "response_time_ms, website_id, connection_reused, download_ms, ttfb_ms, checked_at) "
+            "SELECT id, CASE WHEN failed THEN 0 ELSE 200 END, "
+            "CASE WHEN failed THEN (%s::text[])[message_no] ELSE '' END, '203.0.113.10', "
+            "ms, website_id, true, round(ms * 0.2), round(ms * 0.7), checked_at "
+            "FROM result_storage_source",
+            [MESSAGES],
+        )
+
+        # The current layout, read from the live tables
+        self.execute_sql(
+            f"CREATE TEMP TABLE result_storage_after "
+            f"(LIKE {quote(UptimeCheckResult._meta.db_table)} INCLUDING INDEXES)"
+        )
+        self.execute_sql(
+            "INSERT INTO result_storage_after (id, status_code, error_id, ip, "
+            "response_time_ms, website_id, connection_reused, download_ms, ttfb_ms, checked_at) "
+            "SELECT id, CASE WHEN failed THEN 0 ELSE 200 END, "
+            "CASE WHEN failed THEN (%s::bigint[])[message_no] END, '203.0.113.10', "
+            "round(ms), website_id, true, round(ms * 0.2), round(ms * 0.7), checked_at "
+            "FROM result_storage_source",
+            [keys],
+        )
+        self.execute_sql(
+            f"CREATE TEMP TABLE result_storage_messages "
+            f"(LIKE {quote(ErrorMessage._meta.db_table)} INCLUDING INDEXES)"
+        )
+        self.execute_sql(
+            "INSERT INTO result_storage_messages (id, message) "
+            "SELECT * FROM unnest(%s::bigint[], %s::text[])",
+            [keys, MESSAGES],
+        )
+
+        sizes = []
+        for table in ["result_storage_before", "result_storage_after", "result_storage_messages"]:
+            self.execute_sql(f"VACUUM ANALYZE {table}")
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT pg_relation_size(%s::regclass), pg_indexes_size(%s::regclass), "
+                    "pg_total_relation_size(%s::regclass)",
+                    [table] * 3,
+                )
+                sizes.append(cursor.fetchone())
+        return sizes
+
+    def report(self, rows, before, after, messages):
+        # The lookup table is part of the new layout's cost
+        after = tuple(size + extra for size, extra in zip(after, messages))
+
+        self.stdout.write(f"{'':<8}{'heap':>12}{'indexes':>12}{'total':>12}{'bytes/row':>12}")
+        for name, sizes in (("before", before), ("after", after)):
+            self.stdout.write(f"{name:<8}" + "".join(
+                f"{size / 1024 / 1024:>9.1f} MB" for size in sizes
+            ) + f"{sizes[2] / rows if rows else 0:>12.1f}")
+        self.stdout.write(f"{'saved':<8}" + "".join(
+            f"{(1 - new / old) * 100 if old else 0:>11.1f}%" for old, new in zip(before, after)
+        ))
+        self.stdout.write(self.style.SUCCESS(
+            f"[✓] Error messages stored once: {len(MESSAGES)} rows, {messages[2] / 1024:.0f} kB"
+        ))
@@ -0,0 +1,49 @@
+from collections import Counter
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from monitor.utils import OVERDUE_BUCKETS, OVERDUE_STATES, overdue_backlog
+
+
+class Command(BaseCommand):
+    help = (
+        "Shows the backlog of overdue website checks: how many are waiting for "
+        "the dispatcher (due), for a worker (queued) or were lost, by how overdue"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--by-interval',
+            action='store_true',
+            help='Break the backlog down by check interval as well.'
+        )
+
+    def handle(self, *args, **options):
+        current_time = timezone.now()
+        backlog = overdue_backlog(current_time)
+
+        self.stdout.write(f"Overdue website checks at {current_time:%Y-%m-%d %H:%M:%S} UTC")
+        if options['by_interval']:
+            for interval in sorted({interval for _, interval, _ in backlog}):
+                self.stdout.write(f"\nEvery {interval}s:")
+                self.table(Counter({
+                    (state, bucket): count
+                    for (state, key, bucket), count in backlog.items()
+                    if key == interval
+                }))
+        else:
+            counts = Counter()
+            for (state, _, bucket), count in backlog.items():
+                counts[state, bucket] += count
+            self.table(counts)
+
+    def table(self, counts):
+        """Print {(state, bucket): count} as one row per overdue bucket."""
+        self.stdout.write(f"{'overdue':<10}" + "".join(f"{state:>8}" for state in OVERDUE_STATES))
+        for _, bucket in OVERDUE_BUCKETS:
+            self.stdout.write(f"{bucket:<10}" + "".join(
+                f"{counts[state, bucket]:>8}" for state in OVERDUE_STATES
+            ))
+        self.stdout.write(f"{'total':<10}" + "".join(
+            f"{sum(n for (s, _), n in counts.items() if s == state):>8}"
+            for state in OVERDUE_STATES
+        ))
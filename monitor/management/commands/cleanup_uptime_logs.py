@@ -1,14 +1,22 @@
 from django.core.management.base import BaseCommand
-from django.utils import timezone
-from datetime import timedelta
-from monitor.models import UptimeCheckResult
+from monitor.models import Alert, PingLog, UptimeCheckResult
+from monitor.retention import purge_all
 import logging
 
 logger = logging.getLogger('monitor')
 
+TABLES = {
+    "results": UptimeCheckResult._meta.db_table,
+    "pings": PingLog._meta.db_table,
+    "alerts": Alert._meta.db_table,
+}
+
 
 class Command(BaseCommand):
-    help = 'Deletes UptimeCheckResult entries older than N days (default 90)'
+    help = (
+        'Deletes UptimeCheckResult entries older than N days (default 90), plus '
+        'ping logs and resolved alerts past their retention, in small chunks'
+    )
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -17,18 +25,59 @@ class Command(BaseCommand):
             default=90,
             help='Retention period in days. Default is 90.'
         )
+        parser.add_argument(
+            '--table',
+            choices=list(TABLES),
+            action='append',
+            help='Only clean up these tables. Default is all of them.'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            help='Rows deleted per statement. Defaults to RETENTION_CHUNK_SIZE.'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            help='Seconds to wait between chunks. Defaults to RETENTION_PAUSE_SECONDS.'
+        )
+        parser.add_argument(
+            '--max-seconds',
+            type=int,
+            default=0,
+            help='Stop after this long; the next run resumes. Default is no limit.'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Estimate how many rows would be deleted without deleting.'
+        )
 
     def handle(self, *args, **options):
         retention_days = options['days']
-        cutoff_date = timezone.now() - timedelta(days=retention_days)
-        deleted_count, _ = UptimeCheckResult.objects.filter(
-            checked_at__lt=cutoff_date
-        ).delete()
-
-        message = f"[✓] Deleted {deleted_count} uptime"
-        "logs older than {retention_days} days"
-        logger.info(message)
-        self.stdout.write(self.style.SUCCESS(
-            f"[✓] Deleted {deleted_count} records"
-            f"older than {retention_days} days.")
+        tables = [TABLES[name] for name in options['table']] if options['table'] else None
+        results = purge_all(
+            retention_days,
+            size=options['chunk_size'],
+            pause=options['pause'],
+            seconds=options['max_seconds'],
+            dry_run=options['dry_run'],
+            tables=tables,
         )
+
+        for result in results:
+            if options['dry_run']:
+                if result.estimate is None:
+                    message = f"[dry run] {result.table}: partitioned or kept forever"
+                else:
+                    message = f"[dry run] {result.table}: about {result.estimate} expired rows"
+            else:
+                message = f"[✓] Deleted {result.deleted} records from {result.table}"
+                if result.archived:
+                    message += f" after archiving {result.archived}"
+                if result.partitions:
+                    message += f" and dropped {result.partitions} partitions"
+                if not result.finished:
+                    message += " (stopped early; run again to continue)"
+            logger.info(message)
+            self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,209 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models, transaction
+from django.utils import timezone
+from monitor.models import ErrorMessage, PingLog, UptimeCheckResult
+from monitor.partitions import (
+    PARTITION_COLUMNS,
+    create_partitions,
+    default_partition_name,
+    is_partitioned,
+    partition_interval,
+    partitions_ahead,
+)
+import logging
+
+logger = logging.getLogger('monitor')
+
+TABLES = {"results": [UptimeCheckResult], "pings": [PingLog], "all": [UptimeCheckResult, PingLog]}
+
+
+def _index_name(name, suffix):
+    """`name` with `suffix`, within PostgreSQL's 63 character limit."""
+    return name[:63 - len(suffix)] + suffix
+
+
+class Command(BaseCommand):
+    help = (
+        "Converts the check result and ping log tables into tables partitioned "
+        "by day or week (PostgreSQL). Existing rows are copied in batches while "
+        "the old table stays in use, then the tables are swapped under a short "
+        "lock. Safe to interrupt and run again; the old table is kept as "
+        "<table>_unpartitioned until --drop-old."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--table',
+            choices=list(TABLES),
+            default='all',
+            help='Which tables to convert. Default is all.'
+        )
+        parser.add_argument(
+            '--interval',
+            choices=['day', 'week'],
+            help='Partition size. Defaults to LOG_PARTITION_INTERVAL.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50000,
+            help='Rows copied per transaction. Default is 50000.'
+        )
+        parser.add_argument(
+            '--drop-old',
+            action='store_true',
+            help='Drop the unpartitioned copies of already converted tables.'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Partitioned tables need PostgreSQL.")
+        interval = options['interval'] or partition_interval()
+
+        for model in TABLES[options['table']]:
+            table = model._meta.db_table
+            if is_partitioned(model):
+                if options['drop_old']:
+                    self.execute_sql(f"DROP TABLE IF EXISTS {self.quote(table + '_unpartitioned')}")
+                    self.stdout.write(f"Dropped {table}_unpartitioned")
+                else:
+                    self.stdout.write(f"{table} is already partitioned")
+                continue
+            self.convert(model, interval, options['batch_size'])
+
+    def quote(self, name):
+        return connection.ops.quote_name(name)
+
+    def execute_sql(self, sql, params=None):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchone() if cursor.description else None
+
+    def convert(self, model, interval, batch_size):
+        q = self.quote
+        table = model._meta.db_table
+        column = PARTITION_COLUMNS[model]
+        parent = next(field for field in model._meta.concrete_fields if field.many_to_one)
+        new = f"{table}_partitioned"
+        sequence = f"{new}_id_seq"
+
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, table)
+            # Partial indexes keep their WHERE clause
+            cursor.execute(
+                "SELECT c.relname, pg_get_expr(i.indpred, i.indrelid) FROM pg_index i "
+                "JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE i.indrelid = %s::regclass AND i.indpred IS NOT NULL",
+                [table],
+            )
+            predicates = dict(cursor.fetchall())
+        primary_key = next(name for name, info in constraints.items() if info['primary_key'])
+        indexes = {
+            name: info for name, info in constraints.items()
+            if info['index'] and not info['primary_key']
+        }
+
+        foreign_keys = {
+            field: next(
+                name for name, info in constraints.items()
+                if info['foreign_key'] and info['columns'] == [field.column]
+            )
+            for field in model._meta.concrete_fields if field.many_to_one
+        }
+
+        if not self.execute_sql("SELECT to_regclass(%s)", [new])[0]:
+            with transaction.atomic():
+                # No identity or serial default yet: the new table gets its own
+                # sequence, started after the old one at the swap
+                self.execute_sql(
+                    f"CREATE TABLE {q(new)} (LIKE {q(table)} INCLUDING DEFAULTS "
+                    f"INCLUDING CONSTRAINTS INCLUDING STORAGE) PARTITION BY RANGE ({q(column)})"
+                )
+                self.execute_sql(f"ALTER TABLE {q(new)} ALTER COLUMN id DROP DEFAULT")
+                self.execute_sql(f"ALTER TABLE {q(new)} ADD PRIMARY KEY (id, {q(column)})")
+                # Cascades in the database too: rows copied before their website
+                # (or heartbeat) is deleted must not block the delete
+                for field, foreign_key in foreign_keys.items():
+                    cascade = "ON DELETE CASCADE " if field.remote_field.on_delete is models.CASCADE else ""
+                    self.execute_sql(
+                        f"ALTER TABLE {q(new)} ADD CONSTRAINT {q(foreign_key)} "
+                        f"FOREIGN KEY ({q(field.column)}) "
+                        f"REFERENCES {q(field.related_model._meta.db_table)} (id) "
+                        f"{cascade}DEFERRABLE INITIALLY DEFERRED"
+                    )
+                for name, info in indexes.items():
+                    columns = ", ".join(
+                        f"{q(col)} {order}"
+                        for col, order in zip(info['columns'], info.get('orders') or ["ASC"] * len(info['columns']))
+                    )
+                    self.execute_sql(
+                        f"CREATE INDEX {q(_index_name(name, '_p'))} ON {q(new)} "
+                        f"USING {info['type']} ({columns})"
+                        f"{f' WHERE {predicates[name]}' if name in predicates else ''}"
+                    )
+                self.execute_sql(
+                    f"CREATE TABLE {q(default_partition_name(table))} PARTITION OF {q(new)} DEFAULT"
+                )
+                self.execute_sql(f"CREATE SEQUENCE {q(sequence)} OWNED BY {q(new)}.id")
+                self.execute_sql(
+                    f"ALTER TABLE {q(new)} ALTER COLUMN id SET DEFAULT nextval(%s)", [sequence]
+                )
+
+            # The oldest row by id is about the oldest by time; anything
+            # older still lands in the default partition
+            oldest = self.execute_sql(f"SELECT {q(column)} FROM {q(table)} ORDER BY id LIMIT 1")
+            current_time = timezone.now()
+            since = oldest[0] if oldest else current_time
+            until = current_time + timedelta(days=partitions_ahead() * (7 if interval == "week" else 1))
+            created = create_partitions(new, since, until, interval, prefix=table)
+            self.stdout.write(f"Created {new} with {len(created)} {interval} partitions")
+
+        copy = (
+            f"INSERT INTO {q(new)} SELECT o.* FROM {q(table)} o "
+            f"WHERE o.id > %s AND o.id <= %s AND EXISTS ("
+            f"SELECT 1 FROM {q(parent.related_model._meta.db_table)} p WHERE p.id = o.{q(parent.column)}"
+            f") ON CONFLICT DO NOTHING"
+        )
+
+        # Resumes after the rows a previous run copied
+        copied = self.execute_sql(f"SELECT COALESCE(MAX(id), 0) FROM {q(new)}")[0]
+        while True:
+            last = self.execute_sql(f"SELECT COALESCE(MAX(id), 0) FROM {q(table)}")[0]
+            if last - copied <= batch_size:
+                break
+            with transaction.atomic():
+                self.execute_sql(copy, [copied, copied + batch_size])
+            copied += batch_size
+            self.stdout.write(f"{table}: copied up to id {copied} of {last}")
+
+        with transaction.atomic():
+            # Writers wait from here to the commit; only the last batch is copied
+            self.execute_sql(f"LOCK TABLE {q(table)} IN ACCESS EXCLUSIVE MODE")
+            last = self.execute_sql(f"SELECT COALESCE(MAX(id), 0) FROM {q(table)}")[0]
+            self.execute_sql(copy, [copied, last])
+
+            old_sequence = self.execute_sql("SELECT pg_get_serial_sequence(%s, 'id')", [table])[0]
+            next_id = last + 1
+            if old_sequence:
+                next_id = max(next_id, self.execute_sql("SELECT nextval(%s)", [old_sequence])[0])
+            self.execute_sql("SELECT setval(%s, %s, false)", [sequence, next_id])
+
+            # The old copy must not keep unused error messages from being purged
+            for field, foreign_key in foreign_keys.items():
+                if field.related_model is ErrorMessage:
+                    self.execute_sql(f"ALTER TABLE {q(table)} DROP CONSTRAINT {q(foreign_key)}")
+            self.execute_sql(f"ALTER TABLE {q(table)} RENAME TO {q(table + '_unpartitioned')}")
+            for name in [primary_key, *indexes]:
+                self.execute_sql(f"ALTER INDEX {q(name)} RENAME TO {q(_index_name(name, '_old'))}")
+            self.execute_sql(f"ALTER TABLE {q(new)} RENAME TO {q(table)}")
+            for name in indexes:
+                self.execute_sql(f"ALTER INDEX {q(_index_name(name, '_p'))} RENAME TO {q(name)}")
+            self.execute_sql(f"ALTER INDEX {q(new + '_pkey')} RENAME TO {q(primary_key)}")
+
+        message = (
+            f"[✓] {table} is partitioned by {interval}; the old table is kept as "
+            f"{table}_unpartitioned until partition_logs --drop-old"
+        )
+        logger.info(message)
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,85 @@
+from collections import Counter
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from monitor.models import Website
+from monitor.schedule_wheel import ScheduleWheel, redis_backend_enabled
+import logging
+
+logger = logging.getLogger('monitor')
+
+
+def _busiest_second(moments):
+    """Largest number of checks starting in the same second of the minute."""
+    counts = Counter(int(moment.timestamp()) % 60 for moment in moments)
+    return max(counts.values(), default=0)
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves every active website's next check onto its own offset slot, "
+        "spreading checks that were aligned to the minute across the interval"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Websites updated per query. Default is 1000.'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would change without saving.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+
+        websites = Website.objects.filter(
+            is_active=True,
+            next_check_at__isnull=False
+        ).only(
+            'id', 'url', 'check_interval', 'check_interval_seconds', 'next_check_at'
+        ).order_by('id')
+
+        before, after, pending = [], [], []
+        moved = 0
+        for website in websites.iterator(chunk_size=batch_size):
+            before.append(website.next_check_at)
+
+            # First slot after the previous check, so the gap between two
+            # checks never exceeds the interval. A slot that already passed
+            # is checked right away and then follows its offset.
+            previous_check = website.next_check_at - timezone.timedelta(
+                seconds=website.interval_seconds
+            )
+            slot = website.next_check_after(previous_check)
+            after.append(slot)
+
+            if slot == website.next_check_at:
+                continue
+            website.next_check_at = slot
+            pending.append(website)
+            moved += 1
+
+            if len(pending) >= batch_size:
+                if not dry_run:
+                    Website.objects.bulk_update(pending, ['next_check_at'])
+                pending = []
+
+        if pending and not dry_run:
+            Website.objects.bulk_update(pending, ['next_check_at'])
+
+        # bulk_update skips the save signals that keep the Redis schedule in sync
+        if moved and not dry_run and redis_backend_enabled():
+            ScheduleWheel().rebuild()
+
+        prefix = "[dry run] Would move" if dry_run else "[✓] Moved"
+        message = (
+            f"{prefix} {moved} of {len(before)} websites; busiest second "
+            f"{_busiest_second(before)} -> {_busiest_second(after)} checks"
+        )
+        logger.info(message)
+        self.stdout.write(self.style.SUCCESS(message))
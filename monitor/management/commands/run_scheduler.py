@@ -0,0 +1,110 @@
+import signal
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from monitor.sharding import ShardCoordinator
+from monitor.schedule_wheel import ScheduleWheel, redis_backend_enabled
+from monitor.tasks import check_due_websites, check_due_heartbeats
+import logging
+
+logger = logging.getLogger('monitor')
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs a sharded scheduler node: dispatches due websites and heartbeats "
+        "for the shards this node owns. Run one per zone instead of celery beat's "
+        "check-due entries (set CHECK_DISPATCHER=run_scheduler); nodes share the "
+        "shards between them through Redis."
+    )
+    last_heartbeats = None  # time.monotonic() of the last heartbeat dispatch
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--node-id',
+            default=None,
+            help='Unique name of this node. Default is SCHEDULER_NODE_ID or host:pid.'
+        )
+        parser.add_argument(
+            '--tick',
+            type=float,
+            default=getattr(settings, "SCHEDULER_TICK_SECONDS", 10),
+            help='Seconds between dispatch rounds. Must be shorter than the shard lease.'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run a single dispatch round and exit.'
+        )
+
+    def handle(self, *args, **options):
+        coordinator = ShardCoordinator(node_id=options['node_id'])
+        self.running = True
+
+        def stop(signum, frame):
+            self.running = False
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        # With the Redis backend websites are popped every wheel tick, so
+        # sub-minute intervals run on time; shards and heartbeats keep --tick
+        use_wheel = redis_backend_enabled()
+        sleep_for = (
+            getattr(settings, "SCHEDULER_WHEEL_TICK_SECONDS", 1)
+            if use_wheel else options['tick']
+        )
+
+        self.stdout.write(f"Scheduler node {coordinator.node_id} starting")
+        if getattr(settings, "CHECK_DISPATCHER", "beat") != "run_scheduler":
+            self.stdout.write(self.style.WARNING(
+                "CHECK_DISPATCHER is not 'run_scheduler': if celery beat runs too, "
+                "due websites and heartbeats are dispatched twice"
+            ))
+        if use_wheel:
+            count = ScheduleWheel().rebuild()
+            self.stdout.write(f"Rebuilt website schedule with {count} websites")
+
+        try:
+            last_round = None
+            while self.running:
+                started = time.monotonic()
+                if last_round is None or started - last_round >= options['tick']:
+                    self.dispatch_round(coordinator)
+                    last_round = started
+                elif use_wheel:
+                    self.pop_websites()
+                if options['once']:
+                    break
+                time.sleep(max(0.0, sleep_for - (time.monotonic() - started)))
+        finally:
+            coordinator.release()
+            self.stdout.write(f"Scheduler node {coordinator.node_id} stopped")
+
+    def dispatch_round(self, coordinator):
+        shards = coordinator.refresh()
+        if not shards:
+            return
+
+        close_old_connections()
+        shards = sorted(shards)
+        try:
+            logger.info(check_due_websites(shards=shards))
+            # Heartbeats are not claimed: a round every tick would check an
+            # overdue one (and log its failure) several times a minute
+            now = time.monotonic()
+            last = self.last_heartbeats
+            if last is None or now - last >= getattr(settings, "SCHEDULER_HEARTBEAT_SECONDS", 60):
+                self.last_heartbeats = now
+                logger.info(check_due_heartbeats(shards=shards))
+        except Exception as e:
+            # Keep the node alive; the next round retries
+            logger.error(f"[!] Scheduler dispatch round failed: {e}", exc_info=True)
+
+    def pop_websites(self):
+        close_old_connections()
+        try:
+            check_due_websites()
+        except Exception as e:
+            logger.error(f"[!] Scheduler website pop failed: {e}", exc_info=True)
@@ -41,6 +41,14 @@ website_response_time_seconds = Histogram(
     registry=REGISTRY
 )
 
+website_check_phase_seconds = Histogram(
+    'uptime_website_check_phase_seconds',
+    'Time spent in each phase of a website check',
+    ['phase'],  # phase: queue, dns, connect, tls, ttfb, download
+    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0],
+    registry=REGISTRY
+)
+
 website_status = Gauge(
     'uptime_website_status',
     'Current status of website (1=up, 0=down)',
@@ -200,6 +208,108 @@ celery_worker_pool_size = Gauge(
     registry=REGISTRY
 )
 
+dispatch_duration_seconds = Histogram(
+    'uptime_dispatch_duration_seconds',
+    'Time a dispatcher run took to queue all due monitors',
+    ['monitor_type'],  # website, heartbeat
+    buckets=[0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0],
+    registry=REGISTRY
+)
+
+dispatched_monitors_total = Counter(
+    'uptime_dispatched_monitors_total',
+    'Total number of monitors queued for checking by dispatchers',
+    ['monitor_type'],
+    registry=REGISTRY
+)
+
+check_leases_reclaimed_total = Counter(
+    'uptime_check_leases_reclaimed_total',
+    'Website checks queued again after their lease expired without a result',
+    registry=REGISTRY
+)
+
+scheduler_owned_shards = Gauge(
+    'uptime_scheduler_owned_shards',
+    'Number of monitor shards owned by a scheduler node',
+    ['node'],
+    registry=REGISTRY
+)
+
+check_probes_shared_total = Counter(
+    'uptime_check_probes_shared_total',
+    'Website checks answered by another monitor\'s probe of the same URL',
+    registry=REGISTRY
+)
+
+check_host_throttled_total = Counter(
+    'uptime_check_host_throttled_total',
+    'Website checks that waited for their host\'s concurrency / rate budget',
+    registry=REGISTRY
+)
+
+check_host_throttle_wait_seconds = Histogram(
+    'uptime_check_host_throttle_wait_seconds',
+    'Time throttled website checks waited for their host\'s budget',
+    buckets=[0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0],
+    registry=REGISTRY
+)
+
+check_results_flushed_total = Counter(
+    'uptime_check_results_flushed_total',
+    'Buffered check results written to the database',
+    registry=REGISTRY
+)
+
+check_result_flush_duration_seconds = Histogram(
+    'uptime_check_result_flush_duration_seconds',
+    'Time one flush of the check result buffer took',
+    buckets=[0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0],
+    registry=REGISTRY
+)
+
+check_result_buffer_pending = Gauge(
+    'uptime_check_result_buffer_pending',
+    'Check results still waiting in the buffer after the last flush',
+    registry=REGISTRY
+)
+
+check_schedule_lag_seconds = Histogram(
+    'uptime_check_schedule_lag_seconds',
+    'How late website checks started compared with their scheduled slot',
+    ['interval', 'queue'],  # interval in seconds
+    buckets=[0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0],
+    registry=REGISTRY
+)
+
+check_confirmations_total = Counter(
+    'uptime_check_confirmations_total',
+    'Fast re-checks of websites whose last check failed',
+    ['outcome'],  # failed, passed
+    registry=REGISTRY
+)
+
+retention_deleted_rows_total = Counter(
+    'uptime_retention_deleted_rows_total',
+    'Expired rows deleted by the retention task',
+    ['table'],
+    registry=REGISTRY
+)
+
+retention_delete_rate = Gauge(
+    'uptime_retention_delete_rows_per_second',
+    'Rows per second of the last retention chunk deleted',
+    ['table'],
+    registry=REGISTRY
+)
+
+retention_checkpoint_id = Gauge(
+    'uptime_retention_checkpoint_id',
+    'Id up to which expired rows have been deleted',
+    ['table'],
+    registry=REGISTRY
+)
+
 # =================
 # BUSINESS METRICS
 # =================
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("monitor", "0006_heartbeat_last_downtime_at_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="uptimecheckresult",
+            name="connection_reused",
+            field=models.BooleanField(
+                blank=True,
+                help_text="Whether the check reused a pooled keep-alive connection (no TCP/TLS handshake in response_time_ms).",
+                null=True,
+            ),
+        ),
+    ]
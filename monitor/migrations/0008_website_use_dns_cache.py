@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("monitor", "0007_uptimecheckresult_connection_reused"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="website",
+            name="use_dns_cache",
+            field=models.BooleanField(
+                default=True,
+                help_text="Reuse cached DNS answers within their TTL. Disable to resolve on every check so DNS time counts toward the response time.",
+            ),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("monitor", "0008_website_use_dns_cache"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="uptimecheckresult",
+            name="connect_ms",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="uptimecheckresult",
+            name="dns_ms",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="uptimecheckresult",
+            name="download_ms",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="uptimecheckresult",
+            name="tls_ms",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="uptimecheckresult",
+            name="ttfb_ms",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
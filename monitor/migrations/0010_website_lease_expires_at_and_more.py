@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("monitor", "0009_uptimecheckresult_connect_ms_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="website",
+            name="lease_expires_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="Set while a dispatched check is in flight; an expired lease means the check was lost and is queued again.",
+                null=True,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="website",
+            index=models.Index(
+                fields=["lease_expires_at"], name="monitor_web_lease_e_4494d0_idx"
+            ),
+        ),
+    ]
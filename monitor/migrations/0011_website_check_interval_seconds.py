@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("monitor", "0010_website_lease_expires_at_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="website",
+            name="check_interval_seconds",
+            field=models.PositiveIntegerField(
+                blank=True,
+                choices=[(10, "10 seconds"), (30, "30 seconds")],
+                help_text="Sub-minute interval in seconds; overrides check_interval when set. Requires the Redis scheduler backend.",
+                null=True,
+            ),
+        ),
+    ]
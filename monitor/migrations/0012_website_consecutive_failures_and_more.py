@@ -0,0 +1,48 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:15
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("monitor", "0011_website_check_interval_seconds"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="website",
+            name="consecutive_failures",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="website",
+            name="consecutive_successes",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="website",
+            name="failure_threshold",
+            field=models.PositiveSmallIntegerField(
+                default=3,
+                help_text="Consecutive failed checks before the website is marked down.",
+                validators=[
+                    django.core.validators.MinValueValidator(1),
+                    django.core.validators.MaxValueValidator(10),
+                ],
+            ),
+        ),
+        migrations.AddField(
+            model_name="website",
+            name="recovery_threshold",
+            field=models.PositiveSmallIntegerField(
+                default=1,
+                help_text="Consecutive successful checks before a down website recovers.",
+                validators=[
+                    django.core.validators.MinValueValidator(1),
+                    django.core.validators.MaxValueValidator(10),
+                ],
+            ),
+        ),
+    ]
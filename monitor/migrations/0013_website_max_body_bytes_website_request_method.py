@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:16
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("monitor", "0012_website_consecutive_failures_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="website",
+            name="max_body_bytes",
+            field=models.PositiveIntegerField(
+                default=65536,
+                help_text="Most bytes of the body a GET_CAPPED check reads before it stops.",
+                validators=[django.core.validators.MaxValueValidator(10485760)],
+            ),
+        ),
+        migrations.AddField(
+            model_name="website",
+            name="request_method",
+            field=models.CharField(
+                choices=[
+                    ("HEAD", "HEAD (status only)"),
+                    ("GET", "GET, body discarded after the headers"),
+                    ("GET_CAPPED", "GET, body read up to max_body_bytes"),
+                ],
+                default="GET_CAPPED",
+                help_text="HEAD, GET without reading the body, or GET reading at most max_body_bytes.",
+                max_length=10,
+            ),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("monitor", "0013_website_max_body_bytes_website_request_method"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="website",
+            name="keyword",
+            field=models.CharField(
+                blank=True,
+                help_text="Case-sensitive text to look for in the first max_body_bytes of the body (empty = no content check).",
+                max_length=255,
+            ),
+        ),
+        migrations.AddField(
+            model_name="website",
+            name="keyword_assertion",
+            field=models.CharField(
+                choices=[
+                    ("MUST_CONTAIN", "Page must contain the keyword"),
+                    ("MUST_NOT_CONTAIN", "Page must not contain the keyword"),
+                ],
+                default="MUST_CONTAIN",
+                max_length=20,
+            ),
+        ),
+    ]
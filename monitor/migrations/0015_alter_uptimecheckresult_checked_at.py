@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:26
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("monitor", "0014_website_keyword_website_keyword_assertion"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="uptimecheckresult",
+            name="checked_at",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now, editable=False
+            ),
+        ),
+    ]
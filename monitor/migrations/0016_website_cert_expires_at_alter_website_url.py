@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:28
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("monitor", "0015_alter_uptimecheckresult_checked_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="website",
+            name="cert_expires_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="Expiry of the certificate seen by the last successful TLS check.",
+                null=True,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="website",
+            name="url",
+            field=models.CharField(
+                help_text="http(s):// URL, or tcp://host:port / tls://host:port to only check the port accepts connections (and completes a TLS handshake).",
+                max_length=200,
+                validators=[
+                    django.core.validators.URLValidator(
+                        schemes=["http", "https", "tcp", "tls"]
+                    )
+                ],
+            ),
+        ),
+    ]
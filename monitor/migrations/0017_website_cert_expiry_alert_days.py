@@ -0,0 +1,44 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:33
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("monitor", "0016_website_cert_expires_at_alter_website_url"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="website",
+            name="cert_expiry_alert_days",
+            field=models.PositiveSmallIntegerField(
+                default=14,
+                help_text="Alert this many days before the TLS certificate expires (0 = never).",
+                validators=[django.core.validators.MaxValueValidator(365)],
+            ),
+        ),
+        migrations.AlterField(
+            model_name="alert",
+            name="alert_type",
+            field=models.CharField(
+                choices=[
+                    ("downtime", "Downtime"),
+                    ("recovery", "Recovery"),
+                    ("cert_expiry", "Certificate expiry"),
+                ],
+                max_length=20,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="website",
+            name="cert_expires_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="Expiry of the certificate last seen on a new TLS connection to the host.",
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("monitor", "0017_website_cert_expiry_alert_days"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Checkpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100, unique=True)),
+                ("position", models.JSONField(default=dict)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="DailyCheckRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("bucket_start", models.DateTimeField()),
+                ("check_count", models.PositiveIntegerField(default=0)),
+                ("success_count", models.PositiveIntegerField(default=0)),
+                ("response_time_sum", models.FloatField(default=0)),
+                ("response_time_min", models.FloatField(blank=True, null=True)),
+                ("response_time_max", models.FloatField(blank=True, null=True)),
+                ("response_time_histogram", models.JSONField(default=dict)),
+                (
+                    "website",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="monitor.website",
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("website", "bucket_start"),
+                        name="monitor_dailycheckrollup_website_bucket",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="HourlyCheckRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("bucket_start", models.DateTimeField()),
+                ("check_count", models.PositiveIntegerField(default=0)),
+                ("success_count", models.PositiveIntegerField(default=0)),
+                ("response_time_sum", models.FloatField(default=0)),
+                ("response_time_min", models.FloatField(blank=True, null=True)),
+                ("response_time_max", models.FloatField(blank=True, null=True)),
+                ("response_time_histogram", models.JSONField(default=dict)),
+                (
+                    "website",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="monitor.website",
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("website", "bucket_start"),
+                        name="monitor_hourlycheckrollup_website_bucket",
+                    )
+                ],
+            },
+        ),
+    ]
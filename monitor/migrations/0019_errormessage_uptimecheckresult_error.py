@@ -0,0 +1,46 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:02
+"""
+First step of compacting the check results: error messages move to a table
+of their own. This only creates that table, adds the results' nullable
+error column and gives the old text column a database default, so writers
+on the new code can leave it out; none of it rewrites the results table.
+The backfill_error_messages command then points the existing results at
+their messages in batches, and 0020 drops the text column.
+"""
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("monitor", "0018_check_rollups"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ErrorMessage",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("message", models.TextField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name="uptimecheckresult",
+            name="error",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="monitor.errormessage",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="uptimecheckresult",
+            name="error_message",
+            field=models.TextField(blank=True, db_default=""),
+        ),
+    ]
@@ -0,0 +1,155 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:02
+"""
+Last step of compacting the check results: moves the error messages the
+backfill_error_messages command has not reached yet, drops the old text
+column, and narrows status_code to a smallint and response_time_ms to an
+integer.
+
+Expected lock time: on PostgreSQL the two type changes rewrite the results
+table and rebuild its indexes, in a single pass, while holding an ACCESS
+EXCLUSIVE lock. No check result can be saved until it commits, so expect
+checks to stall for about as long as copying the table takes, about a
+minute per 5-10 GB of pg_total_relation_size on SSD storage. Run
+backfill_error_messages first so the move finds nothing left, keep the
+result buffer (CHECK_RESULT_BUFFER="redis") on so checks queue up in Redis
+meanwhile, and pick a quiet hour.
+"""
+
+import hashlib
+from django.db import migrations, models
+from django.db.migrations.operations.base import Operation
+from django.db.models.functions import Round
+
+# ErrorMessage.key in SQL: the first 8 bytes of the MD5 as a signed bigint
+SQL_KEY = "('x' || left(md5(error_message), 16))::bit(64)::bigint"
+
+
+def error_key(message):
+    return int.from_bytes(hashlib.md5(message.encode()).digest()[:8], "big", signed=True)
+
+
+def move_error_messages(apps, schema_editor):
+    """Point every result the backfill has not reached at its ErrorMessage row."""
+    UptimeCheckResult = apps.get_model("monitor", "UptimeCheckResult")
+    ErrorMessage = apps.get_model("monitor", "ErrorMessage")
+    if schema_editor.connection.vendor == "postgresql":
+        results = schema_editor.quote_name(UptimeCheckResult._meta.db_table)
+        messages = schema_editor.quote_name(ErrorMessage._meta.db_table)
+        schema_editor.execute(
+            f"INSERT INTO {messages} (id, message) "
+            f"SELECT DISTINCT {SQL_KEY}, error_message FROM {results} "
+            f"WHERE error_message <> '' AND error_id IS NULL "
+            f"ON CONFLICT DO NOTHING"
+        )
+        # Checked now: deferred foreign key checks would block the ALTERs below
+        schema_editor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        schema_editor.execute(
+            f"UPDATE {results} SET error_id = {SQL_KEY} "
+            f"WHERE error_message <> '' AND error_id IS NULL"
+        )
+        schema_editor.execute("SET CONSTRAINTS ALL DEFERRED")
+        return
+
+    texts = list(
+        UptimeCheckResult.objects.exclude(error_message="").filter(error__isnull=True)
+        .values_list("error_message", flat=True).distinct()
+    )
+    for message in texts:
+        key = error_key(message)
+        ErrorMessage.objects.get_or_create(id=key, defaults={"message": message})
+        UptimeCheckResult.objects.filter(error_message=message, error__isnull=True).update(error_id=key)
+
+
+def restore_error_messages(apps, schema_editor):
+    UptimeCheckResult = apps.get_model("monitor", "UptimeCheckResult")
+    ErrorMessage = apps.get_model("monitor", "ErrorMessage")
+    for error in ErrorMessage.objects.all():
+        UptimeCheckResult.objects.filter(error_id=error.id).update(error_message=error.message)
+
+
+def round_response_times(apps, schema_editor):
+    # PostgreSQL rounds as the column changes type; SQLite would keep the fractions
+    if schema_editor.connection.vendor != "postgresql":
+        UptimeCheckResult = apps.get_model("monitor", "UptimeCheckResult")
+        UptimeCheckResult.objects.update(response_time_ms=Round("response_time_ms"))
+
+
+class CompactColumns(Operation):
+    """
+    The results' column type changes as one operation. PostgreSQL makes them
+    in a single ALTER TABLE, so the table is rewritten once rather than once
+    per column; other databases apply them one by one.
+    """
+
+    reduces_to_sql = False
+
+    def __init__(self, alterations):
+        self.alterations = alterations
+
+    def deconstruct(self):
+        return (self.__class__.__name__, [self.alterations], {})
+
+    def state_forwards(self, app_label, state):
+        for alteration in self.alterations:
+            alteration.state_forwards(app_label, state)
+
+    def _states(self, app_label, state):
+        """The state before each alteration, then the one after the last."""
+        states = [state]
+        for alteration in self.alterations:
+            state = state.clone()
+            alteration.state_forwards(app_label, state)
+            states.append(state)
+        return states
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != "postgresql":
+            states = self._states(app_label, from_state)
+            for alteration, before, after in zip(self.alterations, states, states[1:]):
+                alteration.database_forwards(app_label, schema_editor, before, after)
+            return
+
+        table = to_state.apps.get_model(app_label, "uptimecheckresult")._meta.db_table
+        check = schema_editor._create_index_name(table, ["response_time_ms"], suffix="_check")
+        schema_editor.execute(
+            f"ALTER TABLE {schema_editor.quote_name(table)} "
+            f"ALTER COLUMN status_code TYPE smallint, "
+            f"ALTER COLUMN response_time_ms TYPE integer USING round(response_time_ms)::integer, "
+            f"ADD CONSTRAINT {schema_editor.quote_name(check)} CHECK (response_time_ms >= 0)"
+        )
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        states = self._states(app_label, to_state)
+        for alteration, before, after in reversed(list(zip(self.alterations, states, states[1:]))):
+            alteration.database_backwards(app_label, schema_editor, after, before)
+
+    def describe(self):
+        return "Compact the column types of uptimecheckresult"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("monitor", "0019_errormessage_uptimecheckresult_error"),
+    ]
+
+    operations = [
+        migrations.RunPython(move_error_messages, restore_error_messages),
+        migrations.RemoveField(
+            model_name="uptimecheckresult",
+            name="error_message",
+        ),
+        migrations.RunPython(round_response_times, migrations.RunPython.noop),
+        CompactColumns([
+            migrations.AlterField(
+                model_name="uptimecheckresult",
+                name="response_time_ms",
+                field=models.PositiveIntegerField(),
+            ),
+            migrations.AlterField(
+                model_name="uptimecheckresult",
+                name="status_code",
+                field=models.SmallIntegerField(),
+            ),
+        ]),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:40
+"""
+Indexes the results' error column where it is set, so retention's purge of
+unused error messages, and the foreign key check of each message it
+deletes, look the results up instead of scanning the table.
+
+On PostgreSQL the index is built CONCURRENTLY, so checks keep being saved
+meanwhile. A table partition_logs has partitioned cannot be indexed
+concurrently; it is indexed under a SHARE lock instead, which holds up
+inserts until every partition is indexed.
+"""
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+def partitioned(schema_editor, model):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [model._meta.db_table],
+        )
+        return cursor.fetchone() is not None
+
+
+class AddIndexConcurrentlyIfSupported(AddIndexConcurrently):
+    """AddIndexConcurrently on plain PostgreSQL tables, AddIndex elsewhere."""
+
+    def concurrently(self, schema_editor, state, app_label):
+        return schema_editor.connection.vendor == "postgresql" and not partitioned(
+            schema_editor, state.apps.get_model(app_label, self.model_name)
+        )
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if self.concurrently(schema_editor, to_state, app_label):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if self.concurrently(schema_editor, from_state, app_label):
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("monitor", "0020_compact_check_results"),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyIfSupported(
+            model_name="uptimecheckresult",
+            index=models.Index(
+                condition=models.Q(("error__isnull", False)),
+                fields=["error"],
+                name="uptimecheckresult_error_idx",
+            ),
+        ),
+    ]
@@ -1,7 +1,13 @@
 from django.db import models
+from django.core.validators import MinValueValidator, MaxValueValidator, URLValidator
 from django.conf import settings
 from django.utils import timezone
 import uuid
+import math
+import zlib
+import hashlib
+from urllib.parse import urlsplit, urlunsplit
+from datetime import datetime, timezone as dt_timezone
 from django.contrib.auth.models import (
     AbstractBaseUser,
     PermissionsMixin,
@@ -104,12 +110,36 @@ CHECK_INTERVAL_CHOICES = [
     (60, '1 hour'),
 ]
 
+# Sub-minute intervals (in seconds) need the Redis scheduler backend,
+# the database dispatcher only runs once a minute
+SUB_MINUTE_INTERVAL_CHOICES = [
+    (10, '10 seconds'),
+    (30, '30 seconds'),
+]
+
 CRON_STATUS_CHOICES = [
     ("unknown", "Unknown"),  # never pinged
     ("up", "Up"),
     ("down", "Down"),
 ]
 
+# http(s) URLs get an HTTP check; tcp://host:port only tests that the port
+# accepts connections, tls://host:port also completes a TLS handshake
+MONITOR_URL_SCHEMES = ["http", "https", "tcp", "tls"]
+
+# How a website check requests the page
+REQUEST_METHOD_CHOICES = [
+    ("HEAD", "HEAD (status only)"),
+    ("GET", "GET, body discarded after the headers"),
+    ("GET_CAPPED", "GET, body read up to max_body_bytes"),
+]
+
+# What a keyword check asserts about the page body
+CONTENT_ASSERTION_CHOICES = [
+    ("MUST_CONTAIN", "Page must contain the keyword"),
+    ("MUST_NOT_CONTAIN", "Page must not contain the keyword"),
+]
+
 # Notification methods
 METHOD_CHOICES = [
     ("email", "Email"),
@@ -125,18 +155,62 @@ class Website(models.Model):
         related_name='websites'
     )
     name = models.CharField(max_length=100, blank=True, null=True)
-    url = models.URLField()
+    url = models.CharField(
+        max_length=200,
+        validators=[URLValidator(schemes=MONITOR_URL_SCHEMES)],
+        help_text="http(s):// URL, or tcp://host:port / tls://host:port to only"
+        " check the port accepts connections (and completes a TLS handshake)."
+    )
     check_interval = models.IntegerField(
         choices=CHECK_INTERVAL_CHOICES,
         default=5,
         help_text="How often (in minutes) to check the website."
     )
+    check_interval_seconds = models.PositiveIntegerField(
+        choices=SUB_MINUTE_INTERVAL_CHOICES,
+        null=True,
+        blank=True,
+        help_text="Sub-minute interval in seconds; overrides check_interval when set. "
+        "Requires the Redis scheduler backend."
+    )
     expected_status = models.IntegerField(default=200)  # some users expect 301/302.
     timeout_ms = models.IntegerField(
         default=5000,
         help_text="Maximum wait time (in milliseconds) for the request to respond,"
         " before you give up and mark it as failed."
     )
+    request_method = models.CharField(
+        max_length=10,
+        choices=REQUEST_METHOD_CHOICES,
+        default="GET_CAPPED",
+        help_text="HEAD, GET without reading the body, or GET reading at most max_body_bytes."
+    )
+    max_body_bytes = models.PositiveIntegerField(
+        default=64 * 1024,
+        validators=[MaxValueValidator(10 * 1024 * 1024)],
+        help_text="Most bytes of the body a GET_CAPPED check reads before it stops."
+    )
+    keyword = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Case-sensitive text to look for in the first max_body_bytes"
+        " of the body (empty = no content check)."
+    )
+    keyword_assertion = models.CharField(
+        max_length=20,
+        choices=CONTENT_ASSERTION_CHOICES,
+        default="MUST_CONTAIN"
+    )
+    cert_expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Expiry of the certificate last seen on a new TLS connection to the host."
+    )
+    cert_expiry_alert_days = models.PositiveSmallIntegerField(
+        default=14,
+        validators=[MaxValueValidator(365)],
+        help_text="Alert this many days before the TLS certificate expires (0 = never)."
+    )
     is_active = models.BooleanField(
         default=True,
         help_text="For maintenance/pause window, "
@@ -144,14 +218,38 @@ class Website(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     next_check_at = models.DateTimeField(null=True, blank=True)
+    lease_expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Set while a dispatched check is in flight; "
+        "an expired lease means the check was lost and is queued again."
+    )
+    use_dns_cache = models.BooleanField(
+        default=True,
+        help_text="Reuse cached DNS answers within their TTL. "
+        "Disable to resolve on every check so DNS time counts toward the response time."
+    )
     is_down = models.BooleanField(default=False)
     last_downtime_at = models.DateTimeField(null=True, blank=True)
     last_recovered_at = models.DateTimeField(null=True, blank=True)
+    failure_threshold = models.PositiveSmallIntegerField(
+        default=3,
+        validators=[MinValueValidator(1), MaxValueValidator(10)],
+        help_text="Consecutive failed checks before the website is marked down."
+    )
+    recovery_threshold = models.PositiveSmallIntegerField(
+        default=1,
+        validators=[MinValueValidator(1), MaxValueValidator(10)],
+        help_text="Consecutive successful checks before a down website recovers."
+    )
+    consecutive_failures = models.PositiveIntegerField(default=0)
+    consecutive_successes = models.PositiveIntegerField(default=0)
 
     class Meta:
         indexes = [
             models.Index(fields=['user']),
             models.Index(fields=['is_active', 'next_check_at']),
+            models.Index(fields=['lease_expires_at']),
             models.Index(fields=['created_at']),
         ]
         ordering = ['-created_at']  # default ordering
@@ -159,6 +257,108 @@ class Website(models.Model):
     def __str__(self):
         return self.name or self.url
 
+    @property
+    def monitor_type(self):
+        """http, tcp (connect only) or tls (connect and handshake), from the URL."""
+        scheme = self.url.split("://", 1)[0].lower()
+        return scheme if scheme in ("tcp", "tls") else "http"
+
+    @property
+    def interval_seconds(self):
+        return self.check_interval_seconds or self.check_interval * 60
+
+    @property
+    def schedule_offset_seconds(self):
+        """
+        Stable offset of this monitor's checks within its interval.
+        Derived from the id, so it survives restarts and differs between
+        monitors. With CHECK_ENGINE="async" it is derived from the URL
+        instead: monitors of one URL then share their slots, so they land in
+        the same batch and share one probe. The legacy engine probes every
+        monitor on its own, where shared slots would only bunch checks of a
+        popular host together against its host budget.
+        """
+        if getattr(settings, "CHECK_ENGINE", "legacy") == "async":
+            key = self.probe_url
+        else:
+            key = str(self.pk)
+        return zlib.crc32(key.encode()) % self.interval_seconds
+
+    @property
+    def probe_url(self):
+        """
+        The URL as it is requested: scheme and host are case-insensitive and
+        an empty path is "/", so https://Example.com and
+        https://example.com/ are one URL.
+        """
+        parts = urlsplit(self.url)
+        userinfo, at, host = parts.netloc.rpartition("@")
+        return urlunsplit((
+            parts.scheme.lower(), userinfo + at + host.lower(), parts.path or "/", parts.query, ""
+        ))
+
+    @property
+    def probe_key(self):
+        """Websites with equal keys are checked with one shared probe."""
+        return (
+            self.probe_url,
+            self.request_method,
+            self.max_body_bytes,
+            self.keyword,
+            self.keyword_assertion,
+            self.timeout_ms,
+            self.use_dns_cache,
+        )
+
+    def next_check_after(self, moment=None):
+        """
+        First scheduled check strictly after `moment`.
+        Slots are `offset + k * interval` seconds from the epoch, so checks
+        are spread across the interval instead of all firing on the minute.
+        """
+        moment = moment or timezone.now()
+        interval = self.interval_seconds
+        offset = self.schedule_offset_seconds
+        slot = math.floor((moment.timestamp() - offset) / interval) + 1
+        return datetime.fromtimestamp(slot * interval + offset, tz=dt_timezone.utc)
+
+
+class ErrorMessage(models.Model):
+    """
+    A distinct check error message. Results point at their message instead
+    of repeating the text ("Connection refused" millions of times); the key
+    is a hash of the text, so writers know it without looking it up.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    message = models.TextField()
+
+    @staticmethod
+    def key(message):
+        """First 8 bytes of the message's MD5 as a signed bigint (see migration 0020)."""
+        return int.from_bytes(hashlib.md5(message.encode()).digest()[:8], "big", signed=True)
+
+    @classmethod
+    def save_messages(cls, results):
+        """Store the messages new UptimeCheckResults point at, unless already stored."""
+        field = UptimeCheckResult._meta.get_field("error")
+        messages = {
+            result.error_id: result.error
+            for result in results
+            if result.error_id is not None and field.is_cached(result)
+        }
+        if messages:
+            cls.objects.bulk_create(messages.values(), ignore_conflicts=True)
+
+    def __str__(self):
+        return self.message
+
+
+class UptimeCheckResultQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        ErrorMessage.save_messages(objs)
+        return super().bulk_create(objs, *args, **kwargs)
+
 
 class UptimeCheckResult(models.Model):
     # STATUS_TYPES = [
@@ -171,31 +371,128 @@ class UptimeCheckResult(models.Model):
         on_delete=models.CASCADE,
         related_name='checks'
     )
-    status_code = models.IntegerField()
+    # Compact on purpose: there are a lot of these rows
+    status_code = models.SmallIntegerField()
     # status = models.CharField(max_length=20, choices=STATUS_TYPES, default="success")
-    error_message = models.TextField(blank=True)
+    # Null when the check raised no error; see the error_message property
+    error = models.ForeignKey(
+        ErrorMessage,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='+',
+        db_index=False
+    )
     ip = models.GenericIPAddressField(null=True, blank=True)
-    response_time_ms = models.FloatField()
-    checked_at = models.DateTimeField(auto_now_add=True)
+    response_time_ms = models.PositiveIntegerField()
+    connection_reused = models.BooleanField(
+        null=True,
+        blank=True,
+        help_text="Whether the check reused a pooled keep-alive connection "
+        "(no TCP/TLS handshake in response_time_ms)."
+    )
+    # Per-phase timings in milliseconds (null = phase did not run,
+    # e.g. no DNS/connect/TLS on a reused connection)
+    dns_ms = models.PositiveIntegerField(null=True, blank=True)
+    connect_ms = models.PositiveIntegerField(null=True, blank=True)
+    tls_ms = models.PositiveIntegerField(null=True, blank=True)
+    ttfb_ms = models.PositiveIntegerField(null=True, blank=True)
+    download_ms = models.PositiveIntegerField(null=True, blank=True)
+    # Not auto_now_add: buffered results are inserted later with their own time
+    checked_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    objects = UptimeCheckResultQuerySet.as_manager()
 
     class Meta:
         indexes = [
             models.Index(fields=['website', 'checked_at']),
+            # Which error messages are still in use (see monitor.retention)
+            models.Index(
+                fields=['error'],
+                name='uptimecheckresult_error_idx',
+                condition=models.Q(error__isnull=False),
+            ),
         ]
 
+    @property
+    def error_message(self):
+        """The error text, "" for none (select_related('error') when listing)."""
+        return self.error.message if self.error_id is not None else ""
+
+    @error_message.setter
+    def error_message(self, message):
+        self.error = ErrorMessage(id=ErrorMessage.key(message), message=message) if message else None
+
     @property
     def is_passed(self):
         return 200 <= self.status_code < 300
 
+    def save(self, *args, **kwargs):
+        ErrorMessage.save_messages([self])
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.website.url} - {self.status_code} at {self.checked_at}"
 
 
+class CheckRollup(models.Model):
+    """
+    Check results of one website aggregated over a UTC hour or day. Kept up
+    to date incrementally by monitor.rollups.rollup_check_results, so long
+    date ranges read a row per bucket instead of a row per check.
+    """
+    website = models.ForeignKey(
+        Website,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    bucket_start = models.DateTimeField()
+    check_count = models.PositiveIntegerField(default=0)
+    success_count = models.PositiveIntegerField(default=0)
+    response_time_sum = models.FloatField(default=0)
+    response_time_min = models.FloatField(null=True, blank=True)
+    response_time_max = models.FloatField(null=True, blank=True)
+    # Checks per log-scale response time bucket ({bucket index: count}),
+    # mergeable across buckets for percentiles (see monitor.rollups)
+    response_time_histogram = models.JSONField(default=dict)
+
+    class Meta:
+        abstract = True
+        constraints = [
+            models.UniqueConstraint(
+                fields=['website', 'bucket_start'],
+                name='%(app_label)s_%(class)s_website_bucket'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.website_id} @ {self.bucket_start}: {self.success_count}/{self.check_count}"
+
+
+class HourlyCheckRollup(CheckRollup):
+    pass
+
+
+class DailyCheckRollup(CheckRollup):
+    pass
+
+
+class Checkpoint(models.Model):
+    """Progress of a resumable background job, e.g. the last row it processed."""
+    name = models.CharField(max_length=100, unique=True)
+    position = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.position}"
+
+
 class Alert(models.Model):
     """Model to track alerts sent for various entities (Website, HeartBeat, etc.)"""
     ALERT_TYPES = [
         ("downtime", "Downtime"),
         ("recovery", "Recovery"),
+        ("cert_expiry", "Certificate expiry"),
     ]
 
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
@@ -0,0 +1,162 @@
+"""
+Time partitioning of the check result and ping log tables (PostgreSQL only).
+
+Deleting expired rows from tables of hundreds of millions of rows writes
+every deleted row to the WAL, bloats the table and holds locks for as long
+as the DELETE runs. Partitioned by day or week (LOG_PARTITION_INTERVAL) on
+checked_at / timestamp, retention is a DROP TABLE per expired partition
+instead: no WAL per row, no bloat, and a lock held for milliseconds.
+
+    monitor_uptimecheckresult              partitioned parent
+        monitor_uptimecheckresult_p20300601    [2030-06-01, 2030-06-02)
+        monitor_uptimecheckresult_p20300602    ...
+        monitor_uptimecheckresult_default      anything outside them
+
+`maintain_log_partitions` creates the next LOG_PARTITIONS_AHEAD partitions
+ahead of time and drops expired ones; the default partition only catches
+rows no partition was made for. Existing tables are converted online by
+`manage.py partition_logs`. Nothing changes for Django: the models keep
+their `id` primary key (the database's is (id, checked_at), since a
+partitioned table's keys must include its partition column).
+
+On other databases, or before a table is converted, everything here is a
+no-op and retention falls back to deleting rows.
+"""
+
+import re
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+from monitor.models import PingLog, UptimeCheckResult
+
+logger = logging.getLogger('monitor')
+
+# Partitioned models and the column they are partitioned on
+PARTITION_COLUMNS = {
+    UptimeCheckResult: "checked_at",
+    PingLog: "timestamp",
+}
+
+BOUND_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def partition_interval():
+    return getattr(settings, "LOG_PARTITION_INTERVAL", "day")
+
+
+def partitions_ahead():
+    return getattr(settings, "LOG_PARTITIONS_AHEAD", 7)
+
+
+def period_start(moment, interval):
+    """Start of the UTC day, or the week from Monday, `moment` falls in."""
+    day = moment.astimezone(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    return day - timedelta(days=day.weekday()) if interval == "week" else day
+
+
+def period_end(start, interval):
+    return start + timedelta(days=7 if interval == "week" else 1)
+
+
+def partition_name(table, start):
+    return f"{table}_p{start:%Y%m%d}"
+
+
+def default_partition_name(table):
+    return f"{table}_default"
+
+
+def _execute(sql, params=None):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall() if cursor.description else None
+
+
+def is_partitioned(model):
+    """True when `model`'s table is a partitioned PostgreSQL table."""
+    if connection.vendor != "postgresql":
+        return False
+    return bool(_execute(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+        [model._meta.db_table],
+    ))
+
+
+def partitions(table):
+    """(name, start, end) of `table`'s range partitions, oldest first."""
+    found = []
+    for name, bound in _execute(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = %s AND pg_table_is_visible(p.oid)",
+        [table],
+    ):
+        match = BOUND_RE.search(bound)
+        if match:  # not the default partition
+            start, end = (datetime.fromisoformat(value) for value in match.groups())
+            found.append((name, start, end))
+    return sorted(found, key=lambda partition: partition[1])
+
+
+def create_partitions(table, since, until, interval=None, prefix=None):
+    """
+    Create `table`'s partitions for every period from the one holding
+    `since` through the one holding `until`, skipping periods an existing
+    partition already covers. Partitions are named after `prefix` (default
+    `table`). Returns the names created.
+    """
+    interval = interval or partition_interval()
+    existing = [(start, end) for _, start, end in partitions(table)]
+    quote = connection.ops.quote_name
+
+    created = []
+    start = period_start(since, interval)
+    while start <= until:
+        end = period_end(start, interval)
+        if not any(start < other_end and other_start < end for other_start, other_end in existing):
+            name = partition_name(prefix or table, start)
+            try:
+                with transaction.atomic():
+                    _execute(
+                        f"CREATE TABLE {quote(name)} PARTITION OF {quote(table)} "
+                        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+                    )
+            except DatabaseError as e:
+                # e.g. the default partition already holds rows of this period
+                logger.error(f"Could not create partition {name}: {e}")
+            else:
+                created.append(name)
+        start = end
+    return created
+
+
+def ensure_partitions(model, ahead=None):
+    """Create `model`'s partitions from today through `ahead` periods from now."""
+    if not is_partitioned(model):
+        return []
+    interval = partition_interval()
+    ahead = partitions_ahead() if ahead is None else ahead
+    current_time = timezone.now()
+    until = current_time + timedelta(days=ahead * (7 if interval == "week" else 1))
+    return create_partitions(model._meta.db_table, current_time, until, interval)
+
+
+def drop_partitions_before(model, cutoff):
+    """
+    Drop `model`'s partitions that only hold rows older than `cutoff`.
+    Returns the names dropped; the partition holding `cutoff` is kept whole.
+    """
+    if not is_partitioned(model):
+        return []
+    quote = connection.ops.quote_name
+    dropped = []
+    for name, _, end in partitions(model._meta.db_table):
+        if end > cutoff:
+            break
+        _execute(f"DROP TABLE {quote(name)}")
+        logger.info(f"Dropped partition {name} (rows before {end.isoformat()})")
+        dropped.append(name)
+    return dropped
@@ -0,0 +1,281 @@
+"""
+Redis write buffer for website check results (CHECK_RESULT_BUFFER="redis").
+
+Without it every check costs an INSERT for its result and an UPDATE of its
+website, each in a transaction of its own. With it, workers still evaluate
+downtime / recovery and send alerts straight away, from the website row they
+loaded, but push the result and the website's new state onto a Redis list.
+`flush_check_results` drains the list in batches of CHECK_RESULT_FLUSH_SIZE:
+one bulk_create of results and one bulk_update of websites per batch. It
+runs every CHECK_RESULT_FLUSH_SECONDS, and as soon as a full batch is
+waiting.
+
+Buffered results live in Redis, so a worker crash loses nothing. A batch is
+moved to an in-flight list before it is written and only dropped after its
+transaction commits; a flush that dies half way leaves the batch for the
+next one (a crash right after the commit can write a batch twice). A batch
+that fails to write MAX_WRITE_ATTEMPTS times in a row is parked on the
+DEAD_LETTER_KEY list for inspection, so it cannot hold up the ones after it.
+
+A confirmation re-check builds on the streaks of the check before it, so
+it first writes that website's buffered entries itself (`write_pending`)
+instead of waiting for the next flush, which would otherwise overwrite the
+confirmation's state with the older one later.
+
+Keep CHECK_RESULT_FLUSH_SECONDS well below the shortest check interval:
+a website's lease is only released in the database once its result is
+flushed.
+"""
+
+import json
+import time
+import uuid
+import logging
+from dataclasses import asdict
+from datetime import datetime
+import redis
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from monitor import redis_utils
+from monitor.models import Website, UptimeCheckResult
+from monitor.utils import ProbeResult
+from monitor.helpers import record_result_flush
+
+logger = logging.getLogger('monitor')
+
+BUFFER_KEY = "buffer:check_results"
+INFLIGHT_KEY = "buffer:check_results:inflight"
+LOCK_KEY = "buffer:check_results:lock"
+ATTEMPTS_KEY = "buffer:check_results:inflight:attempts"
+DEAD_LETTER_KEY = "buffer:check_results:dead"
+LOCK_SECONDS = 60
+MAX_WRITE_ATTEMPTS = 3
+
+# Website fields a recorded result changes
+WEBSITE_STATE_FIELDS = [
+    "is_down",
+    "last_downtime_at",
+    "last_recovered_at",
+    "consecutive_failures",
+    "consecutive_successes",
+    "lease_expires_at",
+    "cert_expires_at",
+]
+_DATETIME_FIELDS = {
+    "last_downtime_at", "last_recovered_at", "lease_expires_at", "cert_expires_at"
+}
+
+# Move up to ARGV[1] buffered entries to the in-flight list and return them
+TAKE_SCRIPT = """
+local items = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #items > 0 then
+    redis.call('LTRIM', KEYS[1], #items, -1)
+    redis.call('RPUSH', KEYS[2], unpack(items))
+end
+return items
+"""
+
+# Only delete the lock if this flush still holds it
+UNLOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def buffer_enabled():
+    """True when check results are buffered in Redis."""
+    if redis_utils.r is None:
+        return False
+    return getattr(settings, "CHECK_RESULT_BUFFER", "none") == "redis"
+
+
+def flush_size():
+    return getattr(settings, "CHECK_RESULT_FLUSH_SIZE", 500)
+
+
+def result_row(website_id, result, checked_at=None):
+    """Unsaved UptimeCheckResult for a ProbeResult."""
+    row = UptimeCheckResult(
+        website_id=website_id,
+        status_code=result.status_code,
+        response_time_ms=round(result.response_time_ms),
+        error_message=result.error_message,
+        connection_reused=result.connection_reused,
+        ip=result.ip,
+        **{f"{phase}_ms": ms for phase, ms in result.timings.items()}
+    )
+    if checked_at is not None:
+        row.checked_at = checked_at
+    return row
+
+
+def _result_dict(items):
+    return {key: value for key, value in items if key != "cert_expires_at"}
+
+
+def _dump_state(website):
+    state = {}
+    for field in WEBSITE_STATE_FIELDS:
+        value = getattr(website, field)
+        state[field] = value.isoformat() if isinstance(value, datetime) else value
+    return state
+
+
+def _load_state(state):
+    return {
+        field: (
+            datetime.fromisoformat(value)
+            if field in _DATETIME_FIELDS and value is not None else value
+        )
+        for field, value in state.items()
+    }
+
+
+def buffer_check_results(checked, checked_at):
+    """
+    Queue (website, ProbeResult) pairs, with each website's current state,
+    for the next flush. Returns the number of results now waiting, or None
+    if Redis failed and the caller should write them itself.
+    """
+    pipe = redis_utils.r.pipeline(transaction=False)
+    for website, result in checked:
+        pipe.rpush(BUFFER_KEY, json.dumps({
+            "website_id": website.id,
+            "checked_at": checked_at.isoformat(),
+            # cert_expires_at travels with the website state
+            "result": asdict(result, dict_factory=_result_dict),
+            "state": _dump_state(website),
+        }))
+    try:
+        return pipe.execute()[-1]
+    except redis.RedisError as e:
+        logger.error(f"Redis error buffering {len(checked)} check results: {e}")
+        return None
+
+
+def _write(entries):
+    """Write one batch of buffered entries in a single transaction."""
+    entries = [json.loads(entry) for entry in entries]
+    states = {entry["website_id"]: entry["state"] for entry in entries}  # latest wins
+
+    with transaction.atomic():
+        # Websites deleted since their check have nothing to write to; the
+        # others stay locked, so none is deleted before the insert
+        existing = set(
+            Website.objects.select_for_update().filter(pk__in=list(states))
+            .order_by('pk').values_list('id', flat=True)
+        )
+        rows = [
+            result_row(
+                entry["website_id"],
+                ProbeResult(**entry["result"]),
+                datetime.fromisoformat(entry["checked_at"]),
+            )
+            for entry in entries
+            if entry["website_id"] in existing
+        ]
+        websites = [
+            Website(pk=website_id, **_load_state(state))
+            for website_id, state in states.items()
+            if website_id in existing
+        ]
+
+        UptimeCheckResult.objects.bulk_create(rows)
+        Website.objects.bulk_update(websites, WEBSITE_STATE_FIELDS)
+    return len(rows)
+
+
+def flush_buffered_results(batch_size=None, max_batches=100):
+    """
+    Write buffered results to the database, one batch per transaction,
+    until the buffer is empty or `max_batches` were written. Only one flush
+    runs at a time. Returns the number of results written.
+    """
+    client = redis_utils.r
+    if client is None:
+        return 0
+    batch_size = batch_size or flush_size()
+
+    token = uuid.uuid4().hex
+    if not client.set(LOCK_KEY, token, nx=True, ex=LOCK_SECONDS):
+        return 0
+
+    started = time.monotonic()
+    written = 0
+    try:
+        for _ in range(max_batches):
+            # A batch left over by a flush that died comes first
+            entries = client.lrange(INFLIGHT_KEY, 0, -1)
+            if not entries:
+                entries = client.eval(TAKE_SCRIPT, 2, BUFFER_KEY, INFLIGHT_KEY, batch_size)
+            if not entries:
+                break
+
+            try:
+                written += _write(entries)
+            except DatabaseError as e:
+                attempts = client.incr(ATTEMPTS_KEY)
+                if attempts < MAX_WRITE_ATTEMPTS:
+                    logger.error(
+                        f"Writing {len(entries)} buffered check results failed "
+                        f"(attempt {attempts}); retrying next flush: {e}"
+                    )
+                    break
+                logger.error(
+                    f"Parking {len(entries)} buffered check results on {DEAD_LETTER_KEY} "
+                    f"after {attempts} failed writes: {e}"
+                )
+                client.rpush(DEAD_LETTER_KEY, *entries)
+            client.delete(INFLIGHT_KEY, ATTEMPTS_KEY)
+            client.expire(LOCK_KEY, LOCK_SECONDS)
+        pending = client.llen(BUFFER_KEY)
+    finally:
+        client.eval(UNLOCK_SCRIPT, 1, LOCK_KEY, token)
+
+    record_result_flush(written, time.monotonic() - started, pending)
+    return written
+
+
+def write_pending(website_id):
+    """
+    Write the buffered entries of one website straight away, holding the
+    flush lock so no flush has any of them in flight meanwhile. Each call
+    reads the whole buffer, which a running flush keeps short. Returns the
+    number of results written; if the write fails, the entries go back to
+    the front of the buffer and the error is raised.
+    """
+    client = redis_utils.r
+    if client is None:
+        return 0
+
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + LOCK_SECONDS
+    try:
+        # A flush holds the lock for a batch or two; a dead one's lock expires
+        while not client.set(LOCK_KEY, token, nx=True, ex=LOCK_SECONDS):
+            if time.monotonic() > deadline:
+                logger.error(f"Gave up waiting for the flush lock to write website {website_id}'s results")
+                return 0
+            time.sleep(0.05)
+    except redis.RedisError as e:
+        logger.error(f"Redis error taking website {website_id}'s buffered results: {e}")
+        return 0
+
+    try:
+        pending = []
+        for key in (INFLIGHT_KEY, BUFFER_KEY):
+            for entry in client.lrange(key, 0, -1):
+                if json.loads(entry)["website_id"] == website_id:
+                    client.lrem(key, 1, entry)
+                    pending.append(entry)
+        if not pending:
+            return 0
+        try:
+            return _write(pending)
+        except DatabaseError:
+            client.lpush(BUFFER_KEY, *reversed(pending))
+            raise
+    finally:
+        client.eval(UNLOCK_SCRIPT, 1, LOCK_KEY, token)
@@ -0,0 +1,248 @@
+"""
+Chunked deletion of expired check results, ping logs and resolved alerts.
+
+A single `filter(...).delete()` over months of results holds its locks and
+writes its WAL for as long as it runs, and the ORM collector loads the rows
+before deleting them. Instead expired rows are deleted in primary key order,
+RETENTION_CHUNK_SIZE at a time, each with a raw `DELETE ... WHERE id IN
+(...)` of its own, pausing RETENTION_PAUSE_SECONDS between chunks so
+replicas and autovacuum keep up.
+
+Ids grow with time, so expired rows sit at the start of the table. A pass
+walks forward from a Checkpoint until it reaches rows that are not old
+enough yet, and remembers where it got to: a run that is stopped (or runs
+out of its RETENTION_MAX_SECONDS) resumes there, and the next day's pass
+starts there instead of re-reading the deleted part of the table. Old rows
+kept for another reason (an alert that is still active) hold the checkpoint
+back, so they are looked at again on the next pass.
+
+Partitioned tables (see monitor.partitions) drop whole partitions instead.
+
+Once check results are purged, error messages no remaining result points at
+are deleted too, each looked up in the results' partial index on error_id.
+
+With ARCHIVE_EXPIRED_LOGS on, check results and ping logs are archived to
+Parquet (see monitor.archive) first, and only rows of days already archived
+are deleted.
+"""
+
+import time
+import logging
+from dataclasses import dataclass
+from datetime import timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, ExpressionWrapper, Q, Value
+from django.utils import timezone
+from monitor.archive import archive_enabled, archive_expired, archived_until
+from monitor.models import Alert, Checkpoint, ErrorMessage, PingLog, UptimeCheckResult
+from monitor.partitions import drop_partitions_before, is_partitioned
+from monitor.helpers import record_retention_chunk
+
+logger = logging.getLogger('monitor')
+
+
+@dataclass
+class RetentionPolicy:
+    model: type
+    column: str  # time column rows expire by
+    days: int  # 0 keeps rows forever
+    keep: Q = None  # rows kept even when expired
+    archive: bool = False  # archived before deletion when ARCHIVE_EXPIRED_LOGS is on
+
+    @property
+    def table(self):
+        return self.model._meta.db_table
+
+
+@dataclass
+class PurgeResult:
+    table: str
+    deleted: int = 0
+    archived: int = 0
+    partitions: int = 0
+    estimate: int = None  # dry runs
+    finished: bool = False
+
+
+def chunk_size():
+    return getattr(settings, "RETENTION_CHUNK_SIZE", 5000)
+
+
+def pause_seconds():
+    return getattr(settings, "RETENTION_PAUSE_SECONDS", 0.2)
+
+
+def max_seconds():
+    return getattr(settings, "RETENTION_MAX_SECONDS", 900)
+
+
+def retention_policies(result_days=90):
+    """What expires when: results after `result_days`, the rest from settings."""
+    return [
+        RetentionPolicy(UptimeCheckResult, "checked_at", result_days, archive=True),
+        RetentionPolicy(
+            PingLog, "timestamp", getattr(settings, "PING_LOG_RETENTION_DAYS", 90), archive=True,
+        ),
+        RetentionPolicy(
+            Alert, "created_at", getattr(settings, "ALERT_RETENTION_DAYS", 180),
+            keep=Q(is_active=True),
+        ),
+    ]
+
+
+def checkpoint_name(policy):
+    return f"retention:{policy.table}"
+
+
+def estimate_expired(policy, cutoff, after_id=0):
+    """
+    Rows a purge would delete. PostgreSQL's planner estimate, which costs
+    nothing, elsewhere an exact count.
+    """
+    queryset = policy.model.objects.filter(pk__gt=after_id, **{f"{policy.column}__lt": cutoff})
+    if policy.keep:
+        queryset = queryset.exclude(policy.keep)
+    if connection.vendor != "postgresql":
+        return queryset.count()
+    sql, params = queryset.values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def _delete(policy, ids):
+    quote = connection.ops.quote_name
+    placeholders = ", ".join(["%s"] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {quote(policy.table)} "
+            f"WHERE {quote(policy.model._meta.pk.column)} IN ({placeholders})",
+            ids,
+        )
+        return cursor.rowcount
+
+
+def purge_expired(policy, size=None, pause=None, deadline=None, dry_run=False):
+    """
+    Delete `policy`'s expired rows, chunk by chunk from its checkpoint, until
+    none are left or `deadline` (a time.monotonic() value) passes.
+    """
+    result = PurgeResult(policy.table)
+    if not policy.days:
+        result.finished = True
+        return result
+
+    cutoff = timezone.now() - timedelta(days=policy.days)
+    if policy.archive and archive_enabled():
+        if not dry_run:
+            result.archived = archive_expired(policy.model, cutoff, deadline=deadline)
+        # Nothing goes that is not in the archive yet
+        until = archived_until(policy.model)
+        if dry_run or until is None:
+            until = cutoff.astimezone(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        cutoff = min(cutoff, until)
+
+    if is_partitioned(policy.model):
+        if not dry_run:
+            result.partitions = len(drop_partitions_before(policy.model, cutoff))
+        result.finished = True
+        return result
+
+    if dry_run:
+        checkpoint = Checkpoint.objects.filter(name=checkpoint_name(policy)).first()
+        last_id = checkpoint.position.get("last_id", 0) if checkpoint else 0
+        result.estimate = estimate_expired(policy, cutoff, last_id)
+        return result
+
+    checkpoint, _ = Checkpoint.objects.get_or_create(name=checkpoint_name(policy))
+    last_id = checkpoint.position.get("last_id", 0)
+
+    size = size or chunk_size()
+    pause = pause_seconds() if pause is None else pause
+    old = ExpressionWrapper(Q(**{f"{policy.column}__lt": cutoff}), output_field=BooleanField())
+    kept = (
+        ExpressionWrapper(policy.keep, output_field=BooleanField())
+        if policy.keep else Value(False)
+    )
+
+    position = last_id
+    held_back = None  # first old row kept, where the next pass starts
+    while deadline is None or time.monotonic() < deadline:
+        rows = list(
+            policy.model.objects.filter(pk__gt=position).order_by('pk').annotate(
+                old=old, kept=kept
+            ).values_list('pk', 'old', 'kept')[:size]
+        )
+        if not rows:
+            result.finished = True
+            break
+
+        started = time.monotonic()
+        expired = [pk for pk, is_old, is_kept in rows if is_old and not is_kept]
+        if expired:
+            result.deleted += _delete(policy, expired)
+        if held_back is None:
+            held_back = next((pk for pk, is_old, is_kept in rows if is_old and is_kept), None)
+
+        # Rows from the first one not old enough onwards wait for a later pass
+        young = next((pk for pk, is_old, _ in rows if not is_old), None)
+        position = rows[-1][0] if young is None else young - 1
+        last_id = position if held_back is None else min(position, held_back - 1)
+        checkpoint.position = {"last_id": last_id}
+        checkpoint.save(update_fields=["position", "updated_at"])
+        record_retention_chunk(policy.table, len(expired), time.monotonic() - started, last_id)
+
+        if young is not None or len(rows) < size:
+            result.finished = True
+            break
+        if pause:
+            time.sleep(pause)
+
+    logger.info(
+        f"Retention deleted {result.deleted} rows from {policy.table}"
+        f"{'' if result.finished else ', to be continued'}"
+    )
+    return result
+
+
+def purge_unused_messages(dry_run=False):
+    """
+    Delete the ErrorMessage rows no check result points at any more. A
+    writer reusing one of them as it goes fails its foreign key check at
+    commit; the result buffer keeps the batch in flight and the next flush
+    stores the message again.
+    """
+    result = PurgeResult(ErrorMessage._meta.db_table, finished=True)
+    quote = connection.ops.quote_name
+    unused = (
+        f"FROM {quote(result.table)} WHERE NOT EXISTS ("
+        f"SELECT 1 FROM {quote(UptimeCheckResult._meta.db_table)} AS result "
+        f"WHERE result.{quote(UptimeCheckResult._meta.get_field('error').column)} "
+        f"= {quote(result.table)}.{quote(ErrorMessage._meta.pk.column)})"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) {unused}" if dry_run else f"DELETE {unused}")
+        if dry_run:
+            result.estimate = cursor.fetchone()[0]
+        else:
+            result.deleted = cursor.rowcount
+    return result
+
+
+def purge_all(result_days=90, size=None, pause=None, seconds=None, dry_run=False, tables=None):
+    """
+    Purge every table with a retention period, sharing one time budget.
+    `tables` limits it to some db_table names. Returns a PurgeResult per table.
+    """
+    seconds = max_seconds() if seconds is None else seconds
+    deadline = time.monotonic() + seconds if seconds else None
+    results = [
+        purge_expired(policy, size, pause, deadline, dry_run)
+        for policy in retention_policies(result_days)
+        if tables is None or policy.table in tables
+    ]
+    if any(result.table == UptimeCheckResult._meta.db_table for result in results):
+        results.append(purge_unused_messages(dry_run))
+    return results
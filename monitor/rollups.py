@@ -0,0 +1,318 @@
+"""
+Hourly and daily rollups of website check results.
+
+Uptime and response-time series over long ranges used to scan every raw
+UptimeCheckResult in the range: 43k rows for 30 days of a 1-minute monitor.
+`rollup_check_results` (every few minutes) folds new results into one
+HourlyCheckRollup and one DailyCheckRollup row per website per UTC bucket,
+so a range reads at most a few hundred rows however long it is:
+
+    range up to ROLLUP_RAW_MAX_HOURS      raw results, one point per check
+    range up to ROLLUP_HOURLY_MAX_DAYS    hourly rollups
+    longer                                daily rollups
+
+Each rollup keeps counts, the sum / min / max of response times and a
+log-scale histogram of them. Histograms merge exactly, so percentiles over
+any set of buckets are within one histogram bucket (HISTOGRAM_GROWTH, 25%)
+of the true value.
+
+Only new rows are read: the rollup remembers the last result id it folded in
+(a Checkpoint). Ids are handed out before their transactions commit, so a
+run only goes up to the highest id seen by the run before it, which leaves
+writers one rollup interval to commit. Rows past the checkpoint are read raw
+and folded into the series on the fly, so series are never behind.
+"""
+
+import math
+import time
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BooleanField, Count, ExpressionWrapper, Max, Q, Sum
+from monitor.models import (
+    Checkpoint,
+    DailyCheckRollup,
+    HourlyCheckRollup,
+    UptimeCheckResult,
+    Website,
+)
+
+logger = logging.getLogger('monitor')
+
+CHECKPOINT = "rollup:check_results"
+
+# Failed keyword checks keep their 200, so an error message fails a check too
+PASSED_CHECK = Q(status_code__gte=200, status_code__lt=300, error__isnull=True)
+
+# Histogram bucket i holds response times up to HISTOGRAM_GROWTH ** i ms
+HISTOGRAM_GROWTH = 1.25
+HISTOGRAM_BUCKETS = 64  # the last one holds everything above ~1.6M ms
+
+ROLLUP_MODELS = {"hour": HourlyCheckRollup, "day": DailyCheckRollup}
+ROLLUP_FIELDS = [
+    "check_count",
+    "success_count",
+    "response_time_sum",
+    "response_time_min",
+    "response_time_max",
+    "response_time_histogram",
+]
+
+
+def histogram_bucket(ms):
+    if ms <= 1:
+        return 0
+    return min(math.ceil(math.log(ms, HISTOGRAM_GROWTH)), HISTOGRAM_BUCKETS - 1)
+
+
+def truncate(moment, resolution):
+    """Start of the UTC hour or day `moment` falls in."""
+    moment = moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0) if resolution == "day" else moment
+
+
+@dataclass
+class Aggregate:
+    """Checks of one bucket (or of several merged ones)."""
+    checks: int = 0
+    successes: int = 0
+    total_ms: float = 0
+    min_ms: float = None
+    max_ms: float = None
+    # JSON object keys are strings, so histogram keys are too
+    histogram: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_rollup(cls, rollup):
+        return cls(
+            checks=rollup.check_count,
+            successes=rollup.success_count,
+            total_ms=rollup.response_time_sum,
+            min_ms=rollup.response_time_min,
+            max_ms=rollup.response_time_max,
+            histogram=dict(rollup.response_time_histogram),
+        )
+
+    def add(self, passed, ms):
+        self.checks += 1
+        self.successes += bool(passed)
+        self.total_ms += ms
+        self.min_ms = ms if self.min_ms is None else min(self.min_ms, ms)
+        self.max_ms = ms if self.max_ms is None else max(self.max_ms, ms)
+        key = str(histogram_bucket(ms))
+        self.histogram[key] = self.histogram.get(key, 0) + 1
+
+    def merge(self, other):
+        self.checks += other.checks
+        self.successes += other.successes
+        self.total_ms += other.total_ms
+        for bound, pick in (("min_ms", min), ("max_ms", max)):
+            values = [v for v in (getattr(self, bound), getattr(other, bound)) if v is not None]
+            setattr(self, bound, pick(values) if values else None)
+        for key, count in other.histogram.items():
+            self.histogram[key] = self.histogram.get(key, 0) + count
+        return self
+
+    def apply_to(self, rollup):
+        rollup.check_count = self.checks
+        rollup.success_count = self.successes
+        rollup.response_time_sum = self.total_ms
+        rollup.response_time_min = self.min_ms
+        rollup.response_time_max = self.max_ms
+        rollup.response_time_histogram = self.histogram
+        return rollup
+
+    @property
+    def uptime_percentage(self):
+        return self.successes / self.checks * 100 if self.checks else 0
+
+    @property
+    def avg_ms(self):
+        return self.total_ms / self.checks if self.checks else None
+
+    def percentile(self, pct):
+        """Upper bound of the histogram bucket holding the `pct` percentile."""
+        if not self.checks:
+            return None
+        rank = max(1, math.ceil(pct / 100 * self.checks))
+        seen = 0
+        for key in sorted(self.histogram, key=int):
+            seen += self.histogram[key]
+            if seen >= rank:
+                return min(max(HISTOGRAM_GROWTH ** int(key), self.min_ms), self.max_ms)
+        return self.max_ms
+
+
+def raw_max_hours():
+    return getattr(settings, "ROLLUP_RAW_MAX_HOURS", 48)
+
+
+def hourly_max_days():
+    return getattr(settings, "ROLLUP_HOURLY_MAX_DAYS", 31)
+
+
+def rollup_batch_size():
+    return getattr(settings, "ROLLUP_BATCH_SIZE", 20000)
+
+
+def series_resolution(start, end):
+    """"raw", "hour" or "day": what a series from start to end is read from."""
+    span = end - start
+    if span <= timedelta(hours=raw_max_hours()):
+        return "raw"
+    if span <= timedelta(days=hourly_max_days()):
+        return "hour"
+    return "day"
+
+
+def rolled_up_id():
+    """Id of the last check result folded into the rollups (0 if none)."""
+    checkpoint = Checkpoint.objects.filter(name=CHECKPOINT).first()
+    return checkpoint.position.get("last_id", 0) if checkpoint else 0
+
+
+def _passed_results(queryset):
+    return queryset.annotate(
+        passed=ExpressionWrapper(PASSED_CHECK, output_field=BooleanField())
+    )
+
+
+def _merge_into(model, aggregates):
+    """Add {(website_id, bucket_start): Aggregate} to `model`'s rollup rows."""
+    existing = {
+        (rollup.website_id, rollup.bucket_start): rollup
+        for rollup in model.objects.filter(
+            website_id__in={website_id for website_id, _ in aggregates},
+            bucket_start__in={bucket for _, bucket in aggregates},
+        )
+    }
+    updated = []
+    created = []
+    for (website_id, bucket), aggregate in aggregates.items():
+        rollup = existing.get((website_id, bucket))
+        if rollup is None:
+            created.append(aggregate.apply_to(model(website_id=website_id, bucket_start=bucket)))
+        else:
+            updated.append(Aggregate.from_rollup(rollup).merge(aggregate).apply_to(rollup))
+    model.objects.bulk_create(created)
+    model.objects.bulk_update(updated, ROLLUP_FIELDS)
+
+
+def _rollup_batch(last_id, fence, batch_size):
+    """Fold results last_id < id <= fence into the rollups; returns (rows, new last_id)."""
+    rows = list(
+        _passed_results(
+            UptimeCheckResult.objects.filter(pk__gt=last_id, pk__lte=fence)
+        ).order_by('pk').values_list(
+            'pk', 'website_id', 'checked_at', 'passed', 'response_time_ms'
+        )[:batch_size]
+    )
+    if not rows:
+        return 0, last_id
+
+    # Websites deleted since have no rollups to write to
+    existing = set(
+        Website.objects.filter(pk__in={row[1] for row in rows}).values_list('id', flat=True)
+    )
+    for resolution, model in ROLLUP_MODELS.items():
+        aggregates = defaultdict(Aggregate)
+        for _, website_id, checked_at, passed, ms in rows:
+            if website_id in existing:
+                aggregates[(website_id, truncate(checked_at, resolution))].add(passed, ms)
+        _merge_into(model, aggregates)
+    return len(rows), rows[-1][0]
+
+
+def rollup_check_results(batch_size=None, max_batches=50):
+    """
+    Fold check results saved since the last run into the hourly and daily
+    rollups, one transaction per batch. Returns the number of results read.
+    """
+    batch_size = batch_size or rollup_batch_size()
+    Checkpoint.objects.get_or_create(name=CHECKPOINT)
+
+    started = time.monotonic()
+    total = 0
+    for _ in range(max_batches):
+        with transaction.atomic():
+            # The lock keeps a second rollup from folding the same rows in
+            checkpoint = Checkpoint.objects.select_for_update().get(name=CHECKPOINT)
+            last_id = checkpoint.position.get("last_id", 0)
+            fence = checkpoint.position.get("fence_id")
+
+            count = 0
+            if fence is not None:
+                count, last_id = _rollup_batch(last_id, fence, batch_size)
+            caught_up = fence is None or count < batch_size
+            if caught_up:
+                # Rows up to the current last id get until the next run to commit
+                fence = UptimeCheckResult.objects.aggregate(last=Max('pk'))['last'] or 0
+            checkpoint.position = {"last_id": last_id, "fence_id": fence}
+            checkpoint.save(update_fields=["position", "updated_at"])
+        total += count
+        if caught_up:
+            break
+
+    if total:
+        logger.info(f"Rolled up {total} check results in {time.monotonic() - started:.2f}s")
+    return total
+
+
+def check_series(start, end, resolution, **filters):
+    """
+    {bucket_start: Aggregate} of the check results matching `filters` (e.g.
+    website=..., website__user=...) from start to end, per hour or day.
+    Buckets are whole: the first one starts at or before `start`.
+    """
+    first_bucket = truncate(start, resolution)
+    buckets = defaultdict(Aggregate)
+    for rollup in ROLLUP_MODELS[resolution].objects.filter(
+        bucket_start__gte=first_bucket, bucket_start__lte=end, **filters
+    ):
+        buckets[rollup.bucket_start].merge(Aggregate.from_rollup(rollup))
+
+    # Results not rolled up yet
+    for checked_at, passed, ms in _passed_results(
+        UptimeCheckResult.objects.filter(
+            pk__gt=rolled_up_id(), checked_at__gte=first_bucket, checked_at__lte=end, **filters
+        )
+    ).values_list('checked_at', 'passed', 'response_time_ms'):
+        buckets[truncate(checked_at, resolution)].add(passed, ms)
+    return dict(sorted(buckets.items()))
+
+
+def uptime_by_website(since, **filters):
+    """
+    {website_id: Aggregate} of check counts since `since` (to the hour) for
+    the websites matching `filters`, from hourly rollups plus newer results.
+    Only checks and successes are filled in.
+    """
+    first_bucket = truncate(since, "hour")
+    totals = defaultdict(Aggregate)
+    rolled_up = HourlyCheckRollup.objects.filter(
+        bucket_start__gte=first_bucket, **filters
+    ).values('website_id').annotate(
+        checks=Sum('check_count'), successes=Sum('success_count')
+    )
+    recent = UptimeCheckResult.objects.filter(
+        pk__gt=rolled_up_id(), checked_at__gte=first_bucket, **filters
+    ).values('website_id').annotate(
+        checks=Count('pk'), successes=Count('pk', filter=PASSED_CHECK)
+    )
+    for counts in (rolled_up, recent):
+        for row in counts:
+            totals[row['website_id']].merge(
+                Aggregate(checks=row['checks'], successes=row['successes'])
+            )
+    return totals
+
+
+def total_of(aggregates):
+    """One Aggregate for several buckets."""
+    total = Aggregate()
+    for aggregate in aggregates:
+        total.merge(aggregate)
+    return total
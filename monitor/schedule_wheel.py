@@ -0,0 +1,137 @@
+"""
+Redis scheduler backend for website checks (CHECK_SCHEDULER_BACKEND="redis").
+
+Instead of polling Postgres for due rows, every active website's next run
+time lives in one Redis sorted set (member = website id, score = unix time
+of next_check_at). Dispatchers pop due members atomically, so only websites
+that are actually due ever reach the database, and a scheduler ticking every
+second (`manage.py run_scheduler`) can serve 10s / 30s intervals.
+
+- Popping re-scores a member to now + CHECK_LEASE_SECONDS, so a check that
+  is lost before recording its result comes due again.
+- Website saves and deletes keep the set in sync (see signals), including
+  the save that records each check result.
+- `rebuild()` reloads the set from the database; run_scheduler calls it on
+  startup.
+"""
+
+import logging
+import redis
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from monitor import redis_utils
+from monitor.models import Website
+
+logger = logging.getLogger('monitor')
+
+SCHEDULE_KEY = "schedule:websites"
+
+# Pop members due by ARGV[1] (at most ARGV[2]) and push them ARGV[3]
+# seconds past max(score, ARGV[4]) until their result reschedules them
+POP_DUE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'WITHSCORES', 'LIMIT', 0, ARGV[2])
+for i = 1, #due, 2 do
+    local score = math.max(tonumber(due[i + 1]), tonumber(ARGV[4]))
+    redis.call('ZADD', KEYS[1], score + tonumber(ARGV[3]), due[i])
+end
+return due
+"""
+
+
+def redis_backend_enabled():
+    """True when website checks are scheduled through Redis."""
+    if redis_utils.r is None:
+        return False
+    return getattr(settings, "CHECK_SCHEDULER_BACKEND", "database") == "redis"
+
+
+class ScheduleWheel:
+    """The sorted set of website run times."""
+
+    def __init__(self, redis_client=None, key=SCHEDULE_KEY):
+        self.redis = redis_client if redis_client is not None else redis_utils.r
+        self.key = key
+
+    def schedule(self, website):
+        """Add or move `website`, or drop it if it should not be checked."""
+        if not website.is_active or website.next_check_at is None:
+            self.unschedule(website.pk)
+            return
+        self.redis.zadd(self.key, {website.pk: website.next_check_at.timestamp()})
+
+    def unschedule(self, website_id):
+        self.redis.zrem(self.key, website_id)
+
+    def pop_due(self, due_by, limit, lease_seconds, current_time):
+        """
+        Take up to `limit` websites due by `due_by`.
+        Returns {website id: scheduled run time}.
+        """
+        popped = self.redis.eval(
+            POP_DUE_SCRIPT,
+            1,
+            self.key,
+            due_by.timestamp(),
+            limit,
+            lease_seconds,
+            current_time.timestamp(),
+        )
+        return {
+            int(popped[i]): datetime.fromtimestamp(float(popped[i + 1]), tz=dt_timezone.utc)
+            for i in range(0, len(popped), 2)
+        }
+
+    def rebuild(self, chunk_size=5000):
+        """
+        Reload every active website from the database. The new set is built
+        under a temporary key and swapped in, so pops never see it half-built.
+        Returns the number of scheduled websites.
+        """
+        tmp_key = f"{self.key}:rebuild"
+        self.redis.delete(tmp_key)
+
+        websites = Website.objects.filter(
+            is_active=True,
+            next_check_at__isnull=False
+        ).values_list('id', 'next_check_at')
+
+        count = 0
+        pipe = self.redis.pipeline(transaction=False)
+        for website_id, next_check_at in websites.iterator(chunk_size=chunk_size):
+            pipe.zadd(tmp_key, {website_id: next_check_at.timestamp()})
+            count += 1
+            if count % chunk_size == 0:
+                pipe.execute()
+        pipe.execute()
+
+        if count:
+            self.redis.rename(tmp_key, self.key)
+        else:
+            self.redis.delete(self.key)
+
+        logger.info(f"Rebuilt website schedule with {count} websites")
+        return count
+
+    def __len__(self):
+        return self.redis.zcard(self.key)
+
+
+def sync_website(website):
+    """Mirror a saved website into the schedule (no-op with the database backend)."""
+    if not redis_backend_enabled():
+        return
+    try:
+        ScheduleWheel().schedule(website)
+    except redis.RedisError as e:
+        # The next rebuild (or the website's next save) repairs the entry
+        logger.error(f"Redis error scheduling website {website.pk}: {e}")
+
+
+def unsync_website(website_id):
+    """Remove a deleted website from the schedule."""
+    if not redis_backend_enabled():
+        return
+    try:
+        ScheduleWheel().unschedule(website_id)
+    except redis.RedisError as e:
+        logger.error(f"Redis error unscheduling website {website_id}: {e}")
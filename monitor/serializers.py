@@ -2,6 +2,7 @@ from rest_framework import serializers
 from .models import (
     Website,
     CHECK_INTERVAL_CHOICES,
+    SUB_MINUTE_INTERVAL_CHOICES,
     UptimeCheckResult,
     NotificationPreference,
     HeartBeat
@@ -14,6 +15,7 @@ from django.contrib.auth.tokens import default_token_generator
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from .alerts import send_password_reset_email_task
+from .schedule_wheel import redis_backend_enabled
 from django.conf import settings
 
 User = get_user_model()
@@ -137,6 +139,7 @@ class RegisterSerializer(serializers.ModelSerializer):
 
 class WebsiteSerializer(serializers.ModelSerializer):
     check_interval_display = serializers.SerializerMethodField()
+    monitor_type = serializers.ReadOnlyField()
 
     class Meta:
         model = Website
@@ -144,27 +147,57 @@ class WebsiteSerializer(serializers.ModelSerializer):
             'id',
             'name',
             'url',
+            'monitor_type',
             'check_interval',
+            'check_interval_seconds',
             'check_interval_display',
             'is_active',
+            'use_dns_cache',
+            'timeout_ms',
+            'request_method',
+            'max_body_bytes',
+            'keyword',
+            'keyword_assertion',
+            'failure_threshold',
+            'recovery_threshold',
+            'consecutive_failures',
+            'consecutive_successes',
             'last_downtime_at',
             'last_recovered_at',
+            'cert_expires_at',
+            'cert_expiry_alert_days',
         ]
         read_only_fields = [
             'id',
             'created_at',
+            'consecutive_failures',
+            'consecutive_successes',
             'last_downtime_at',
             'last_recovered_at',
+            'cert_expires_at',
         ]
 
     def get_check_interval_display(self, obj):
+        if obj.check_interval_seconds:
+            return dict(SUB_MINUTE_INTERVAL_CHOICES).get(obj.check_interval_seconds)
         return dict(CHECK_INTERVAL_CHOICES).get(obj.check_interval)
 
+    def validate_check_interval_seconds(self, value):
+        if value and not redis_backend_enabled():
+            raise serializers.ValidationError(
+                "Sub-minute intervals need the Redis scheduler backend."
+            )
+        return value
+
     def validate_url(self, value):
         user = self.context['request'].user
 
         # Parse and normalize URL
         parsed = urlparse(value)
+        if parsed.scheme.lower() in ("tcp", "tls") and not parsed.port:
+            raise serializers.ValidationError(
+                "TCP and TLS monitors need a port, e.g. tcp://db.example.com:5432."
+            )
         normalized_path = parsed.path.rstrip('/')
         normalized_url = urlunparse(parsed._replace(
             path=normalized_path,
@@ -187,6 +220,23 @@ class WebsiteSerializer(serializers.ModelSerializer):
 
         return normalized_url
 
+    def validate(self, data):
+        # Keyword checks read the body, so HEAD / headers-only GET can't run them
+        url = data.get('url', getattr(self.instance, 'url', ''))
+        keyword = data.get('keyword', getattr(self.instance, 'keyword', ''))
+        method = data.get(
+            'request_method', getattr(self.instance, 'request_method', 'GET_CAPPED')
+        )
+        if keyword and not url.startswith(('http://', 'https://')):
+            raise serializers.ValidationError({
+                'keyword': "Keyword checks only apply to HTTP monitors."
+            })
+        if keyword and method != 'GET_CAPPED':
+            raise serializers.ValidationError({
+                'keyword': "Keyword checks need the GET_CAPPED request method."
+            })
+        return data
+
     def create(self, validated_data):
         # ensures website gets picked up immediately
         validated_data['next_check_at'] = timezone.now()
@@ -194,9 +244,11 @@ class WebsiteSerializer(serializers.ModelSerializer):
 
 
 class UptimeCheckResultSerializer(serializers.ModelSerializer):
+    error_message = serializers.CharField(read_only=True)
+
     class Meta:
         model = UptimeCheckResult
-        fields = '__all__'
+        exclude = ['error']
         read_only_fields = [
             'checked_at',
             'status_code',
@@ -0,0 +1,164 @@
+"""
+Shard ownership for running several schedulers at once.
+
+Monitors are split into SCHEDULER_SHARDS shards by `id % SCHEDULER_SHARDS`.
+Every scheduler node (`manage.py run_scheduler`) registers itself in Redis
+and owns the shards that rendezvous hashing assigns to it among the live
+nodes. Ownership is a Redis lease (SET NX PX) renewed every tick:
+
+- when a node joins, the others release the shards it now owns,
+- when a node dies, its registration and leases expire and the remaining
+  nodes pick up its shards on their next tick.
+
+Ownership only spreads the dispatch work. Website checks are still claimed
+atomically in the database (see `claim_due_websites`), so two nodes that
+briefly overlap on a shard never check a site twice. Without Redis a node
+owns every shard.
+"""
+
+import os
+import socket
+import time
+import zlib
+import logging
+import redis
+from django.conf import settings
+from django.db.models.functions import Mod
+from monitor import redis_utils
+from monitor.helpers import update_owned_shards
+
+logger = logging.getLogger('monitor')
+
+NODES_KEY = "scheduler:nodes"
+SHARD_KEY = "scheduler:shard:{}"
+
+# Take the lease if it is free, or extend it if we already hold it
+ACQUIRE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return 1
+end
+return 0
+"""
+
+# Only delete the lease if we still hold it
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def shard_count():
+    return getattr(settings, "SCHEDULER_SHARDS", 64)
+
+
+def default_node_id():
+    return getattr(settings, "SCHEDULER_NODE_ID", "") or (
+        f"{socket.gethostname()}:{os.getpid()}"
+    )
+
+
+def assign_shards(nodes, shards):
+    """
+    Rendezvous hashing: map each shard to the node with the highest
+    hash(node, shard). Adding or removing a node only moves that node's shards.
+    """
+    if not nodes:
+        return {}
+    return {
+        shard: max(nodes, key=lambda node: zlib.crc32(f"{node}:{shard}".encode()))
+        for shard in range(shards)
+    }
+
+
+def in_shards(queryset, shards):
+    """Restrict a monitor queryset to the given shards (None = all)."""
+    if shards is None:
+        return queryset
+    return queryset.annotate(
+        shard=Mod('id', shard_count())
+    ).filter(shard__in=list(shards))
+
+
+class ShardCoordinator:
+    """Keeps this node's shard leases in Redis up to date."""
+
+    def __init__(self, node_id=None, shards=None, lease_seconds=None, redis_client=None):
+        self.node_id = node_id or default_node_id()
+        self.shards = shards or shard_count()
+        self.lease_ms = int(
+            (lease_seconds or getattr(settings, "SCHEDULER_LEASE_SECONDS", 30)) * 1000
+        )
+        self.redis = redis_client if redis_client is not None else redis_utils.r
+        self.owned = set()
+
+    def live_nodes(self):
+        """Register this node and return every node seen within one lease."""
+        now_ms = int(time.time() * 1000)
+        pipe = self.redis.pipeline()
+        pipe.zadd(NODES_KEY, {self.node_id: now_ms})
+        pipe.zremrangebyscore(NODES_KEY, 0, now_ms - self.lease_ms)
+        pipe.zrange(NODES_KEY, 0, -1)
+        members = pipe.execute()[-1]
+        return sorted(
+            member.decode() if isinstance(member, bytes) else member
+            for member in members
+        )
+
+    def refresh(self):
+        """
+        Renew the leases of shards assigned to this node, release the rest.
+        Returns the set of shards this node owns (all shards without Redis).
+        """
+        if self.redis is None:
+            self.owned = set(range(self.shards))
+            return self.owned
+
+        try:
+            assignment = assign_shards(self.live_nodes(), self.shards)
+            wanted = {
+                shard for shard, node in assignment.items() if node == self.node_id
+            }
+
+            owned = set()
+            for shard in wanted:
+                if self.redis.eval(
+                    ACQUIRE_SCRIPT, 1, SHARD_KEY.format(shard), self.node_id, self.lease_ms
+                ):
+                    owned.add(shard)
+
+            for shard in self.owned - wanted:
+                self.redis.eval(RELEASE_SCRIPT, 1, SHARD_KEY.format(shard), self.node_id)
+
+        except redis.RedisError as e:
+            # Keep dispatching what we had; the database claim still
+            # prevents double checks if another node takes a shard over
+            logger.error(f"Redis error refreshing scheduler shards: {e}")
+            owned = self.owned
+
+        if owned != self.owned:
+            logger.info(
+                f"Scheduler {self.node_id} owns {len(owned)}/{self.shards} shards"
+            )
+        self.owned = owned
+        update_owned_shards(self.node_id, len(owned))
+        return owned
+
+    def release(self):
+        """Give up every shard, e.g. on shutdown, so others take over at once."""
+        if self.redis is None:
+            return
+
+        try:
+            for shard in self.owned:
+                self.redis.eval(RELEASE_SCRIPT, 1, SHARD_KEY.format(shard), self.node_id)
+            self.redis.zrem(NODES_KEY, self.node_id)
+        except redis.RedisError as e:
+            logger.error(f"Redis error releasing scheduler shards: {e}")
+
+        self.owned = set()
+        update_owned_shards(self.node_id, 0)
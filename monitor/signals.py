@@ -0,0 +1,17 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Website
+from .schedule_wheel import sync_website, unsync_website
+
+
+@receiver(post_save, sender=Website)
+def schedule_website_on_save(sender, instance, **kwargs):
+    """Keep the Redis schedule in step with next_check_at / is_active."""
+    transaction.on_commit(lambda: sync_website(instance))
+
+
+@receiver(post_delete, sender=Website)
+def unschedule_website_on_delete(sender, instance, **kwargs):
+    website_id = instance.pk
+    transaction.on_commit(lambda: unsync_website(website_id))
@@ -0,0 +1,159 @@
+"""
+TCP-connect and TLS-handshake checks for tcp:// and tls:// monitors.
+
+Databases, SMTP servers and other raw TCP services only need to show that
+their port accepts connections. These checks open a connection to host:port
+and, for tls://, complete a verified TLS handshake and note when the
+certificate expires (the certificate is also cached, see cert_cache).
+Nothing is sent, so a check costs a fraction of an HTTP
+request.
+
+A successful check is reported as status 200, so results, uptime figures
+and alerts go through the same pipeline as HTTP checks.
+"""
+
+import asyncio
+import contextlib
+import socket
+import ssl
+import time
+from urllib.parse import urlparse
+from .dns_cache import bypass_dns_cache
+from .utils import ProbeResult, failure_message
+from .cert_cache import certificate_expiry, remember_certificate
+
+CONNECTED = 200
+
+
+def socket_target(url):
+    """(use TLS, host, port) of a tcp:// or tls:// URL."""
+    parsed = urlparse(url)
+    return parsed.scheme.lower() == "tls", parsed.hostname, parsed.port
+
+
+def _ms(since, until):
+    return round((until - since) * 1000)
+
+
+def check_socket(url, timeout_ms=5000):
+    """Blocking TCP / TLS check for the legacy engine."""
+    use_tls, host, port = socket_target(url)
+    start = time.perf_counter()
+    deadline = start + timeout_ms / 1000
+    status_code = 0  # 0 = failed to connect
+    error_message = ""
+    ip = None
+    timings = {}
+    cert_expires_at = None
+    try:
+        sock = socket.create_connection((host, port), timeout=timeout_ms / 1000)
+        try:
+            connected_at = time.perf_counter()
+            ip = sock.getpeername()[0]
+            tls_ms = None
+            if use_tls:
+                sock.settimeout(max(deadline - connected_at, 0.001))
+                tls_sock = ssl.create_default_context().wrap_socket(
+                    sock, server_hostname=host
+                )
+                sock = tls_sock  # closing it closes the TCP socket too
+                cert_expires_at = certificate_expiry(
+                    remember_certificate((host, port), tls_sock)
+                )
+                tls_ms = _ms(connected_at, time.perf_counter())
+        finally:
+            sock.close()
+
+        status_code = CONNECTED
+        # DNS is part of connect here; there is no request, so no ttfb/download
+        timings = {
+            "dns": None,
+            "connect": _ms(start, connected_at),
+            "tls": tls_ms,
+            "ttfb": None,
+            "download": None,
+        }
+    except TimeoutError:
+        error_message = f"Timed out after {timeout_ms}ms"
+    except OSError as e:  # includes ssl.SSLError
+        error_message = failure_message(e)
+
+    return ProbeResult(
+        status_code=status_code,
+        response_time_ms=round((time.perf_counter() - start) * 1000, 2),
+        error_message=error_message,
+        ip=ip,
+        timings=timings,
+        cert_expires_at=cert_expires_at,
+    )
+
+
+async def _open_connection(addresses, port):
+    """Connect to the first of `addresses` that accepts, like a browser would."""
+    error = None
+    for address in addresses:
+        try:
+            return await asyncio.open_connection(address, port)
+        except OSError as e:
+            error = e
+    raise error
+
+
+async def probe_socket(website, resolver):
+    """
+    TCP / TLS check of a tcp:// or tls:// website for the async engine.
+    The host is resolved through the engine's CachingResolver, so the DNS
+    cache (and the website's use_dns_cache switch) apply as for HTTP checks.
+    """
+    use_tls, host, port = socket_target(website.url)
+    bypass_dns_cache.set(not website.use_dns_cache)
+    start = time.perf_counter()
+    status_code = 0
+    error_message = ""
+    ip = None
+    timings = {}
+    cert_expires_at = None
+    try:
+        async with asyncio.timeout(website.timeout_ms / 1000):
+            addresses = [info["host"] for info in await resolver.resolve(host, port)]
+            resolved_at = time.perf_counter()
+            _, writer = await _open_connection(addresses, port)
+            try:
+                connected_at = time.perf_counter()
+                ip = writer.get_extra_info("peername")[0]
+                tls_ms = None
+                if use_tls:
+                    await writer.start_tls(
+                        ssl.create_default_context(), server_hostname=host
+                    )
+                    cert_expires_at = certificate_expiry(remember_certificate(
+                        (host, port), writer.get_extra_info("ssl_object")
+                    ))
+                    tls_ms = _ms(connected_at, time.perf_counter())
+            finally:
+                writer.close()
+                # A peer that resets while closing doesn't fail the check
+                with contextlib.suppress(OSError):
+                    await writer.wait_closed()
+
+        status_code = CONNECTED
+        timings = {
+            "dns": _ms(start, resolved_at),
+            "connect": _ms(resolved_at, connected_at),
+            "tls": tls_ms,
+            "ttfb": None,
+            "download": None,
+        }
+    except TimeoutError:
+        error_message = f"Timed out after {website.timeout_ms}ms"
+    except OSError as e:
+        error_message = failure_message(e)
+
+    return ProbeResult(
+        status_code=status_code,
+        response_time_ms=round((time.perf_counter() - start) * 1000, 2),
+        error_message=error_message,
+        ip=ip,
+        timings=timings,
+        cert_expires_at=cert_expires_at,
+    )
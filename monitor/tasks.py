@@ -1,16 +1,54 @@
-from celery import shared_task
-from .utils import get_due_websites, check_website_uptime, get_due_heartbeats
-from .models import Website, UptimeCheckResult, HeartBeat, PingLog
+from celery import shared_task, current_app
+from .utils import (
+    claim_due_websites,
+    claim_scheduled_websites,
+    get_leased_websites,
+    parse_lease,
+    check_website_uptime,
+    get_due_heartbeats,
+    KeywordMatcher,
+)
+from .check_engine import probe_websites
+from .host_limiter import HostLimiter
+from .socket_checks import check_socket
+from .cert_cache import cached_certificate, cert_target, certificate_expiry, fetch_certificate
+from .schedule_wheel import ScheduleWheel, redis_backend_enabled, sync_website
+from .result_buffer import (
+    WEBSITE_STATE_FIELDS,
+    buffer_check_results,
+    buffer_enabled,
+    flush_buffered_results,
+    flush_size,
+    result_row,
+    write_pending,
+)
+from . import rollups
+from .partitions import PARTITION_COLUMNS, ensure_partitions
+from .retention import purge_all
+from .dispatch import bulk_dispatch, chunked, dispatch_chunk_size, dispatch_mode
+from .models import Website, UptimeCheckResult, HeartBeat, PingLog, Alert
 from django.db import transaction
-from datetime import timedelta
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
 from django.utils.timezone import now
 from .alerts import handle_alert
 from .redis_utils import allow_ping_sliding
+import time
 import logging
+import redis
+from kombu.exceptions import OperationalError
 from django.contrib.auth import get_user_model
+from django.conf import settings
 from django.utils import timezone
-from django.db.models import Count
+from django.db.models import Count, Q
+from django.contrib.contenttypes.models import ContentType
 from monitor.helpers import (
+    track_website_check,
+    update_consecutive_failures,
+    record_reclaimed_leases,
+    record_shared_probes,
+    record_confirmation,
+    record_schedule_lag,
     update_active_monitors_count,
     update_active_users_count,
     update_monitors_per_user,
@@ -24,8 +62,232 @@ from monitor import metrics
 logger = logging.getLogger('monitor')
 
 
+def record_check_result(website, result, confirmation=0):
+    """
+    Save a probe result for `website` and run recovery/downtime detection.
+
+    Shared by the legacy per-website task and the async batch engine so both
+    produce the same results and alerts. `confirmation` numbers the
+    confirmation re-checks (0 for a scheduled check).
+    """
+    if confirmation:
+        _record_confirmation(website, result, confirmation)
+        return
+
+    _update_website_state(website, result)
+    if _buffer_check_results([(website, result)]):
+        return
+
+    # ✅ Save check result
+    result_row(website.id, result).save()
+    website.save(update_fields=WEBSITE_STATE_FIELDS)
+
+
+# A confirmation holds no lease, so it never writes one
+CONFIRMATION_STATE_FIELDS = [
+    field for field in WEBSITE_STATE_FIELDS if field != "lease_expires_at"
+]
+
+
+def _record_confirmation(website, result, confirmation):
+    """
+    record_check_result for a confirmation re-check. It can run while the
+    website is claimed by, or being checked for, its next scheduled check,
+    so the streaks are updated on the row as it is now, locked, rather than
+    on the copy loaded before the probe; the scheduled check's lease is left
+    alone. Written straight away, not through the result buffer, after the
+    website's buffered results: the row then holds their streaks, and no
+    later flush overwrites the confirmation's with them.
+    """
+    if buffer_enabled():
+        write_pending(website.pk)
+
+    with transaction.atomic():
+        current = Website.objects.select_for_update().filter(pk=website.pk).first()
+        if current is None:
+            return
+        _update_website_state(current, result, confirmation)
+        result_row(current.id, result).save()
+        current.save(update_fields=CONFIRMATION_STATE_FIELDS)
+
+
+def record_check_results(checked):
+    """
+    record_check_result for many (website, result) pairs: each website's
+    state is evaluated on its own, then the results are saved in one bulk
+    insert and the websites in one bulk update.
+    """
+    for website, result in checked:
+        try:
+            _update_website_state(website, result)
+        except Exception as e:
+            logger.error(
+                f"[!] Error recording check for {website.id}: {str(e)}",
+                exc_info=True
+            )
+    if _buffer_check_results(checked):
+        return
+
+    UptimeCheckResult.objects.bulk_create(
+        [result_row(website.id, result) for website, result in checked]
+    )
+    Website.objects.bulk_update([website for website, _ in checked], WEBSITE_STATE_FIELDS)
+    for website, _ in checked:
+        sync_website(website)  # bulk_update sends no post_save
+
+
+def _buffer_check_results(checked):
+    """
+    Hand results to the Redis write buffer when it is on. Alerts have already
+    gone out; only the writes wait for flush_check_results. Returns False if
+    the caller has to write the results itself.
+    """
+    if not checked or not buffer_enabled():
+        return False
+
+    pending = buffer_check_results(checked, now())
+    if pending is None:
+        return False
+
+    for website, _ in checked:
+        sync_website(website)
+
+    # Flush as soon as another full batch is waiting
+    size = flush_size()
+    if pending // size > (pending - len(checked)) // size:
+        flush_check_results.delay()
+    return True
+
+
+def _update_website_state(website, result, confirmation=0):
+    """
+    Update streaks, detect downtime/recovery (alerting right away) and
+    release the lease. Only changes `website` in memory; see
+    WEBSITE_STATE_FIELDS for what the caller has to save. A failure short
+    of failure_threshold schedules a confirmation re-check.
+    """
+    website_url = website.url
+    status_code = result.status_code
+
+    # Running streaks, so detection doesn't re-read recent checks
+    if result.failure_reason is None:
+        website.consecutive_successes += 1
+        website.consecutive_failures = 0
+    else:
+        website.consecutive_failures += 1
+        website.consecutive_successes = 0
+
+    # 🔍 Recovery detection
+    if website.is_down and website.consecutive_successes >= website.recovery_threshold:
+        website.is_down = False
+        website.last_recovered_at = now()
+        logger.info(f"[✓] {website_url} RECOVERED at {website.last_recovered_at}")
+
+        # Send recovery alert
+        handle_alert(website, "recovery")
+
+    # 🔍 Downtime detection
+    if website.consecutive_failures >= website.failure_threshold:
+        if not website.is_down:
+            website.is_down = True
+            website.last_downtime_at = now()
+            logger.warning(f"[!] {website_url} DOWN at {website.last_downtime_at}")
+
+        # Send downtime alert.
+        handle_alert(website, "downtime")
+    elif result.failure_reason is not None and not website.is_down:
+        _schedule_confirmation(website, confirmation)
+
+    if confirmation:
+        record_confirmation(result.failure_reason is not None)
+    else:
+        # next_check_at was already advanced when the check was claimed;
+        # recording the result releases the claim's lease. Confirmation
+        # re-checks hold no lease and leave a scheduled check's alone.
+        website.lease_expires_at = None
+    if result.cert_expires_at is not None:
+        website.cert_expires_at = result.cert_expires_at
+    update_consecutive_failures(
+        website.id, website.name or website_url, website.consecutive_failures
+    )
+
+    logger.info(
+        f"[✓] {website_url} checked: {status_code} in {result.response_time_ms}ms"
+    )
+
+
+def _schedule_confirmation(website, confirmation):
+    """
+    Re-check a failing website CHECK_CONFIRM_DELAY_SECONDS from now instead of
+    waiting a whole interval for the next failure, up to CHECK_CONFIRM_RECHECKS
+    times in a row. Re-checks count toward failure_threshold, so with the
+    default threshold of 3 an outage is confirmed seconds after the first
+    failed check. They run on CHECK_CONFIRM_QUEUE when set, e.g. a queue
+    served by workers in another region.
+    """
+    if confirmation >= getattr(settings, "CHECK_CONFIRM_RECHECKS", 2):
+        return
+    if website.check_interval_seconds:
+        return  # sub-minute checks confirm themselves soon enough
+
+    options = {"countdown": getattr(settings, "CHECK_CONFIRM_DELAY_SECONDS", 5)}
+    queue = getattr(settings, "CHECK_CONFIRM_QUEUE", "")
+    if queue:
+        options["queue"] = queue
+    try:
+        confirm_website_down.apply_async((website.id, confirmation + 1), **options)
+    except OperationalError as e:
+        # The next scheduled check still counts toward the threshold
+        logger.error(f"[!] Could not schedule a re-check of {website.url}: {e}")
+
+
+def _check_website(website):
+    """Probe `website` once, within its host's budget, and track the check."""
+    with track_website_check(website.id, website.name or website.url) as tracker, \
+            HostLimiter().limit(website.url):
+        if website.monitor_type == "http":
+            result = check_website_uptime(
+                website.url,
+                timeout_ms=website.timeout_ms,
+                request_method=website.request_method,
+                max_body_bytes=website.max_body_bytes,
+                matcher=KeywordMatcher.for_website(website),
+            )
+        else:
+            result = check_socket(website.url, timeout_ms=website.timeout_ms)
+        tracker.record_phases(result.timings)
+        if result.failure_reason:
+            tracker.record_failure(result.failure_reason)
+        else:
+            tracker.record_success(
+                result.response_time_ms / 1000, result.status_code
+            )
+    return result
+
+
+def _task_queue(request):
+    """Queue the running task was delivered from."""
+    delivery_info = request.delivery_info or {}
+    default_queue = getattr(settings, "CELERY_TASK_DEFAULT_QUEUE", "celery")
+    return delivery_info.get("routing_key") or default_queue
+
+
+def _record_schedule_lag(request, websites, scheduled_at):
+    """
+    Record how late the checks of `websites` start compared with the slot
+    they were queued for (`scheduled_at`, a timestamp). Tasks queued without
+    one (confirmations, older messages) aren't recorded.
+    """
+    if scheduled_at is None:
+        return
+    lag = max(0.0, time.time() - scheduled_at)
+    queue = _task_queue(request)
+    for website in websites:
+        record_schedule_lag(website.interval_seconds, queue, lag)
+
+
 @shared_task(bind=True, max_retries=3)
-def check_single_website(self, website_id):
+def check_single_website(self, website_id, lease=None, scheduled_at=None):
     try:
         website = Website.objects.get(pk=website_id)
         website_url = website.url
@@ -34,9 +296,18 @@ def check_single_website(self, website_id):
             logger.info(f"⏸️ Skipped inactive website {website_id}")
             return
 
+        # The lease was released or reclaimed by a later dispatch
+        if lease is not None and website.lease_expires_at != parse_lease(lease):
+            logger.info(f"⏭️ Skipped website {website_id}: lease no longer held")
+            return
+
+        # Retries would count their own delay as lag
+        if not self.request.retries:
+            _record_schedule_lag(self.request, [website], scheduled_at)
+
         try:
             # 🚦 Perform the actual website check
-            status_code, response_time_ms = check_website_uptime(website_url)
+            result = _check_website(website)
         except Exception as e:
             logger.error(
                 f"[!] Unexpected error checking {website_url}: {str(e)}",
@@ -44,48 +315,7 @@ def check_single_website(self, website_id):
             )
             raise
 
-        # ✅ Save check result
-        UptimeCheckResult.objects.create(
-            website=website,
-            status_code=status_code,
-            response_time_ms=response_time_ms
-        )
-
-        # 🔍 Recovery detection
-        if website.is_down and status_code == 200:
-            website.is_down = False
-            website.last_recovered_at = now()
-            logger.info(f"[✓] {website_url} RECOVERED at {website.last_recovered_at}")
-
-            # Send recovery alert
-            handle_alert(website, "recovery")
-
-        # 🔍 Downtime detection
-        recent_checks = website.checks.order_by('-checked_at')[:3]
-        if all(check.status_code != 200 for check in recent_checks):
-            if not website.is_down:
-                website.is_down = True
-                website.last_downtime_at = now()
-                logger.warning(f"[!] {website_url} DOWN at {website.last_downtime_at}")
-
-            # Send downtime alert.
-            handle_alert(website, "downtime")
-
-        # Schedule next check
-        # Floor the current time to the nearest minute
-        current_time = now().replace(second=0, microsecond=0)
-
-        # Calculate the next aligned interval
-        # (e.g., if interval=1 and it's 00:02:32 → next_check = 00:03:00)
-        website.next_check_at = current_time + timedelta(minutes=website.check_interval)
-        website.save(update_fields=[
-            "is_down",
-            "last_downtime_at",
-            "last_recovered_at",
-            "next_check_at"
-        ])
-
-        logger.info(f"[✓] {website_url} checked: {status_code} in {response_time_ms}ms")
+        record_check_result(website, result)
 
     except Website.DoesNotExist:
         logger.warning(f"[!] Website {website_id} no longer exists. Skipping...")
@@ -100,24 +330,313 @@ def check_single_website(self, website_id):
 
 
 @shared_task
-def check_due_websites():
-    due_websites = get_due_websites()
+def confirm_website_down(website_id, confirmation):
+    """
+    Confirmation re-check of a website whose last check failed, recorded
+    like any other check (see _schedule_confirmation).
+    """
+    website = Website.objects.filter(pk=website_id, is_active=True).first()
+    if website is None:
+        return f"Website {website_id} is gone or paused."
+
+    result = _check_website(website)
+    record_check_result(website, result, confirmation=confirmation)
+    return (
+        f"Confirmation {confirmation} of {website.url}: "
+        f"{result.failure_reason or 'passed'}"
+    )
+
+
+@shared_task(bind=True)
+def check_website_batch(self, website_ids, lease=None, scheduled_at=None):
+    """
+    Check a batch of websites concurrently with the asyncio engine.
+    Results and alerts are recorded exactly like check_single_website.
+    Websites no longer held by `lease` are skipped.
+
+    Websites with the same probe key (same URL and check settings, usually
+    different users monitoring one popular page) share a single probe,
+    whose result is recorded for each of them.
+    """
+    websites = get_leased_websites(website_ids, lease)
+    _record_schedule_lag(self.request, websites, scheduled_at)
+
+    subscribers = defaultdict(list)
+    for website in websites:
+        subscribers[website.probe_key].append(website)
+    probed = [group[0] for group in subscribers.values()]
+    results = probe_websites(probed)
+    record_shared_probes(len(websites) - len(probed))
+
+    record_check_results([
+        (website, results[group[0].id])
+        for group in subscribers.values()
+        for website in group
+    ])
+
+    return f"Checked {len(websites)} websites in batch with {len(probed)} probes."
+
+
+@shared_task
+def flush_check_results():
+    """Write check results waiting in the Redis buffer to the database."""
+    if not buffer_enabled():
+        return "Check result buffer is off."
+    written = flush_buffered_results()
+    return f"Flushed {written} check results."
 
-    count = 0
-    for website in due_websites.iterator():  # memory-safe for large queries
-        check_single_website.delay(website.id)
-        count += 1
 
-    return f"Queued {count} websites for checking."
+def _countdown(due_at, current_time):
+    """Seconds until `due_at`, or 0 if it is already due."""
+    return max(0.0, (due_at - current_time).total_seconds())
+
+
+def _slot_batches(claims, batch_size, batch_window):
+    """
+    Group claims (ordered by run_at) into batches of at most `batch_size`
+    distinct URLs whose run times lie within `batch_window` seconds.
+    Monitors of a URL already in the batch always join it, so they can
+    share its probe. Yields (first run time, [website ids]).
+    """
+    batch = []
+    urls = set()
+    batch_run_at = None
+    for claim in claims:
+        url = claim.website.url
+        batch_full = len(urls) >= batch_size and url not in urls
+        if batch and (batch_full or (
+            claim.run_at - batch_run_at
+        ).total_seconds() > batch_window):
+            yield batch_run_at, batch
+            batch = []
+            urls = set()
+        if not batch:
+            batch_run_at = claim.run_at
+        batch.append(claim.website.id)
+        urls.add(url)
+    if batch:
+        yield batch_run_at, batch
+
+
+def _claim_due_websites(lookahead, limit, shards=None):
+    """
+    Claim due websites in chunks of `limit` (one short transaction each)
+    until none are left. Yields (lease token, claims) per chunk.
+
+    With the Redis scheduler backend, due websites are popped from the
+    shared schedule instead of scanned for (`shards` only applies to the
+    database backend; pops are atomic across nodes anyway).
+    """
+    lease_seconds = getattr(settings, "CHECK_LEASE_SECONDS", 300)
+    wheel = ScheduleWheel() if redis_backend_enabled() else None
+    while True:
+        current_time = now()
+        due_by = current_time + timedelta(seconds=lookahead)
+        # A lease covers the countdown to the latest slot plus the check itself
+        lease_until = due_by + timedelta(seconds=lease_seconds)
+
+        if wheel is not None:
+            try:
+                scheduled = wheel.pop_due(due_by, limit, lease_seconds, current_time)
+            except redis.RedisError as e:
+                logger.error(f"Redis error popping due websites, using the database: {e}")
+                wheel = None
+                continue
+            fetched = len(scheduled)
+            claims = (
+                claim_scheduled_websites(scheduled, due_by, lease_until)
+                if scheduled else []
+            )
+        else:
+            claims = claim_due_websites(due_by, lease_until, limit=limit, shards=shards)
+            fetched = len(claims)
+
+        reclaimed = sum(claim.reclaimed for claim in claims)
+        if reclaimed:
+            logger.warning(f"[!] Reclaimed {reclaimed} website checks with expired leases")
+            record_reclaimed_leases(reclaimed)
+
+        if claims:
+            yield lease_until.isoformat(), claims
+        if fetched < limit:
+            return
+
+
+@shared_task
+def check_due_websites(engine=None, batch_size=None, queue=None, shards=None):
+    """
+    Claim and queue every website due within the dispatch lookahead.
+
+    Each check is queued with a countdown to its monitor's own slot, so
+    checks are spread across the interval instead of firing on the minute.
+    Claiming advances next_check_at and leases the website for
+    CHECK_LEASE_SECONDS, so a backed-up queue never gets the same check
+    twice; checks whose lease expires without a result are queued again.
+
+    engine: "legacy" queues one check_single_website task per website,
+    "async" queues check_website_batch tasks of up to `batch_size` websites
+    whose slots fall within CHECK_BATCH_WINDOW_SECONDS of each other.
+    Defaults come from CHECK_ENGINE / CHECK_BATCH_SIZE, so each beat entry
+    (and queue) can be switched over independently.
+
+    With CHECK_DISPATCH_MODE="chunked" the legacy engine publishes one
+    queue_website_checks task per CHECK_DISPATCH_CHUNK_SIZE websites instead,
+    which fans them out from a worker.
+
+    shards: only dispatch websites in these scheduler shards (see sharding).
+    """
+    engine = engine or getattr(settings, "CHECK_ENGINE", "legacy")
+    batch_size = batch_size or getattr(settings, "CHECK_BATCH_SIZE", 200)
+    batch_window = getattr(settings, "CHECK_BATCH_WINDOW_SECONDS", 5)
+    lookahead = getattr(settings, "CHECK_DISPATCH_LOOKAHEAD_SECONDS", 60)
+    claim_size = dispatch_chunk_size()
+
+    with bulk_dispatch("website") as dispatch:
+        for lease, claims in _claim_due_websites(lookahead, claim_size, shards):
+            current_time = now()
+
+            if engine == "async":
+                for batch_run_at, batch in _slot_batches(claims, batch_size, batch_window):
+                    dispatch.send(
+                        check_website_batch,
+                        (batch, lease, batch_run_at.timestamp()),
+                        items=len(batch),
+                        countdown=_countdown(batch_run_at, current_time),
+                        queue=queue
+                    )
+
+            elif dispatch_mode() == "chunked":
+                entries = [
+                    [claim.website.id, claim.run_at.timestamp()] for claim in claims
+                ]
+                dispatch.send(
+                    queue_website_checks,
+                    (entries, queue, lease),
+                    items=len(entries),
+                    queue=queue
+                )
+
+            else:
+                for claim in claims:
+                    dispatch.send(
+                        check_single_website,
+                        (claim.website.id, lease, claim.run_at.timestamp()),
+                        countdown=_countdown(claim.run_at, current_time),
+                        queue=queue
+                    )
+
+    return (
+        f"Queued {dispatch.items} websites for checking in "
+        f"{dispatch.messages} messages ({dispatch.duration:.2f}s)."
+    )
+
+
+@shared_task
+def queue_website_checks(entries, queue=None, lease=None):
+    """
+    Fan out one chunk of a chunked dispatch into check_single_website tasks.
+    entries: [website_id, run-at timestamp] pairs.
+    """
+    current_time = now()
+    with current_app.producer_or_acquire() as producer:
+        for website_id, run_at in entries:
+            scheduled_at = run_at
+            run_at = datetime.fromtimestamp(run_at, tz=dt_timezone.utc)
+            check_single_website.apply_async(
+                (website_id, lease, scheduled_at),
+                countdown=_countdown(run_at, current_time),
+                queue=queue,
+                producer=producer
+            )
+
+    return f"Queued {len(entries)} websites for checking."
 
 
 @shared_task
 def cleanup_old_logs(retention_days=90):
-    """Delete UptimeCheckResult logs older than retention_days."""
-    # TODO: Consider archiving old logs instead of deleting
-    cutoff = now() - timedelta(days=retention_days)
-    deleted, _ = UptimeCheckResult.objects.filter(checked_at__lt=cutoff).delete()
-    return f"Deleted {deleted} logs older than {retention_days} days"
+    """
+    Delete UptimeCheckResult logs older than retention_days, and ping logs
+    and resolved alerts past PING_LOG_RETENTION_DAYS / ALERT_RETENTION_DAYS.
+    Rows go in small chunks from a checkpoint (see monitor.retention), so a
+    run cut short by RETENTION_MAX_SECONDS carries on the next day. With
+    ARCHIVE_EXPIRED_LOGS on, results and pings are archived to Parquet first.
+    """
+    results = purge_all(retention_days)
+    return "; ".join(
+        f"{result.table}: "
+        f"{f'archived {result.archived} rows, ' if result.archived else ''}"
+        f"deleted {result.deleted} rows"
+        f"{f', dropped {result.partitions} partitions' if result.partitions else ''}"
+        f"{'' if result.finished else ' (to be continued)'}"
+        for result in results
+    )
+
+
+@shared_task
+def maintain_log_partitions():
+    """Create the upcoming partitions of the partitioned log tables."""
+    created = []
+    for model in PARTITION_COLUMNS:
+        created += ensure_partitions(model)
+    return f"Created {len(created)} log partitions"
+
+
+@shared_task
+def rollup_check_results():
+    """Fold new check results into the hourly and daily rollups."""
+    rolled_up = rollups.rollup_check_results()
+    return f"Rolled up {rolled_up} check results"
+
+
+@shared_task
+def check_certificate_expiry():
+    """
+    Daily: alert on every active https:// and tls:// website whose certificate
+    expires within its cert_expiry_alert_days, and clear the alert once the
+    certificate is renewed. Certificates come from the per-host cache filled
+    by regular checks; only hosts missing from it get a handshake, once each.
+    """
+    websites = Website.objects.filter(
+        is_active=True, cert_expiry_alert_days__gt=0
+    ).filter(
+        Q(url__istartswith="https://") | Q(url__istartswith="tls://")
+    ).only("id", "name", "url", "cert_expires_at", "cert_expiry_alert_days")
+
+    certificates = {}
+    changed = []
+    renewed = []
+    alerted = 0
+    current_time = now()
+    for website in websites.iterator():
+        target = cert_target(website.url)
+        if target is None:
+            continue
+        if target not in certificates:
+            certificates[target] = cached_certificate(*target) or fetch_certificate(*target)
+        expires_at = certificate_expiry(certificates[target])
+        if expires_at is None:
+            continue
+
+        if expires_at != website.cert_expires_at:
+            website.cert_expires_at = expires_at
+            changed.append(website)
+        if expires_at - current_time <= timedelta(days=website.cert_expiry_alert_days):
+            handle_alert(website, "cert_expiry")
+            alerted += 1
+        else:
+            renewed.append(website.id)
+
+    Website.objects.bulk_update(changed, ["cert_expires_at"], batch_size=500)
+    Alert.objects.filter(
+        content_type=ContentType.objects.get_for_model(Website),
+        object_id__in=renewed,
+        alert_type="cert_expiry",
+        is_active=True,
+    ).update(is_active=False)
+    return (
+        f"Checked {len(certificates)} certificates: "
+        f"{alerted} websites expiring soon"
+    )
 
 
 @shared_task
@@ -222,17 +741,42 @@ def check_single_heartbeat(self, heartbeat_id):
 
 
 @shared_task
-def check_due_heartbeats():
+def check_heartbeat_chunk(heartbeat_ids):
+    """Check one chunk of due heartbeats (chunked dispatch mode)."""
+    for heartbeat_id in heartbeat_ids:
+        try:
+            check_single_heartbeat(heartbeat_id)
+        except Exception as e:
+            logger.error(
+                f"[!] Error checking heartbeat {heartbeat_id}: {str(e)}",
+                exc_info=True
+            )
+
+    return f"Checked {len(heartbeat_ids)} heartbeats."
+
+
+@shared_task
+def check_due_heartbeats(shards=None):
     """
     Check all heartbeats that are due and mark them down if missed.
     This task is intended to be run every minute via cron or a periodic task scheduler.
+    shards: only dispatch heartbeats in these scheduler shards (see sharding).
     """
-    due_hbs = get_due_heartbeats()
-    count = 0
-    for hb in due_hbs.iterator():
-        check_single_heartbeat.delay(hb.id)
-        count += 1
-    return f"Queued {count} heartbeats for checking."
+    due_hbs = get_due_heartbeats(shards)
+
+    with bulk_dispatch("heartbeat") as dispatch:
+        if dispatch_mode() == "chunked":
+            ids = due_hbs.values_list("id", flat=True).iterator()
+            for chunk in chunked(ids, dispatch_chunk_size()):
+                dispatch.send(check_heartbeat_chunk, (chunk,), items=len(chunk))
+        else:
+            for hb in due_hbs.iterator():
+                dispatch.send(check_single_heartbeat, (hb.id,))
+
+    return (
+        f"Queued {dispatch.items} heartbeats for checking in "
+        f"{dispatch.messages} messages ({dispatch.duration:.2f}s)."
+    )
 
 
 # ===========================================
@@ -281,28 +825,18 @@ def collect_uptime_percentages():
     Calculate and update 24-hour uptime percentages for all monitors.
     Schedule this to run every 5-15 minutes.
     """
-    from .models import Website, UptimeCheckResult
-    
-    twenty_four_hours_ago = now() - timedelta(hours=24)
-    
-    for website in Website.objects.filter(is_active=True):
-        # Get all checks in last 24 hours
-        checks = UptimeCheckResult.objects.filter(
-            website=website,
-            checked_at__gte=twenty_four_hours_ago
-        )
-        
-        total_checks = checks.count()
-        if total_checks == 0:
+    websites = Website.objects.filter(is_active=True).only("id", "name")
+    totals = rollups.uptime_by_website(now() - timedelta(hours=24), website__is_active=True)
+
+    for website in websites:
+        total = totals.get(website.id)
+        if not total:
             continue
-        
-        successful_checks = checks.filter(status='success').count()
-        uptime_percentage = (successful_checks / total_checks) * 100
-        
+
         update_uptime_percentage(
             str(website.id),
             website.name,
-            uptime_percentage
+            total.uptime_percentage
         )
 
 
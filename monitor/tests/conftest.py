@@ -0,0 +1,9 @@
+import pytest
+from unittest.mock import patch
+
+
+@pytest.fixture(autouse=True)
+def confirmations():
+    """Confirmation re-checks are queued on a mock rather than the broker."""
+    with patch('monitor.tasks.confirm_website_down') as task:
+        yield task
@@ -0,0 +1,170 @@
+import pytest
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils.timezone import now
+from monitor.archive import archive_day, archive_expired, archived_until, archived_uptime, read_archive
+from monitor.models import UptimeCheckResult, Website
+from monitor.tasks import cleanup_old_logs
+
+User = get_user_model()
+
+DAY = datetime(2030, 6, 1, tzinfo=dt_timezone.utc)
+
+
+@pytest.fixture
+def website():
+    user = User.objects.create(email="tester@gmail.com")
+    return Website.objects.create(user=user, url="https://example.com")
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return FileSystemStorage(location=tmp_path)
+
+
+def save_checks(website, *checks):
+    """Save (checked_at, status_code, response_time_ms[, error_message]) results."""
+    UptimeCheckResult.objects.bulk_create([
+        UptimeCheckResult(
+            website=website,
+            checked_at=check[0],
+            status_code=check[1],
+            response_time_ms=check[2],
+            error_message=check[3] if len(check) > 3 else "",
+        )
+        for check in checks
+    ])
+
+# ---------------------------------------------------
+# Writing and reading the archive
+# ---------------------------------------------------
+
+
+@pytest.mark.django_db
+def test_a_day_is_archived_per_website_and_read_back(website, storage):
+    """
+    Each website's rows of a day land in their own file and read back as
+    they were saved; re-archiving the day writes nothing new.
+    """
+    other = Website.objects.create(user=website.user, url="https://example.org")
+    save_checks(website, (DAY + timedelta(hours=1), 200, 120), (DAY + timedelta(hours=2), 500, 300, "Server error"))
+    save_checks(other, (DAY + timedelta(hours=3), 200, 80))
+    save_checks(website, (DAY + timedelta(days=1), 200, 90))  # the next day
+
+    assert archive_day(UptimeCheckResult, DAY, storage) == (3, 2)
+    assert archive_day(UptimeCheckResult, DAY, storage) == (3, 2)
+    assert len(storage.listdir(f"check_results/date=2030-06-01/website={website.id}")[1]) == 1
+
+    table = read_archive(UptimeCheckResult, website.id, DAY, DAY + timedelta(days=1), storage=storage)
+    assert table.column("status_code").to_pylist() == [200, 500]
+    assert table.column("error_message").to_pylist() == ["", "Server error"]
+    assert table.column("checked_at").to_pylist()[0] == DAY + timedelta(hours=1)
+
+
+@pytest.mark.django_db
+def test_archived_uptime_over_a_period(website, storage):
+    """
+    Uptime and response times come from the files alone, limited to the
+    period asked for.
+    """
+    save_checks(
+        website,
+        (DAY + timedelta(hours=1), 200, 100),
+        (DAY + timedelta(hours=2), 200, 200),
+        (DAY + timedelta(hours=3), 200, 0, "Timeout"),
+        (DAY + timedelta(days=1, hours=1), 503, 400),
+    )
+    archive_expired(UptimeCheckResult, DAY + timedelta(days=2), storage)
+    UptimeCheckResult.objects.all().delete()
+
+    day = archived_uptime(website.id, DAY, DAY + timedelta(days=1), storage=storage)
+    both = archived_uptime(website.id, DAY, DAY + timedelta(days=2), storage=storage)
+
+    assert (day.checks, day.successes, day.avg_ms) == (3, 2, 100)
+    assert (both.checks, both.successes) == (4, 2)
+    assert both.uptime_percentage == 50
+
+
+@pytest.mark.django_db
+def test_archived_uptime_command(website, storage, tmp_path):
+    """
+    The command prints a website's archived uptime over the days asked for.
+    """
+    save_checks(website, (DAY + timedelta(hours=1), 200, 100), (DAY + timedelta(hours=2), 500, 100))
+    archive_expired(UptimeCheckResult, DAY + timedelta(days=1), storage)
+    out = StringIO()
+
+    with override_settings(ARCHIVE_STORAGE={
+        "BACKEND": "django.core.files.storage.FileSystemStorage", "OPTIONS": {"location": tmp_path},
+    }):
+        call_command(
+            "archived_uptime", str(website.id), "--start", "2030-06-01", "--end", "2030-06-02", stdout=out
+        )
+
+    assert "2 archived checks" in out.getvalue()
+    assert "Uptime: 50.00%" in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_archive_is_read_from_storages_without_directories(website, tmp_path):
+    """
+    Object stores such as S3 report no directories as existing; reads list
+    the parts directly instead of asking first.
+    """
+    class ObjectStorage(FileSystemStorage):
+        def exists(self, name):
+            return name.endswith(".parquet") and super().exists(name)
+
+    storage = ObjectStorage(location=tmp_path)
+    save_checks(website, (DAY + timedelta(hours=1), 200, 100), (DAY + timedelta(hours=2), 500, 100))
+    archive_expired(UptimeCheckResult, DAY + timedelta(days=1), storage)
+
+    assert archived_uptime(website.id, DAY, DAY + timedelta(days=1), storage=storage).checks == 2
+    assert archived_uptime(website.id + 1, DAY, DAY + timedelta(days=1), storage=storage).checks == 0
+
+# ---------------------------------------------------
+# Retention
+# ---------------------------------------------------
+
+
+@pytest.mark.django_db
+def test_cleanup_deletes_only_archived_days(website, tmp_path):
+    """
+    With archiving on, expired whole days are archived before they go, and
+    rows of the day the cutoff falls in wait until that day is archived.
+    """
+    cutoff_day = (now() - timedelta(days=90)).replace(hour=0, minute=0, second=0, microsecond=0)
+    save_checks(
+        website,
+        (cutoff_day - timedelta(days=2, hours=-1), 200, 100),
+        (cutoff_day - timedelta(hours=23), 200, 100),
+        (cutoff_day + timedelta(seconds=1), 200, 100),  # expired, but its day is not over
+        (now(), 200, 100),
+    )
+    storage = {"BACKEND": "django.core.files.storage.FileSystemStorage", "OPTIONS": {"location": tmp_path}}
+
+    with override_settings(ARCHIVE_EXPIRED_LOGS=True, ARCHIVE_STORAGE=storage):
+        summary = cleanup_old_logs(90)
+
+    assert "monitor_uptimecheckresult: archived 2 rows, deleted 2 rows" in summary
+    assert UptimeCheckResult.objects.count() == 2
+    assert archived_until(UptimeCheckResult) == cutoff_day
+    with override_settings(ARCHIVE_STORAGE=storage):
+        assert archived_uptime(website.id, cutoff_day - timedelta(days=3), cutoff_day).checks == 2
+
+
+@pytest.mark.django_db
+def test_archive_stopped_by_its_deadline_resumes(website, storage):
+    """
+    Archiving stops between days once out of time and carries on from the
+    last day it finished.
+    """
+    save_checks(website, (DAY + timedelta(hours=1), 200, 100), (DAY + timedelta(days=1, hours=1), 200, 100))
+
+    assert archive_expired(UptimeCheckResult, DAY + timedelta(days=2), storage, deadline=0) == 0
+    assert archive_expired(UptimeCheckResult, DAY + timedelta(days=2), storage) == 2
+    assert archived_until(UptimeCheckResult) == DAY + timedelta(days=2)
@@ -0,0 +1,153 @@
+import json
+import pytest
+from datetime import datetime, timedelta, timezone as dt_timezone
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.utils.timezone import now
+from monitor.alerts import handle_alert
+from monitor.cert_cache import CERT_KEY, certificate_metadata, remember_certificate
+from monitor.models import Alert, Website
+from monitor.tasks import check_certificate_expiry
+from monitor.utils import _note_certificate
+
+User = get_user_model()
+
+
+def peer(not_after):
+    """An ssl_object whose verified certificate expires at `not_after`."""
+    return SimpleNamespace(getpeercert=lambda: {
+        "notAfter": not_after.strftime("%b %d %H:%M:%S %Y GMT"),
+        "subject": ((("commonName", "example.com"),),),
+        "issuer": ((("organizationName", "Let's Encrypt"),),),
+    })
+
+
+@pytest.fixture
+def cert_redis():
+    """A mock client standing in for Redis."""
+    client = MagicMock()
+    client.get.return_value = None
+    with patch('monitor.cert_cache.redis_utils.r', client):
+        yield client
+
+# ---------------------------------------------------
+# Capturing certificates
+# ---------------------------------------------------
+
+
+def test_certificate_metadata_is_read_from_peer_certificate():
+    """
+    notAfter becomes an ISO timestamp, alongside subject and issuer names.
+    """
+    metadata = certificate_metadata(peer(datetime(2030, 6, 1, 12)))
+
+    assert metadata == {
+        "not_after": "2030-06-01T12:00:00+00:00",
+        "subject": "example.com",
+        "issuer": "Let's Encrypt",
+    }
+    assert certificate_metadata(None) is None
+
+
+def test_certificates_are_cached_per_host_and_port(cert_redis):
+    """
+    A certificate is stored under its host:port with the cache TTL.
+    """
+    remember_certificate(("example.com", 443), peer(datetime(2030, 6, 1, 12)))
+
+    key, value = cert_redis.set.call_args.args
+    assert key == CERT_KEY.format("example.com", 443)
+    assert json.loads(value)["not_after"] == "2030-06-01T12:00:00+00:00"
+    assert cert_redis.set.call_args.kwargs["ex"] > 0
+
+
+def test_redirect_target_certificate_is_not_the_websites(cert_redis):
+    """
+    After a redirect to another host, that host's certificate is cached but
+    not reported as the website's own.
+    """
+    def response(url):
+        sock = peer(datetime(2030, 6, 1, 12))
+        return SimpleNamespace(url=url, raw=SimpleNamespace(connection=SimpleNamespace(sock=sock)))
+
+    own = _note_certificate("https://example.com/", response("https://example.com/home"))
+    other = _note_certificate("https://example.com/", response("https://www.example.org/"))
+
+    assert own == datetime(2030, 6, 1, 12, tzinfo=dt_timezone.utc)
+    assert other is None
+    assert cert_redis.set.call_count == 2
+
+# ---------------------------------------------------
+# Daily expiry check
+# ---------------------------------------------------
+
+
+@pytest.mark.django_db
+@patch('monitor.tasks.fetch_certificate')
+@patch('monitor.tasks.handle_alert')
+def test_expiring_certificates_raise_alerts(mock_alert, mock_fetch, cert_redis):
+    """
+    Websites whose cached certificate expires within their alert window are
+    alerted; the cache spares them a handshake of their own.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    soon = Website.objects.create(user=user, url="https://example.com/a")
+    same_host = Website.objects.create(user=user, url="https://example.com/b", cert_expiry_alert_days=3)
+    Website.objects.create(user=user, url="http://example.com/")  # no TLS
+    expires_at = (now() + timedelta(days=5)).replace(microsecond=0)
+    cert_redis.get.return_value = json.dumps({
+        "not_after": expires_at.isoformat(), "subject": "example.com", "issuer": "",
+    })
+
+    check_certificate_expiry()
+
+    mock_alert.assert_called_once_with(soon, "cert_expiry")
+    mock_fetch.assert_not_called()
+    cert_redis.get.assert_called_once()  # one lookup per host:port
+    same_host.refresh_from_db()
+    assert same_host.cert_expires_at == expires_at
+
+
+@pytest.mark.django_db
+@patch('monitor.tasks.fetch_certificate')
+def test_renewed_certificate_clears_alert(mock_fetch, cert_redis):
+    """
+    Hosts missing from the cache get a handshake, and a renewed certificate
+    clears the website's active expiry alert.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    site = Website.objects.create(user=user, url="tls://mail.example.com:465")
+    alert = Alert.objects.create(
+        content_type=ContentType.objects.get_for_model(Website),
+        object_id=site.id,
+        alert_type="cert_expiry",
+    )
+    mock_fetch.return_value = {
+        "not_after": (now() + timedelta(days=90)).isoformat(), "subject": "", "issuer": "",
+    }
+
+    check_certificate_expiry()
+
+    mock_fetch.assert_called_once_with("mail.example.com", 465)
+    alert.refresh_from_db()
+    assert alert.is_active is False
+
+
+@pytest.mark.django_db
+@patch('monitor.alerts.notify_users')
+def test_certificate_expiry_alert_is_sent_once(mock_notify):
+    """
+    An expiring certificate is only announced once, not every day.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    site = Website.objects.create(
+        user=user, url="https://example.com", cert_expires_at=now() + timedelta(days=5)
+    )
+
+    handle_alert(site, "cert_expiry")
+    handle_alert(site, "cert_expiry")
+
+    mock_notify.assert_called_once_with(site, "cert_expiry")
+    assert Alert.objects.filter(alert_type="cert_expiry", is_active=True).count() == 1
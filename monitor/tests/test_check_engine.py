@@ -0,0 +1,384 @@
+import socket
+import struct
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from monitor.check_engine import probe_websites
+from monitor.utils import KeywordMatcher, check_website_uptime
+from monitor.http_pool import recycle_session
+from monitor.dns_cache import DNSCache, get_dns_cache
+from monitor.socket_checks import check_socket
+
+
+class FakeTargetHandler(BaseHTTPRequestHandler):
+    """
+    Answers with the status code given in the path, e.g. GET /503.
+    `?bytes=N` sends an N-byte body, `?start=WORD` puts WORD in front of it
+    and `?trickle=1` sends it in 1KB pieces every 100ms. `?stall=1` sends
+    half of it and then nothing for a second, `?reset=1` half of it and
+    then resets the connection.
+    """
+    protocol_version = "HTTP/1.1"  # keep-alive, so pooled connections get reused
+
+    def respond(self, send_body=True):
+        path, _, query = self.path.partition("?")
+        params = dict(param.split("=") for param in query.split("&") if param)
+        status = int(path.strip("/") or 200)
+        body = b"x" * int(params["bytes"]) if "bytes" in params else b"ok"
+        body = params.get("start", "").encode() + body
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not send_body:
+            return
+        try:
+            if "stall" in params or "reset" in params:
+                self.wfile.write(body[:len(body) // 2])
+                self.wfile.flush()
+                self.close_connection = True
+                if "stall" in params:
+                    time.sleep(1)
+                else:
+                    # Close with a RST instead of a FIN
+                    self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+                    self.connection.close()
+            elif "trickle" in params:
+                for i in range(0, len(body), 1024):
+                    self.wfile.write(body[i:i + 1024])
+                    self.wfile.flush()
+                    time.sleep(0.1)
+            else:
+                self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the checker stopped reading
+
+    def do_GET(self):
+        self.respond()
+
+    def do_HEAD(self):
+        self.server.head_requests += 1
+        self.respond(send_body=False)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def fresh_pools():
+    yield
+    recycle_session()
+
+
+@pytest.fixture
+def fake_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeTargetHandler)
+    server.head_requests = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fake_target(fake_server):
+    return f"http://127.0.0.1:{fake_server.server_address[1]}"
+
+
+def make_website(pk, url, timeout_ms=2000, use_dns_cache=True,
+                 request_method="GET_CAPPED", max_body_bytes=64 * 1024,
+                 keyword="", keyword_assertion="MUST_CONTAIN"):
+    return SimpleNamespace(
+        id=pk,
+        name=f"site-{pk}",
+        url=url,
+        monitor_type=url.split("://")[0] if url.startswith(("tcp:", "tls:")) else "http",
+        timeout_ms=timeout_ms,
+        use_dns_cache=use_dns_cache,
+        request_method=request_method,
+        max_body_bytes=max_body_bytes,
+        keyword=keyword,
+        keyword_assertion=keyword_assertion,
+    )
+
+
+def test_probe_websites_checks_batch_concurrently(fake_target):
+    """
+    Each website in the batch gets its own status code and response time.
+    """
+    websites = [
+        make_website(1, f"{fake_target}/200"),
+        make_website(2, f"{fake_target}/503"),
+        make_website(3, "http://127.0.0.1:1/"),  # nothing listens here
+    ]
+
+    results = probe_websites(websites, concurrency=2)
+
+    assert results[1].status_code == 200
+    assert results[1].response_time_ms > 0
+    assert results[1].ip == "127.0.0.1"
+    assert results[2].status_code == 503
+    assert results[3].status_code == 0
+    assert results[3].error_message
+
+
+def test_probe_websites_reuses_pooled_connections(fake_target):
+    """
+    The worker-lifetime pool keeps connections open between batches.
+    """
+    first = probe_websites([make_website(1, f"{fake_target}/200")])
+    second = probe_websites([make_website(1, f"{fake_target}/200")])
+
+    assert first[1].connection_reused is False
+    assert second[1].connection_reused is True
+
+
+def test_probe_websites_records_phase_timings(fake_target):
+    """
+    New connections report connect time; reused ones only request phases.
+    """
+    first = probe_websites([make_website(1, f"{fake_target}/200")])[1]
+    second = probe_websites([make_website(1, f"{fake_target}/200")])[1]
+
+    assert first.timings["connect"] is not None
+    assert first.timings["tls"] is None  # plain http
+    assert first.timings["ttfb"] is not None
+    assert first.timings["download"] is not None
+
+    assert second.timings["connect"] is None
+    assert second.timings["dns"] is None
+    assert second.timings["ttfb"] is not None
+
+
+def test_check_website_uptime_reuses_pooled_connections(fake_target):
+    """
+    The legacy engine reports connection reuse through its pooled session.
+    """
+    first = check_website_uptime(f"{fake_target}/200")
+    second = check_website_uptime(f"{fake_target}/200")
+
+    assert first.status_code == 200
+    assert first.connection_reused is False
+    assert second.connection_reused is True
+
+# ---------------------------------------------------
+# Request modes and bounded reads
+# ---------------------------------------------------
+
+
+def test_probe_websites_head_mode_sends_head(fake_server, fake_target):
+    """
+    HEAD checks only fetch the status line and headers.
+    """
+    results = probe_websites([
+        make_website(1, f"{fake_target}/200", request_method="HEAD"),
+    ])
+
+    assert results[1].status_code == 200
+    assert fake_server.head_requests == 1
+
+
+@pytest.mark.parametrize("request_method", ["GET", "GET_CAPPED"])
+def test_large_bodies_are_not_downloaded(fake_target, request_method):
+    """
+    Both engines stop after the cap (or the headers) instead of fetching a
+    body that would take far longer than the timeout to trickle in.
+    """
+    url = f"{fake_target}/200?bytes=1000000&trickle=1"
+    website = make_website(
+        1, url, timeout_ms=1000, request_method=request_method, max_body_bytes=2048
+    )
+
+    batch = probe_websites([website])[1]
+    legacy = check_website_uptime(
+        url, timeout_ms=1000, request_method=request_method, max_body_bytes=2048
+    )
+
+    for result in (batch, legacy):
+        assert result.status_code == 200
+        assert result.response_time_ms < 1000
+
+
+def test_check_website_uptime_enforces_total_deadline(fake_target):
+    """
+    A body trickling in faster than the socket timeout still fails once the
+    whole check has taken longer than timeout_ms.
+    """
+    result = check_website_uptime(
+        f"{fake_target}/200?bytes=20000&trickle=1",
+        timeout_ms=300,
+        max_body_bytes=1024 * 1024,
+    )
+
+    assert result.status_code == 0
+    assert result.error_message == "Timed out after 300ms"
+    assert result.failure_reason == "timeout"
+
+
+@pytest.mark.parametrize("failure, error_message, failure_reason", [
+    ("stall", "Timed out after 300ms", "timeout"),
+    ("reset", "ProtocolError: [Errno 104] Connection reset by peer", "connection_error"),
+])
+def test_check_website_uptime_fails_on_a_broken_body(fake_target, failure, error_message, failure_reason):
+    """
+    A server that stalls or resets the connection half way through the body
+    fails the check, rather than raising urllib3's errors to the task.
+    """
+    result = check_website_uptime(f"{fake_target}/200?bytes=20000&{failure}=1", timeout_ms=300)
+
+    assert result.status_code == 0
+    assert result.error_message == error_message
+    assert result.failure_reason == failure_reason
+
+# ---------------------------------------------------
+# Keyword checks
+# ---------------------------------------------------
+
+
+def test_keyword_matcher_finds_keyword_split_across_chunks():
+    """
+    Only a short tail is carried between chunks, enough to catch a split keyword.
+    """
+    matcher = KeywordMatcher("healthy")
+
+    assert not matcher.feed(b"status: heal")
+    assert len(matcher._tail) == len("healthy") - 1
+    assert matcher.feed(b"thy, all good")
+    assert matcher.error_message == ""
+
+
+@pytest.mark.parametrize("keyword, keyword_assertion, error_message", [
+    ("healthy", "MUST_CONTAIN", ""),
+    ("healthy", "MUST_NOT_CONTAIN", "Keyword 'healthy' found in response body"),
+    ("maintenance", "MUST_CONTAIN", "Keyword 'maintenance' not found in response body"),
+    ("maintenance", "MUST_NOT_CONTAIN", ""),
+])
+def test_keyword_checks_in_both_engines(fake_target, keyword, keyword_assertion, error_message):
+    """
+    Both engines evaluate the assertion on the capped body and report a
+    failed one as the error message of an otherwise successful response.
+    """
+    url = f"{fake_target}/200?bytes=4096&start=healthy"
+    website = make_website(1, url, keyword=keyword, keyword_assertion=keyword_assertion)
+
+    batch = probe_websites([website])[1]
+    legacy = check_website_uptime(url, matcher=KeywordMatcher.for_website(website))
+
+    for result in (batch, legacy):
+        assert result.status_code == 200
+        assert result.error_message == error_message
+        assert result.failure_reason == ("content_mismatch" if error_message else None)
+
+
+def test_keyword_found_stops_reading(fake_target):
+    """
+    Once the keyword is found the rest of a slow body is not waited for.
+    """
+    url = f"{fake_target}/200?bytes=1000000&start=healthy&trickle=1"
+    website = make_website(1, url, keyword="healthy", max_body_bytes=1024 * 1024)
+
+    batch = probe_websites([website])[1]
+    legacy = check_website_uptime(
+        url, max_body_bytes=1024 * 1024, matcher=KeywordMatcher.for_website(website)
+    )
+
+    for result in (batch, legacy):
+        assert result.error_message == ""
+        assert result.response_time_ms < 1000
+
+# ---------------------------------------------------
+# TCP / TLS monitors
+# ---------------------------------------------------
+
+
+def test_tcp_monitors_only_connect(fake_server):
+    """
+    tcp:// monitors pass when the port accepts connections, in both engines.
+    """
+    port = fake_server.server_address[1]
+    websites = [
+        make_website(1, f"tcp://127.0.0.1:{port}"),
+        make_website(2, "tcp://127.0.0.1:1"),  # nothing listens here
+    ]
+
+    results = probe_websites(websites)
+    legacy = check_socket(f"tcp://127.0.0.1:{port}", timeout_ms=2000)
+
+    for result in (results[1], legacy):
+        assert result.status_code == 200
+        assert result.ip == "127.0.0.1"
+        assert result.timings["connect"] is not None
+        assert result.timings["ttfb"] is None
+    assert results[2].status_code == 0
+    assert results[2].failure_reason == "connection_error"
+
+
+def test_tcp_monitor_resolves_through_the_dns_cache(fake_server):
+    """
+    The async engine resolves tcp:// hosts through its DNS cache, like it
+    does for HTTP checks, and reports the lookup as the dns phase.
+    """
+    get_dns_cache().set("tcp-cached.test", ["127.0.0.1"], socket.AF_INET, 300)
+    url = f"tcp://tcp-cached.test:{fake_server.server_address[1]}"
+
+    result = probe_websites([make_website(1, url)])[1]
+
+    assert result.status_code == 200
+    assert result.ip == "127.0.0.1"
+    assert result.timings["dns"] is not None
+
+
+def test_tls_monitor_fails_without_handshake(fake_server):
+    """
+    tls:// monitors fail when the port is open but no TLS handshake completes.
+    """
+    url = f"tls://127.0.0.1:{fake_server.server_address[1]}"
+
+    batch = probe_websites([make_website(1, url, timeout_ms=1000)])[1]
+    legacy = check_socket(url, timeout_ms=1000)
+
+    for result in (batch, legacy):
+        assert result.status_code == 0
+        assert result.error_message
+        assert result.cert_expires_at is None
+
+# ---------------------------------------------------
+# DNS cache
+# ---------------------------------------------------
+
+
+def test_dns_cache_expires_entries_by_ttl():
+    """
+    Positive answers live for their (clamped) TTL, negative ones for negative_ttl.
+    """
+    cache = DNSCache(min_ttl=5, max_ttl=60, negative_ttl=10)
+
+    with patch("monitor.dns_cache.time.monotonic", return_value=1000):
+        cache.set("cdn.example.com", ["192.0.2.1"], 2, ttl=1)  # clamped up to 5s
+        cache.set_negative("missing.example.com")
+
+    with patch("monitor.dns_cache.time.monotonic", return_value=1004):
+        assert cache.get("cdn.example.com") == (["192.0.2.1"], 2)
+        assert cache.get("missing.example.com") == (None, None)
+
+    with patch("monitor.dns_cache.time.monotonic", return_value=1011):
+        assert cache.get("cdn.example.com") is None
+        assert cache.get("missing.example.com") is None
+
+
+def test_dns_cache_evicts_least_recently_used():
+    """
+    The cache never holds more than max_entries hostnames.
+    """
+    cache = DNSCache(max_entries=2)
+    cache.set("a.example.com", ["192.0.2.1"], 2, ttl=60)
+    cache.set("b.example.com", ["192.0.2.2"], 2, ttl=60)
+    cache.get("a.example.com")
+    cache.set("c.example.com", ["192.0.2.3"], 2, ttl=60)
+
+    assert len(cache) == 2
+    assert cache.get("b.example.com") is None
+    assert cache.get("a.example.com") is not None
@@ -0,0 +1,115 @@
+import asyncio
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+from monitor.dns_cache import get_dns_cache
+from monitor.host_limiter import HostLimiter, limit_targets
+
+
+@pytest.fixture
+def limiter_redis():
+    """A mock Redis client; tests script the ACQUIRE_SCRIPT answers via eval."""
+    return MagicMock()
+
+
+def make_limiter(client, max_wait=0.2):
+    return HostLimiter(redis_client=client, max_concurrency=2, max_rps=5, max_wait=max_wait)
+
+# ---------------------------------------------------
+# Budget targets
+# ---------------------------------------------------
+
+
+def test_limit_targets_include_cached_ip():
+    """
+    Checks draw from the host's budget, and from the IP's once it is resolved.
+    """
+    get_dns_cache().clear()
+    assert limit_targets("https://Example.com/status") == ["host:example.com"]
+
+    get_dns_cache().set("example.com", ["93.184.216.34"], 2, ttl=60)
+    assert limit_targets("https://example.com/") == ["host:example.com", "ip:93.184.216.34"]
+    get_dns_cache().clear()
+
+# ---------------------------------------------------
+# Waiting for the budget
+# ---------------------------------------------------
+
+
+@patch('monitor.host_limiter.record_host_throttle')
+def test_throttled_check_waits_for_a_slot(mock_throttle, limiter_redis, caplog):
+    """
+    A spent budget delays the check until a slot frees up, then releases it.
+    The host is logged, not used as a metric label.
+    """
+    limiter_redis.eval.side_effect = [0, 0, 1]
+    limiter = make_limiter(limiter_redis, max_wait=5)
+
+    with limiter.limit("https://example.com/"):
+        pass
+
+    assert limiter_redis.eval.call_count == 3
+    limiter_redis.pipeline.return_value.zrem.assert_called_once()
+    mock_throttle.assert_called_once()
+    assert "Check of example.com waited" in caplog.text
+
+
+@patch('monitor.host_limiter.record_host_throttle')
+def test_throttled_check_runs_anyway_after_max_wait(mock_throttle, limiter_redis):
+    """
+    Throttling delays a check but never fails it.
+    """
+    limiter_redis.eval.return_value = 0
+    limiter = make_limiter(limiter_redis, max_wait=0.1)
+    ran = False
+
+    with limiter.limit("https://example.com/"):
+        ran = True
+
+    assert ran
+    limiter_redis.pipeline.assert_not_called()  # no slot was taken
+    assert mock_throttle.call_args.args[0] >= 0.1
+
+
+@patch('monitor.host_limiter.record_host_throttle')
+def test_unthrottled_check_is_not_recorded(mock_throttle, limiter_redis):
+    """
+    Checks that get a slot straight away don't count as throttled.
+    """
+    limiter_redis.eval.return_value = 1
+
+    with make_limiter(limiter_redis).limit("https://example.com/"):
+        pass
+
+    mock_throttle.assert_not_called()
+
+
+def test_async_budget_calls_leave_the_event_loop_free(limiter_redis):
+    """
+    The async engine's Redis round trips run off the event loop, so the
+    other probes keep going while one takes its slot.
+    """
+    def slow_eval(*args):
+        time.sleep(0.2)
+        return 1
+
+    limiter_redis.eval.side_effect = slow_eval
+    limiter = make_limiter(limiter_redis)
+    ticks = []
+
+    async def other_probe():
+        for _ in range(5):
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.02)
+
+    async def limited_probe():
+        async with limiter.limit_async("https://example.com/"):
+            pass
+
+    async def probes():
+        await asyncio.gather(other_probe(), limited_probe())
+
+    asyncio.run(probes())
+
+    assert ticks[-1] - ticks[0] < 0.15
+    limiter_redis.pipeline.return_value.zrem.assert_called_once()
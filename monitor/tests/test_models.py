@@ -1,9 +1,16 @@
 import pytest
+from datetime import timedelta
+from io import StringIO
+from django.utils import timezone
 from django.contrib.auth import get_user_model
-from django.db import IntegrityError
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import override_settings
 from monitor.models import (
     Website,
     UptimeCheckResult,
+    ErrorMessage,
     Alert,
     NotificationPreference,
     HeartBeat
@@ -43,6 +50,47 @@ def test_website_str_method():
     assert str(site1) == site1.url
     assert str(site2) == "My Site"
 
+
+@pytest.mark.django_db
+def test_website_next_check_after_uses_stable_offset():
+    """
+    Slots sit at the website's own offset within its interval, never on a
+    shared boundary for every monitor.
+    """
+    user = User.objects.create(email="testuser@gmail.com")
+    sites = [
+        Website.objects.create(user=user, url=f"https://{i}.example.com", check_interval=1)
+        for i in range(20)
+    ]
+
+    moment = timezone.now()
+    for site in sites:
+        slot = site.next_check_after(moment)
+        assert 0 < (slot - moment).total_seconds() <= 60
+        assert int(slot.timestamp()) % 60 == site.schedule_offset_seconds
+        assert site.next_check_after(slot) == slot + timedelta(seconds=60)
+
+    assert len({site.schedule_offset_seconds for site in sites}) > 1
+
+
+@pytest.mark.django_db
+def test_website_offset_follows_the_url_only_with_the_async_engine():
+    """
+    Monitors of one URL get their own offsets (from their ids) with the
+    legacy engine, and share one with the async engine, which probes them
+    together.
+    """
+    user = User.objects.create(email="testuser@gmail.com")
+    sites = [
+        Website.objects.create(user=user, url="https://example.com", check_interval=60)
+        for _ in range(10)
+    ]
+
+    with override_settings(CHECK_ENGINE="legacy"):
+        assert len({site.schedule_offset_seconds for site in sites}) > 1
+    with override_settings(CHECK_ENGINE="async"):
+        assert len({site.schedule_offset_seconds for site in sites}) == 1
+
 # ---------------------------------------------------
 # UptimeCheckResult Model Tests
 # ---------------------------------------------------
@@ -84,6 +132,71 @@ def test_uptime_check_result_str_method():
     assert str(result).startswith(site.url)
     assert str(result).endswith(str(result.status_code) + " at " + str(result.checked_at))
 
+
+@pytest.mark.django_db
+def test_uptime_check_result_error_messages_are_stored_once():
+    """
+    Results with the same error share one ErrorMessage row, keyed by the
+    hash of its text, whether saved one by one or in bulk; results without
+    an error point at none.
+    """
+    user = User.objects.create(email="testuser@gmail.com")
+    site = Website.objects.create(user=user, url="https://example.com")
+
+    UptimeCheckResult.objects.create(
+        website=site, status_code=0, response_time_ms=5000, error_message="Connection refused"
+    )
+    UptimeCheckResult.objects.bulk_create([
+        UptimeCheckResult(website=site, status_code=0, response_time_ms=5000, error_message="Connection refused"),
+        UptimeCheckResult(website=site, status_code=200, response_time_ms=100, error_message=""),
+    ])
+
+    assert list(ErrorMessage.objects.values_list('id', 'message')) == [
+        (ErrorMessage.key("Connection refused"), "Connection refused")
+    ]
+    results = UptimeCheckResult.objects.select_related('error').order_by('pk')
+    assert [result.error_message for result in results] == ["Connection refused", "Connection refused", ""]
+    assert results[2].error_id is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_backfill_error_messages_between_migrations():
+    """
+    Between migrations 0019 and 0020 the command points results saved with
+    the old text column at their ErrorMessage rows, in batches; 0020 moves
+    only the ones saved after it ran.
+    """
+    user = User.objects.create(email="testuser@gmail.com")
+    site = Website.objects.create(user=user, url="https://example.com")
+    executor = MigrationExecutor(connection)
+    executor.migrate([("monitor", "0019_errormessage_uptimecheckresult_error")])
+
+    def save_old_result(message):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO monitor_uptimecheckresult "
+                "(website_id, status_code, error_message, response_time_ms, checked_at) "
+                "VALUES (%s, 0, %s, 12.4, %s)",
+                [site.id, message, timezone.now()],
+            )
+
+    try:
+        for message in ["Connection refused", "", "Connection refused"]:
+            save_old_result(message)
+        out = StringIO()
+        call_command("backfill_error_messages", "--batch-size", "2", stdout=out)
+        save_old_result("Timed out")  # a writer still on the old code
+
+        assert "Moved 2 error messages" in out.getvalue()
+        assert list(ErrorMessage.objects.values_list('message', flat=True)) == ["Connection refused"]
+    finally:
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    results = UptimeCheckResult.objects.select_related('error').order_by('pk')
+    assert [result.error_message for result in results] == ["Connection refused", "", "Connection refused", "Timed out"]
+    assert [result.response_time_ms for result in results] == [12, 12, 12, 12]
+
 # ---------------------------------------------------
 # Alert Model Tests
 # ---------------------------------------------------
@@ -0,0 +1,117 @@
+import pytest
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils.timezone import now
+from monitor.models import UptimeCheckResult, Website
+from monitor.partitions import create_partitions, drop_partitions_before, period_start
+from monitor.tasks import cleanup_old_logs
+
+User = get_user_model()
+
+TABLE = "monitor_uptimecheckresult"
+DAY = datetime(2030, 6, 5, tzinfo=dt_timezone.utc)  # a Wednesday
+
+
+def day_partitions(*days):
+    """partitions() rows for whole days starting at DAY + each of `days`."""
+    return [
+        (f"{TABLE}_p{DAY + timedelta(days=d):%Y%m%d}", DAY + timedelta(days=d), DAY + timedelta(days=d + 1))
+        for d in days
+    ]
+
+# ---------------------------------------------------
+# Partition layout
+# ---------------------------------------------------
+
+
+def test_periods_are_utc_days_or_weeks_from_monday():
+    """
+    Daily partitions start at UTC midnight, weekly ones on Monday.
+    """
+    moment = DAY + timedelta(hours=15)
+
+    assert period_start(moment, "day") == DAY
+    assert period_start(moment, "week") == DAY - timedelta(days=2)
+
+
+@pytest.mark.django_db
+@patch('monitor.partitions._execute')
+@patch('monitor.partitions.partitions')
+def test_only_missing_partitions_are_created(mock_partitions, mock_execute):
+    """
+    Periods an existing partition covers are skipped, e.g. after switching
+    from weekly to daily partitions.
+    """
+    mock_partitions.return_value = day_partitions(0, 1)
+
+    created = create_partitions(TABLE, DAY, DAY + timedelta(days=3), "day")
+
+    assert created == [f"{TABLE}_p20300607", f"{TABLE}_p20300608"]
+    sql = mock_execute.call_args.args[0]
+    assert f'PARTITION OF "{TABLE}"' in sql
+    assert "FROM ('2030-06-08T00:00:00+00:00') TO ('2030-06-09T00:00:00+00:00')" in sql
+
+# ---------------------------------------------------
+# Retention
+# ---------------------------------------------------
+
+
+@patch('monitor.partitions._execute')
+@patch('monitor.partitions.partitions')
+@patch('monitor.partitions.is_partitioned', return_value=True)
+def test_expired_partitions_are_dropped_whole(_, mock_partitions, mock_execute):
+    """
+    Partitions that end before the cutoff are dropped; the one holding the
+    cutoff is kept until all its rows expire.
+    """
+    mock_partitions.return_value = day_partitions(0, 1, 2)
+
+    dropped = drop_partitions_before(UptimeCheckResult, DAY + timedelta(days=1, hours=12))
+
+    assert dropped == [f"{TABLE}_p20300605"]
+    mock_execute.assert_called_once_with(f'DROP TABLE "{TABLE}_p20300605"')
+
+
+@pytest.mark.django_db
+@patch('monitor.retention.drop_partitions_before', return_value=["p1", "p2"])
+@patch('monitor.retention.is_partitioned')
+def test_cleanup_drops_partitions_of_partitioned_tables(mock_partitioned, mock_drop):
+    """
+    A partitioned table expires its logs by dropping partitions; the others
+    still delete rows.
+    """
+    mock_partitioned.side_effect = lambda model: model is UptimeCheckResult
+    user = User.objects.create(email="tester@gmail.com")
+    site = Website.objects.create(user=user, url="https://example.com")
+    UptimeCheckResult.objects.create(
+        website=site, status_code=200, response_time_ms=10, checked_at=now() - timedelta(days=100)
+    )
+
+    summary = cleanup_old_logs(90)
+
+    assert f"{TABLE}: deleted 0 rows, dropped 2 partitions" in summary
+    assert mock_drop.call_args.args[0] is UptimeCheckResult
+    assert UptimeCheckResult.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_partition_logs_needs_postgres():
+    """
+    Converting tables is refused on other databases.
+    """
+    with pytest.raises(CommandError):
+        call_command("partition_logs", stdout=StringIO())
+
+
+@pytest.mark.django_db
+def test_result_storage_benchmark_needs_postgres():
+    """
+    The storage benchmark compares PostgreSQL table sizes, so it is refused
+    on other databases.
+    """
+    with pytest.raises(CommandError):
+        call_command("benchmark_result_storage", stdout=StringIO())
@@ -0,0 +1,225 @@
+import json
+import pytest
+import redis
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.utils.timezone import now
+from monitor.models import ErrorMessage, Website, UptimeCheckResult
+from django.db import IntegrityError
+from monitor.result_buffer import (
+    ATTEMPTS_KEY, BUFFER_KEY, DEAD_LETTER_KEY, INFLIGHT_KEY, flush_buffered_results,
+)
+from monitor.retention import purge_unused_messages
+from monitor.tasks import record_check_result
+from monitor.utils import ProbeResult
+
+User = get_user_model()
+
+
+@pytest.fixture
+def buffer_redis():
+    """Result buffer enabled, with a mock client standing in for Redis."""
+    client = MagicMock()
+    client.pipeline.return_value.execute.return_value = [1]
+    with override_settings(CHECK_RESULT_BUFFER="redis"), \
+            patch('monitor.result_buffer.redis_utils.r', client):
+        yield client
+
+
+def buffered_entries(client):
+    """The JSON entries pushed onto the buffer so far."""
+    return [call.args[1] for call in client.pipeline.return_value.rpush.call_args_list]
+
+
+def buffered_entry(site, error_message=""):
+    """A buffered entry of one check of `site`, passed unless it has an error."""
+    return json.dumps({
+        "website_id": site.id,
+        "checked_at": now().isoformat(),
+        "result": {"status_code": 0 if error_message else 200, "response_time_ms": 80,
+                   "error_message": error_message,
+                   "connection_reused": None, "ip": None, "timings": {}},
+        "state": {"is_down": False, "last_downtime_at": None, "last_recovered_at": None,
+                  "consecutive_failures": 0, "consecutive_successes": 1,
+                  "lease_expires_at": None},
+    })
+
+# ---------------------------------------------------
+# Buffering
+# ---------------------------------------------------
+
+
+@pytest.mark.django_db
+@patch('monitor.tasks.handle_alert')
+def test_buffered_result_alerts_without_writing(mock_alert, buffer_redis, django_assert_num_queries):
+    """
+    With the buffer on, downtime is alerted at once but nothing is written yet.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    lease = now() + timedelta(minutes=5)
+    site = Website.objects.create(
+        user=user, url="https://example.com", failure_threshold=1, lease_expires_at=lease
+    )
+
+    with django_assert_num_queries(0):
+        record_check_result(site, ProbeResult(status_code=503, response_time_ms=80))
+
+    mock_alert.assert_called_once_with(site, "downtime")
+    [entry] = [json.loads(entry) for entry in buffered_entries(buffer_redis)]
+    assert entry["website_id"] == site.id
+    assert entry["result"]["status_code"] == 503
+    assert entry["state"]["is_down"] is True
+    assert entry["state"]["lease_expires_at"] is None
+
+
+@pytest.mark.django_db
+@patch('monitor.tasks.handle_alert')
+def test_buffer_falls_back_to_direct_writes_on_redis_error(mock_alert, buffer_redis):
+    """
+    If Redis can't take the result, the worker writes it itself.
+    """
+    buffer_redis.pipeline.return_value.execute.side_effect = redis.ConnectionError("down")
+    user = User.objects.create(email="tester@gmail.com")
+    site = Website.objects.create(user=user, url="https://example.com")
+
+    record_check_result(site, ProbeResult(status_code=200, response_time_ms=80))
+
+    assert UptimeCheckResult.objects.filter(website=site).count() == 1
+
+
+@pytest.mark.django_db
+@patch('monitor.tasks.handle_alert')
+def test_confirmation_builds_on_the_buffered_check_before_it(mock_alert, buffer_redis):
+    """
+    A confirmation first writes the failed check still waiting in the
+    buffer, so the two failures reach the threshold together and no later
+    flush overwrites the confirmation's streak with the older one.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    site = Website.objects.create(user=user, url="https://example.com", failure_threshold=2)
+    failure = ProbeResult(status_code=503, response_time_ms=80)
+    record_check_result(site, failure)
+    [entry] = buffered_entries(buffer_redis)
+    buffer_redis.set.return_value = True
+    buffer_redis.lrange.side_effect = lambda key, *_: [entry] if key == BUFFER_KEY else []
+
+    record_check_result(Website.objects.get(pk=site.pk), failure, confirmation=1)
+
+    buffer_redis.lrem.assert_called_once_with(BUFFER_KEY, 1, entry)
+    site.refresh_from_db()
+    assert site.is_down is True
+    assert site.consecutive_failures == 2
+    assert UptimeCheckResult.objects.filter(website=site).count() == 2
+    mock_alert.assert_called_once_with(site, "downtime")
+
+# ---------------------------------------------------
+# Flushing
+# ---------------------------------------------------
+
+
+@pytest.mark.django_db
+@patch('monitor.tasks.handle_alert')
+def test_flush_writes_results_and_latest_state_in_bulk(mock_alert, buffer_redis, django_assert_max_num_queries):
+    """
+    A flush inserts every buffered result with its own check time and saves
+    each website's latest state, then drops the in-flight batch.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    site = Website.objects.create(user=user, url="https://example.com", failure_threshold=2)
+    for status_code in (503, 503, 503):
+        record_check_result(site, ProbeResult(status_code=status_code, response_time_ms=80))
+    entries = buffered_entries(buffer_redis)
+
+    buffer_redis.set.return_value = True
+    buffer_redis.lrange.return_value = []
+    buffer_redis.eval.side_effect = [entries, [], 1]  # take, take (empty), unlock
+    buffer_redis.llen.return_value = 0
+
+    with django_assert_max_num_queries(5):
+        assert flush_buffered_results() == 3
+
+    checked_at = [json.loads(entry)["checked_at"] for entry in entries]
+    rows = UptimeCheckResult.objects.filter(website=site).order_by('id')
+    assert [row.checked_at.isoformat() for row in rows] == checked_at
+    site.refresh_from_db()
+    assert site.is_down is True
+    assert site.consecutive_failures == 3
+    buffer_redis.delete.assert_called_once_with(INFLIGHT_KEY, ATTEMPTS_KEY)
+
+
+@pytest.mark.django_db
+def test_flush_retries_batch_left_in_flight(buffer_redis):
+    """
+    A batch a crashed flush left in flight is written before new ones.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    site = Website.objects.create(user=user, url="https://example.com")
+    leftover = buffered_entry(site)
+    buffer_redis.set.return_value = True
+    buffer_redis.lrange.side_effect = [[leftover], []]
+    buffer_redis.eval.side_effect = [[], 1]
+    buffer_redis.llen.return_value = 0
+
+    assert flush_buffered_results() == 1
+    assert UptimeCheckResult.objects.filter(website=site).count() == 1
+
+
+@pytest.mark.django_db
+@patch('monitor.models.UptimeCheckResultQuerySet.bulk_create', side_effect=IntegrityError("bad row"))
+def test_flush_parks_a_batch_that_keeps_failing(_, buffer_redis):
+    """
+    A batch that fails to write stays in flight for the next flush, and is
+    moved to the dead-letter list once it has failed MAX_WRITE_ATTEMPTS
+    times, so the batches behind it are written again.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    site = Website.objects.create(user=user, url="https://example.com")
+    stuck = buffered_entry(site)
+    buffer_redis.set.return_value = True
+    buffer_redis.lrange.return_value = [stuck]
+    buffer_redis.llen.return_value = 0
+
+    buffer_redis.incr.return_value = 1
+    assert flush_buffered_results() == 0
+    buffer_redis.rpush.assert_not_called()
+    buffer_redis.delete.assert_not_called()
+
+    buffer_redis.incr.return_value = 3
+    buffer_redis.lrange.side_effect = [[stuck], []]
+    buffer_redis.eval.return_value = []
+    flush_buffered_results()
+    buffer_redis.rpush.assert_called_once_with(DEAD_LETTER_KEY, stuck)
+    buffer_redis.delete.assert_called_once_with(INFLIGHT_KEY, ATTEMPTS_KEY)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_flush_racing_the_message_purge_keeps_its_result(buffer_redis):
+    """
+    A purge that deletes an unused error message just as a flush reuses it
+    fails the flush's foreign key check; the batch stays in flight and the
+    next flush writes it, storing the message again.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    site = Website.objects.create(user=user, url="https://example.com")
+    ErrorMessage.objects.create(id=ErrorMessage.key("refused"), message="refused")  # unused
+    entry = buffered_entry(site, "refused")
+    buffer_redis.set.return_value = True
+    buffer_redis.lrange.side_effect = [[entry], [entry], []]
+    buffer_redis.eval.return_value = []
+    buffer_redis.llen.return_value = 0
+    buffer_redis.incr.return_value = 1
+
+    save_messages = ErrorMessage.save_messages
+
+    def purge_meanwhile(results):
+        save_messages(results)
+        purge_unused_messages()
+
+    with patch.object(ErrorMessage, 'save_messages', side_effect=purge_meanwhile):
+        assert flush_buffered_results() == 0
+    buffer_redis.delete.assert_not_called()
+
+    assert flush_buffered_results() == 1
+    assert UptimeCheckResult.objects.select_related('error').get(website=site).error_message == "refused"
@@ -0,0 +1,149 @@
+import pytest
+from datetime import timedelta
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.utils.timezone import now
+from monitor.models import Alert, Checkpoint, ErrorMessage, HeartBeat, PingLog, UptimeCheckResult, Website
+from monitor.retention import RetentionPolicy, checkpoint_name, purge_expired
+from monitor.tasks import cleanup_old_logs
+
+User = get_user_model()
+
+RESULTS = RetentionPolicy(UptimeCheckResult, "checked_at", 90)
+
+
+@pytest.fixture
+def website():
+    user = User.objects.create(email="tester@gmail.com")
+    return Website.objects.create(user=user, url="https://example.com")
+
+
+def save_results(website, *ages_in_days):
+    """One check result per age, oldest first in id order as given."""
+    for days in ages_in_days:
+        UptimeCheckResult.objects.create(
+            website=website, status_code=200, response_time_ms=10,
+            checked_at=now() - timedelta(days=days),
+        )
+
+
+def last_id(policy):
+    return Checkpoint.objects.get(name=checkpoint_name(policy)).position["last_id"]
+
+# ---------------------------------------------------
+# Chunked deletion
+# ---------------------------------------------------
+
+
+@pytest.mark.django_db
+def test_expired_rows_are_deleted_in_chunks_up_to_the_first_recent_row(website, django_assert_max_num_queries):
+    """
+    Chunks are read and deleted in id order until rows are recent enough to
+    keep, and the checkpoint is left just before the first of them.
+    """
+    save_results(website, 120, 110, 100, 95, 10, 5)
+    first_recent = UptimeCheckResult.objects.order_by('pk')[4].pk
+
+    result = purge_expired(RESULTS, size=2, pause=0)
+
+    assert result.deleted == 4
+    assert result.finished
+    assert UptimeCheckResult.objects.count() == 2
+    assert last_id(RESULTS) == first_recent - 1
+
+    # The next pass starts at the checkpoint instead of the deleted rows
+    with django_assert_max_num_queries(4):
+        assert purge_expired(RESULTS, size=2, pause=0).deleted == 0
+
+
+@pytest.mark.django_db
+def test_purge_stopped_by_its_deadline_resumes(website):
+    """
+    A run out of time stops between chunks and the next run carries on.
+    """
+    save_results(website, 120, 110, 100, 95)
+
+    stopped = purge_expired(RESULTS, size=2, pause=0, deadline=0)
+    resumed = purge_expired(RESULTS, size=2, pause=0)
+
+    assert (stopped.deleted, stopped.finished) == (0, False)
+    assert (resumed.deleted, resumed.finished) == (4, True)
+
+
+@pytest.mark.django_db
+def test_dry_run_estimates_without_deleting(website):
+    """
+    A dry run counts what would go and leaves rows and checkpoint alone.
+    """
+    save_results(website, 120, 110, 5)
+
+    result = purge_expired(RESULTS, dry_run=True)
+
+    assert result.estimate == 2
+    assert UptimeCheckResult.objects.count() == 3
+    assert not Checkpoint.objects.filter(name=checkpoint_name(RESULTS)).exists()
+
+# ---------------------------------------------------
+# Ping logs and alerts
+# ---------------------------------------------------
+
+
+@pytest.mark.django_db
+def test_cleanup_expires_ping_logs_and_resolved_alerts(website):
+    """
+    Old ping logs and resolved alerts go; active alerts stay however old,
+    and hold the alert checkpoint back so they are seen again.
+    """
+    heartbeat = HeartBeat.objects.create(user=website.user, name="backup", interval=60)
+    ping = PingLog.objects.create(heartbeat=heartbeat, status="success")
+    PingLog.objects.filter(pk=ping.pk).update(timestamp=now() - timedelta(days=100))
+    PingLog.objects.create(heartbeat=heartbeat, status="success")
+
+    website_type = ContentType.objects.get_for_model(Website)
+    active = Alert.objects.create(content_type=website_type, object_id=website.id, alert_type="downtime")
+    Alert.objects.create(
+        content_type=website_type, object_id=website.id, alert_type="recovery", is_active=False
+    )
+    Alert.objects.all().update(created_at=now() - timedelta(days=200))
+
+    summary = cleanup_old_logs(90)
+
+    assert "monitor_pinglog: deleted 1 rows" in summary
+    assert "monitor_alert: deleted 1 rows" in summary
+    assert PingLog.objects.count() == 1
+    assert list(Alert.objects.all()) == [active]
+    assert last_id(RetentionPolicy(Alert, "created_at", 180)) == active.pk - 1
+
+
+@pytest.mark.django_db
+def test_cleanup_deletes_error_messages_no_result_uses(website):
+    """
+    Once expired results are gone, so are the error messages only they
+    pointed at; messages of kept results stay.
+    """
+    for days, message in [(120, "Connection refused"), (120, "Timed out"), (5, "Timed out")]:
+        UptimeCheckResult.objects.create(
+            website=website, status_code=0, response_time_ms=10, error_message=message,
+            checked_at=now() - timedelta(days=days),
+        )
+
+    summary = cleanup_old_logs(90)
+
+    assert "monitor_errormessage: deleted 1 rows" in summary
+    assert list(ErrorMessage.objects.values_list('message', flat=True)) == ["Timed out"]
+
+
+@pytest.mark.django_db
+def test_cleanup_command_dry_run(website):
+    """
+    The command's dry run reports estimates per table.
+    """
+    save_results(website, 120, 5)
+    out = StringIO()
+
+    call_command("cleanup_uptime_logs", "--dry-run", "--table", "results", stdout=out)
+
+    assert "monitor_uptimecheckresult: about 1 expired rows" in out.getvalue()
+    assert UptimeCheckResult.objects.count() == 2
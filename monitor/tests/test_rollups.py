@@ -0,0 +1,168 @@
+import pytest
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils.timezone import now
+from rest_framework.test import APIClient
+from monitor.models import DailyCheckRollup, HourlyCheckRollup, UptimeCheckResult, Website
+from monitor.rollups import check_series, rollup_check_results, series_resolution, total_of
+from monitor.tasks import collect_uptime_percentages
+
+User = get_user_model()
+
+HOUR = datetime(2030, 6, 1, 12, tzinfo=dt_timezone.utc)
+
+
+@pytest.fixture
+def website():
+    user = User.objects.create(email="tester@gmail.com")
+    return Website.objects.create(user=user, url="https://example.com", check_interval=1)
+
+
+def save_checks(website, *checks):
+    """Save (checked_at, status_code, response_time_ms[, error_message]) results."""
+    UptimeCheckResult.objects.bulk_create([
+        UptimeCheckResult(
+            website=website,
+            checked_at=check[0],
+            status_code=check[1],
+            response_time_ms=check[2],
+            error_message=check[3] if len(check) > 3 else "",
+        )
+        for check in checks
+    ])
+
+
+def roll_up():
+    """Run the rollup until everything saved so far is folded in."""
+    rollup_check_results()
+    rollup_check_results()
+
+# ---------------------------------------------------
+# Rolling up
+# ---------------------------------------------------
+
+
+@pytest.mark.django_db
+def test_results_are_rolled_up_per_hour_and_day(website):
+    """
+    Each hour and day gets counts, min / max / sum and a histogram; failed
+    keyword checks (200 with an error) count as failures.
+    """
+    save_checks(
+        website,
+        (HOUR + timedelta(minutes=1), 200, 100),
+        (HOUR + timedelta(minutes=2), 200, 300, "Keyword not found"),
+        (HOUR + timedelta(minutes=3), 503, 50),
+        (HOUR + timedelta(hours=1), 200, 200),
+    )
+
+    roll_up()
+
+    first, second = HourlyCheckRollup.objects.order_by('bucket_start')
+    assert first.bucket_start == HOUR
+    assert (first.check_count, first.success_count) == (3, 1)
+    assert (first.response_time_min, first.response_time_max) == (50, 300)
+    assert first.response_time_sum == 450
+    assert sum(first.response_time_histogram.values()) == 3
+    assert second.check_count == 1
+
+    day = DailyCheckRollup.objects.get()
+    assert day.bucket_start == HOUR.replace(hour=0)
+    assert (day.check_count, day.success_count) == (4, 2)
+
+
+@pytest.mark.django_db
+def test_rollup_only_reads_new_results(website, django_assert_max_num_queries):
+    """
+    Results saved after a rollup are merged into the existing buckets, and a
+    run with nothing new reads no results.
+    """
+    save_checks(website, (HOUR, 200, 100))
+    roll_up()
+    save_checks(website, (HOUR + timedelta(minutes=5), 200, 500))
+    roll_up()
+
+    hour = HourlyCheckRollup.objects.get()
+    assert hour.check_count == 2
+    assert hour.response_time_max == 500
+
+    with django_assert_max_num_queries(7):
+        assert rollup_check_results() == 0
+
+# ---------------------------------------------------
+# Reading series
+# ---------------------------------------------------
+
+
+def test_series_resolution_depends_on_the_range():
+    """
+    Short ranges read raw results, then hourly and daily rollups.
+    """
+    assert series_resolution(HOUR, HOUR + timedelta(hours=24)) == "raw"
+    assert series_resolution(HOUR, HOUR + timedelta(days=30)) == "hour"
+    assert series_resolution(HOUR, HOUR + timedelta(days=365)) == "day"
+
+
+@pytest.mark.django_db
+def test_series_include_results_not_rolled_up_yet(website):
+    """
+    Results past the rollup checkpoint are folded into the series as they
+    are read, so series are never behind.
+    """
+    save_checks(website, *[(HOUR + timedelta(minutes=i), 200, 10 * (i + 1)) for i in range(10)])
+    roll_up()
+    save_checks(website, (HOUR + timedelta(minutes=30), 503, 2000))
+
+    buckets = check_series(HOUR, HOUR + timedelta(days=3), "hour", website=website)
+
+    bucket = buckets[HOUR]
+    assert (bucket.checks, bucket.successes) == (11, 10)
+    assert bucket.max_ms == 2000
+    # Percentiles are within one histogram bucket (25%) of the real value
+    assert 60 <= bucket.percentile(50) <= 60 * 1.25
+    assert bucket.percentile(100) == 2000
+    assert total_of(buckets.values()).checks == 11
+
+
+@pytest.mark.django_db
+def test_detail_view_charts_long_ranges_from_rollups(website):
+    """
+    A 30-day detail view reads hourly rollups: one chart point per hour.
+    """
+    current_hour = now().replace(minute=0, second=0, microsecond=0)
+    save_checks(website, *[
+        (current_hour - timedelta(hours=h) + timedelta(minutes=m), 200, 100)
+        for h in range(1, 4) for m in range(0, 60, 10)
+    ])
+    roll_up()
+    client = APIClient()
+    client.force_authenticate(user=website.user)
+
+    url = reverse("website-detail-view", args=[website.id])
+    response = client.get(url, {"start_date": (now() - timedelta(days=30)).isoformat()})
+
+    assert response.data["resolution"] == "hour"
+    assert response.data["total_checks_24h"] == 18
+    assert response.data["uptime_percentage"] == 100
+    assert [point["checks"] for point in response.data["response_time_chart"]] == [6, 6, 6]
+
+# ---------------------------------------------------
+# Uptime percentages
+# ---------------------------------------------------
+
+
+@pytest.mark.django_db
+@patch('monitor.tasks.update_uptime_percentage')
+def test_uptime_percentages_come_from_rollups_and_recent_results(mock_update, website):
+    """
+    The 24-hour uptime gauge counts rolled up and newer results alike.
+    """
+    save_checks(website, (now() - timedelta(hours=2), 200, 100), (now() - timedelta(hours=1), 503, 100))
+    roll_up()
+    save_checks(website, (now(), 200, 100), (now(), 200, 100))
+
+    collect_uptime_percentages()
+
+    mock_update.assert_called_once_with(str(website.id), website.name, 75)
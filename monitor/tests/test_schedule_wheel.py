@@ -0,0 +1,101 @@
+import pytest
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.utils.timezone import now
+from monitor.models import Website
+from monitor.serializers import WebsiteSerializer
+from monitor.utils import claim_scheduled_websites
+
+User = get_user_model()
+
+
+@pytest.fixture
+def wheel_redis():
+    """Redis backend enabled, with a mock client standing in for Redis."""
+    client = MagicMock()
+    with override_settings(CHECK_SCHEDULER_BACKEND="redis"), \
+            patch('monitor.schedule_wheel.redis_utils.r', client):
+        yield client
+
+# ---------------------------------------------------
+# Keeping the schedule in sync
+# ---------------------------------------------------
+
+
+@pytest.mark.django_db
+def test_website_saves_and_deletes_update_schedule(wheel_redis, django_capture_on_commit_callbacks):
+    """
+    Saving schedules the website at next_check_at; pausing or deleting drops it.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    next_check_at = now() + timedelta(seconds=30)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        site = Website.objects.create(
+            user=user, url="https://example.com", next_check_at=next_check_at
+        )
+    wheel_redis.zadd.assert_called_once_with(
+        "schedule:websites", {site.pk: next_check_at.timestamp()}
+    )
+
+    with django_capture_on_commit_callbacks(execute=True):
+        site.is_active = False
+        site.save()
+    wheel_redis.zrem.assert_called_with("schedule:websites", site.pk)
+
+    wheel_redis.zrem.reset_mock()
+    site_id = site.pk
+    with django_capture_on_commit_callbacks(execute=True):
+        site.delete()
+    wheel_redis.zrem.assert_called_once_with("schedule:websites", site_id)
+
+# ---------------------------------------------------
+# Claiming popped websites
+# ---------------------------------------------------
+
+
+@pytest.mark.django_db
+def test_claim_scheduled_websites_advances_sub_minute_interval():
+    """
+    Popped websites are leased and moved to their next 10-second slot.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    site = Website.objects.create(
+        user=user, url="https://example.com", check_interval_seconds=10, next_check_at=now()
+    )
+    slot = site.next_check_at
+    lease = now() + timedelta(minutes=5)
+
+    claims = claim_scheduled_websites({site.id: slot}, due_by=now(), lease_until=lease)
+
+    assert [claim.website.id for claim in claims] == [site.id]
+    assert claims[0].run_at == slot
+    site.refresh_from_db()
+    assert site.lease_expires_at == lease
+    assert 0 < (site.next_check_at - now()).total_seconds() <= 10
+
+# ---------------------------------------------------
+# Sub-minute intervals
+# ---------------------------------------------------
+
+
+@pytest.mark.django_db
+def test_sub_minute_interval_requires_redis_backend():
+    """
+    10s / 30s intervals are rejected unless the Redis scheduler backend is on.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    data = {"url": "https://example.com", "check_interval_seconds": 10}
+    context = {"request": SimpleNamespace(user=user)}
+
+    serializer = WebsiteSerializer(data=data, context=context)
+    assert not serializer.is_valid()
+    assert "check_interval_seconds" in serializer.errors
+
+    with override_settings(CHECK_SCHEDULER_BACKEND="redis"), \
+            patch('monitor.schedule_wheel.redis_utils.r', MagicMock()):
+        serializer = WebsiteSerializer(data=data, context=context)
+        assert serializer.is_valid(), serializer.errors
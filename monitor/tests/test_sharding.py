@@ -0,0 +1,104 @@
+import pytest
+from io import StringIO
+from datetime import timedelta
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils.timezone import now
+from monitor.management.commands.run_scheduler import Command as RunScheduler
+from monitor.models import Website
+from monitor.sharding import ShardCoordinator, assign_shards
+from monitor.utils import claim_due_websites
+
+User = get_user_model()
+
+# ---------------------------------------------------
+# Shard assignment
+# ---------------------------------------------------
+
+
+def test_assign_shards_only_moves_shards_of_changed_node():
+    """
+    Every shard has exactly one owner, and removing a node only moves its shards.
+    """
+    three = assign_shards(["zone-a", "zone-b", "zone-c"], 64)
+    two = assign_shards(["zone-a", "zone-b"], 64)
+
+    assert set(three) == set(range(64))
+    assert set(three.values()) == {"zone-a", "zone-b", "zone-c"}
+    for shard, node in three.items():
+        if node != "zone-c":
+            assert two[shard] == node
+
+
+def test_coordinator_without_redis_owns_every_shard():
+    """
+    A single node without Redis dispatches everything.
+    """
+    coordinator = ShardCoordinator(node_id="solo", shards=8)
+    coordinator.redis = None
+
+    assert coordinator.refresh() == set(range(8))
+
+# ---------------------------------------------------
+# Sharded claiming
+# ---------------------------------------------------
+
+
+@pytest.mark.django_db
+@override_settings(SCHEDULER_SHARDS=2)
+def test_claim_due_websites_only_claims_owned_shards():
+    """
+    Nodes owning different shards claim disjoint sets of websites.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    sites = [
+        Website.objects.create(user=user, url=f"https://{i}.example.com", next_check_at=now())
+        for i in range(6)
+    ]
+    due_by = now()
+    lease = now() + timedelta(minutes=5)
+
+    even = claim_due_websites(due_by, lease, shards=[0])
+    odd = claim_due_websites(due_by, lease, shards=[1])
+
+    assert {claim.website.id % 2 for claim in even} == {0}
+    assert {claim.website.id % 2 for claim in odd} == {1}
+    assert len(even) + len(odd) == len(sites)
+
+
+@pytest.mark.django_db
+@override_settings(SCHEDULER_SHARDS=4)
+@patch('monitor.management.commands.run_scheduler.check_due_heartbeats')
+@patch('monitor.management.commands.run_scheduler.check_due_websites')
+@patch('monitor.sharding.redis_utils.r', None)
+def test_run_scheduler_once_dispatches_owned_shards(mock_websites, mock_heartbeats):
+    """
+    One scheduler round dispatches websites and heartbeats for its shards.
+    """
+    call_command("run_scheduler", "--once", "--node-id", "test", stdout=StringIO())
+
+    mock_websites.assert_called_once_with(shards=[0, 1, 2, 3])
+    mock_heartbeats.assert_called_once_with(shards=[0, 1, 2, 3])
+
+
+@pytest.mark.django_db
+@override_settings(SCHEDULER_SHARDS=4, SCHEDULER_HEARTBEAT_SECONDS=60)
+@patch('monitor.management.commands.run_scheduler.check_due_heartbeats')
+@patch('monitor.management.commands.run_scheduler.check_due_websites')
+@patch('monitor.sharding.redis_utils.r', None)
+def test_run_scheduler_dispatches_heartbeats_once_a_minute(mock_websites, mock_heartbeats):
+    """
+    Websites are dispatched every round, heartbeats only once per
+    SCHEDULER_HEARTBEAT_SECONDS however short the tick.
+    """
+    command = RunScheduler()
+    coordinator = ShardCoordinator(node_id="test")
+
+    with patch('monitor.management.commands.run_scheduler.time.monotonic', side_effect=[100, 110, 170]):
+        for _ in range(3):
+            command.dispatch_round(coordinator)
+
+    assert mock_websites.call_count == 3
+    assert mock_heartbeats.call_count == 2
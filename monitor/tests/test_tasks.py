@@ -0,0 +1,622 @@
+import socket
+import pytest
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+from django.core.management import call_command, CommandError
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.utils.timezone import now
+from monitor.models import Website, UptimeCheckResult, HeartBeat, ErrorMessage
+from monitor.tasks import (
+    record_check_result,
+    check_website_batch,
+    check_due_websites,
+    queue_website_checks,
+    check_heartbeat_chunk,
+    check_due_heartbeats,
+    confirm_website_down,
+)
+from monitor.utils import ProbeResult, check_website_uptime, parse_lease
+
+User = get_user_model()
+
+# ---------------------------------------------------
+# Result recording
+# ---------------------------------------------------
+
+
+@pytest.mark.django_db
+@patch('monitor.tasks.handle_alert')
+def test_record_check_result_marks_down_and_recovers(mock_alert):
+    """
+    Failed checks mark the website down, the next 200 recovers it.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    site = Website.objects.create(user=user, url="https://example.com")
+
+    failure = ProbeResult(status_code=0, response_time_ms=5000, error_message="refused")
+    for _ in range(3):
+        record_check_result(site, failure)
+
+    site.refresh_from_db()
+    assert site.is_down is True
+    assert site.last_downtime_at is not None
+    assert UptimeCheckResult.objects.filter(website=site).count() == 3
+    assert UptimeCheckResult.objects.filter(error__message="refused").count() == 3
+    mock_alert.assert_called_with(site, "downtime")
+
+    record_check_result(site, ProbeResult(status_code=200, response_time_ms=80))
+
+    site.refresh_from_db()
+    assert site.is_down is False
+    assert site.last_recovered_at is not None
+    mock_alert.assert_called_with(site, "recovery")
+
+
+@pytest.mark.django_db
+@patch('monitor.tasks.handle_alert')
+def test_record_check_result_uses_per_monitor_thresholds(mock_alert, django_assert_num_queries):
+    """
+    Streaks on the website decide down/up, without re-reading recent checks.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    site = Website.objects.create(
+        user=user, url="https://example.com", failure_threshold=2, recovery_threshold=2
+    )
+    failure = ProbeResult(status_code=503, response_time_ms=80)
+    success = ProbeResult(status_code=200, response_time_ms=80)
+
+    with django_assert_num_queries(2):  # insert the result, update the website
+        record_check_result(site, failure)
+    assert site.is_down is False
+    assert site.consecutive_failures == 1
+
+    record_check_result(site, failure)
+    assert site.is_down is True
+
+    record_check_result(site, success)
+    assert site.is_down is True
+    assert site.consecutive_failures == 0
+
+    record_check_result(site, success)
+    site.refresh_from_db()
+    assert site.is_down is False
+    assert site.consecutive_successes == 2
+    mock_alert.assert_called_with(site, "recovery")
+
+
+@pytest.mark.django_db
+@patch('monitor.tasks.handle_alert')
+def test_record_check_result_counts_failed_keyword_as_failure(mock_alert):
+    """
+    A 200 whose content assertion failed breaks the success streak.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    site = Website.objects.create(user=user, url="https://example.com", failure_threshold=1)
+    mismatch = ProbeResult(
+        status_code=200,
+        response_time_ms=80,
+        error_message="Keyword 'healthy' not found in response body",
+    )
+
+    record_check_result(site, mismatch)
+
+    assert site.is_down is True
+    assert UptimeCheckResult.objects.get(website=site).error_message == mismatch.error_message
+    mock_alert.assert_called_once_with(site, "downtime")
+
+
+@pytest.mark.django_db
+@patch('monitor.tasks.handle_alert')
+def test_identical_connection_failures_share_one_error_message(mock_alert):
+    """
+    Two refused connections read the same, without the addresses in the
+    exception's repr, so both results point at one ErrorMessage.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    with socket.socket() as closed:
+        closed.bind(("127.0.0.1", 0))
+        port = closed.getsockname()[1]
+    site = Website.objects.create(user=user, url=f"http://127.0.0.1:{port}/")
+
+    for _ in range(2):
+        record_check_result(site, check_website_uptime(site.url, timeout_ms=2000))
+
+    assert list(ErrorMessage.objects.values_list('message', flat=True)) == [
+        "ConnectionError: [Errno 111] Connection refused"
+    ]
+    assert UptimeCheckResult.objects.filter(website=site, error__isnull=False).count() == 2
+
+# ---------------------------------------------------
+# Confirmation re-checks
+# ---------------------------------------------------
+
+
+@pytest.mark.django_db
+@patch('monitor.tasks.handle_alert')
+def test_first_failure_schedules_confirmation(mock_alert, confirmations):
+    """
+    A failure short of the threshold queues a fast re-check; a failure that
+    reaches it, or a success, doesn't.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    site = Website.objects.create(user=user, url="https://example.com", failure_threshold=2)
+    failure = ProbeResult(status_code=503, response_time_ms=80)
+
+    with override_settings(CHECK_CONFIRM_DELAY_SECONDS=3, CHECK_CONFIRM_QUEUE="confirm"):
+        record_check_result(site, failure)
+    confirmations.apply_async.assert_called_once_with((site.id, 1), countdown=3, queue="confirm")
+
+    record_check_result(site, failure)
+    record_check_result(site, ProbeResult(status_code=200, response_time_ms=80))
+    assert confirmations.apply_async.call_count == 1
+
+
+@pytest.mark.django_db
+@patch('monitor.tasks.handle_alert')
+@patch('monitor.tasks._check_website')
+def test_confirmations_mark_website_down_before_next_interval(mock_check, mock_alert, confirmations):
+    """
+    With the default threshold, two failed re-checks declare the website
+    down. Re-checks leave a scheduled check's lease alone.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    site = Website.objects.create(user=user, url="https://example.com", check_interval=15)
+    failure = ProbeResult(status_code=0, response_time_ms=5000, error_message="refused")
+    mock_check.return_value = failure
+
+    record_check_result(site, failure)
+    lease = now() + timedelta(minutes=5)
+    Website.objects.filter(pk=site.pk).update(lease_expires_at=lease)
+
+    confirm_website_down(site.id, 1)
+    assert confirmations.apply_async.call_args.args[0] == (site.id, 2)
+    confirm_website_down(site.id, 2)
+    assert confirmations.apply_async.call_count == 2  # no third re-check
+
+    site.refresh_from_db()
+    assert site.is_down is True
+    assert site.lease_expires_at == lease
+    assert UptimeCheckResult.objects.filter(website=site).count() == 3
+    mock_alert.assert_called_once_with(site, "downtime")
+
+
+@pytest.mark.django_db
+@patch('monitor.tasks._check_website')
+def test_confirmation_that_passes_clears_the_streak(mock_check, confirmations):
+    """
+    A one-off failure that the re-check doesn't reproduce leaves the site up.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    site = Website.objects.create(user=user, url="https://example.com", consecutive_failures=1)
+    mock_check.return_value = ProbeResult(status_code=200, response_time_ms=80)
+
+    confirm_website_down(site.id, 1)
+
+    site.refresh_from_db()
+    assert site.is_down is False
+    assert site.consecutive_failures == 0
+    confirmations.apply_async.assert_not_called()
+
+
+@pytest.mark.django_db
+@patch('monitor.tasks.handle_alert')
+@patch('monitor.tasks._check_website')
+def test_confirmation_keeps_changes_made_during_its_probe(mock_check, mock_alert, confirmations):
+    """
+    A website claimed, and its streak advanced, while a confirmation probes
+    keeps its new lease, and the confirmation counts on top of the streak.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    site = Website.objects.create(
+        user=user, url="https://example.com", consecutive_failures=1, failure_threshold=5
+    )
+    lease = now() + timedelta(minutes=5)
+
+    def scheduled_check_meanwhile(website):
+        Website.objects.filter(pk=site.pk).update(lease_expires_at=lease, consecutive_failures=2)
+        return ProbeResult(status_code=0, response_time_ms=5000, error_message="refused")
+    mock_check.side_effect = scheduled_check_meanwhile
+
+    confirm_website_down(site.id, 1)
+
+    site.refresh_from_db()
+    assert site.lease_expires_at == lease
+    assert site.consecutive_failures == 3
+
+# ---------------------------------------------------
+# Async batch engine
+# ---------------------------------------------------
+
+
+@pytest.mark.django_db
+@patch('monitor.tasks.handle_alert')
+@patch('monitor.tasks.probe_websites')
+def test_check_website_batch_records_every_result(mock_probe, mock_alert):
+    """
+    Every active website in the batch gets a result, inactive ones are skipped.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    up = Website.objects.create(user=user, url="https://up.example.com", next_check_at=now())
+    paused = Website.objects.create(
+        user=user, url="https://paused.example.com", is_active=False, next_check_at=now()
+    )
+
+    mock_probe.return_value = {up.id: ProbeResult(status_code=200, response_time_ms=42)}
+
+    check_website_batch([up.id, paused.id])
+
+    assert [w.id for w in mock_probe.call_args[0][0]] == [up.id]
+    assert UptimeCheckResult.objects.filter(website=up).count() == 1
+    assert not UptimeCheckResult.objects.filter(website=paused).exists()
+
+
+@pytest.mark.django_db
+@patch('monitor.tasks.handle_alert')
+@patch('monitor.tasks.probe_websites')
+def test_check_website_batch_skips_released_lease(mock_probe, mock_alert):
+    """
+    A batch delivered twice for the same lease only checks each website once.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    lease = now() + timedelta(minutes=5)
+    site = Website.objects.create(
+        user=user, url="https://up.example.com", next_check_at=now(), lease_expires_at=lease
+    )
+    mock_probe.side_effect = lambda websites: {
+        w.id: ProbeResult(status_code=200, response_time_ms=42) for w in websites
+    }
+
+    check_website_batch([site.id], lease.isoformat())
+    check_website_batch([site.id], lease.isoformat())
+
+    site.refresh_from_db()
+    assert site.lease_expires_at is None
+    assert UptimeCheckResult.objects.filter(website=site).count() == 1
+
+
+@pytest.mark.django_db
+@patch('monitor.tasks.handle_alert')
+@patch('monitor.tasks.probe_websites')
+def test_check_website_batch_shares_probe_between_identical_websites(mock_probe, mock_alert):
+    """
+    Monitors of the same URL with the same settings are probed once; each
+    still gets its own result and its own downtime decision.
+    """
+    alice = User.objects.create(email="alice@gmail.com")
+    bob = User.objects.create(email="bob@gmail.com")
+    strict = Website.objects.create(user=alice, url="https://status.example.com", failure_threshold=1)
+    lenient = Website.objects.create(user=bob, url="https://status.example.com", failure_threshold=3)
+    other = Website.objects.create(user=bob, url="https://other.example.com")
+    mock_probe.side_effect = lambda websites: {
+        w.id: ProbeResult(status_code=503, response_time_ms=42) for w in websites
+    }
+
+    result = check_website_batch([strict.id, lenient.id, other.id])
+
+    assert len(mock_probe.call_args[0][0]) == 2
+    assert "3 websites in batch with 2 probes" in result
+    assert UptimeCheckResult.objects.filter(status_code=503).count() == 3
+    strict.refresh_from_db()
+    lenient.refresh_from_db()
+    assert strict.is_down is True
+    assert lenient.is_down is False
+    mock_alert.assert_called_once_with(strict, "downtime")
+
+
+@pytest.mark.django_db
+@patch('monitor.tasks.handle_alert')
+@patch('monitor.tasks.probe_websites')
+def test_check_website_batch_shares_probe_between_spellings_of_a_url(mock_probe, mock_alert):
+    """
+    The case of the scheme and host, an empty path and the expected status,
+    which the probe does not use, don't split one request into two probes.
+    """
+    user = User.objects.create(email="alice@gmail.com")
+    sites = [
+        Website.objects.create(user=user, url="HTTPS://Status.Example.com", expected_status=301),
+        Website.objects.create(user=user, url="https://status.example.com/"),
+    ]
+    mock_probe.side_effect = lambda websites: {
+        w.id: ProbeResult(status_code=200, response_time_ms=42) for w in websites
+    }
+
+    result = check_website_batch([site.id for site in sites])
+
+    assert "2 websites in batch with 1 probes" in result
+    with override_settings(CHECK_ENGINE="async"):
+        assert sites[0].schedule_offset_seconds == sites[1].schedule_offset_seconds
+
+
+@pytest.mark.django_db
+@patch('monitor.tasks.record_schedule_lag')
+@patch('monitor.tasks.probe_websites')
+def test_check_website_batch_records_schedule_lag(mock_probe, mock_lag):
+    """
+    Each check records how late it started against its slot, by interval.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    site = Website.objects.create(user=user, url="https://up.example.com", check_interval=15)
+    mock_probe.return_value = {site.id: ProbeResult(status_code=200, response_time_ms=42)}
+
+    check_website_batch([site.id], None, now().timestamp() - 30)
+
+    interval, queue, lag = mock_lag.call_args.args
+    assert interval == 900
+    assert queue
+    assert 30 <= lag < 40
+
+# ---------------------------------------------------
+# Claiming
+# ---------------------------------------------------
+
+
+@pytest.mark.django_db
+@override_settings(CHECK_ENGINE="legacy", CHECK_LEASE_SECONDS=300)
+@patch('monitor.tasks.check_single_website.apply_async')
+def test_check_due_websites_claims_each_slot_once(mock_apply):
+    """
+    A website still in the queue is not dispatched again by the next beat.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    site = Website.objects.create(user=user, url="https://a.example.com", next_check_at=now())
+
+    check_due_websites()
+    check_due_websites()
+
+    assert mock_apply.call_count == 1
+    site.refresh_from_db()
+    assert site.next_check_at > now()
+    assert site.lease_expires_at > now()
+    website_id, lease, scheduled_at = mock_apply.call_args.args[0]
+    assert website_id == site.id
+    assert parse_lease(lease) == site.lease_expires_at
+    assert scheduled_at <= now().timestamp()
+
+
+@pytest.mark.django_db
+@override_settings(CHECK_ENGINE="legacy")
+@patch('monitor.tasks.check_single_website.apply_async')
+def test_check_due_websites_reclaims_expired_lease(mock_apply):
+    """
+    A check whose lease expired without a result is queued again at once,
+    even though its next slot is still ahead.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    next_slot = now() + timedelta(minutes=4)
+    site = Website.objects.create(
+        user=user,
+        url="https://a.example.com",
+        next_check_at=next_slot,
+        lease_expires_at=now() - timedelta(seconds=1),
+    )
+
+    check_due_websites()
+
+    assert mock_apply.call_args.args[0][0] == site.id
+    assert mock_apply.call_args.kwargs["countdown"] == 0
+    site.refresh_from_db()
+    assert site.next_check_at == next_slot
+    assert site.lease_expires_at > now()
+
+# ---------------------------------------------------
+# Dispatch
+# ---------------------------------------------------
+
+
+@pytest.mark.django_db
+@override_settings(CHECK_ENGINE="async", CHECK_BATCH_SIZE=2)
+@patch('monitor.tasks.check_website_batch.apply_async')
+def test_check_due_websites_queues_batches(mock_apply):
+    """
+    With the async engine, due websites are queued in batches of CHECK_BATCH_SIZE.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    due_at = now() - timedelta(minutes=1)
+    for i in range(5):
+        Website.objects.create(user=user, url=f"https://{i}.example.com", next_check_at=due_at)
+
+    result = check_due_websites()
+
+    batches = [call.args[0][0] for call in mock_apply.call_args_list]
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert "Queued 5 websites" in result
+
+
+@pytest.mark.django_db
+@override_settings(CHECK_ENGINE="async", CHECK_BATCH_SIZE=1)
+@patch('monitor.tasks.check_website_batch.apply_async')
+def test_check_due_websites_keeps_same_url_in_one_batch(mock_apply):
+    """
+    Batches are sized by distinct URLs, so monitors of one URL share a batch.
+    """
+    due_at = now() - timedelta(minutes=1)
+    for i in range(3):
+        user = User.objects.create(email=f"tester{i}@gmail.com")
+        Website.objects.create(user=user, url="https://status.example.com", next_check_at=due_at)
+    Website.objects.create(user=user, url="https://other.example.com", next_check_at=due_at)
+
+    check_due_websites()
+
+    batches = [call.args[0][0] for call in mock_apply.call_args_list]
+    assert sorted(len(batch) for batch in batches) == [1, 3]
+
+
+@pytest.mark.django_db
+@override_settings(CHECK_ENGINE="legacy", CHECK_DISPATCH_LOOKAHEAD_SECONDS=60)
+@patch('monitor.tasks.check_single_website.apply_async')
+def test_check_due_websites_counts_down_to_each_slot(mock_apply):
+    """
+    Websites due within the lookahead are queued with a countdown to their slot.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    overdue = Website.objects.create(user=user, url="https://a.example.com", next_check_at=now())
+    upcoming = Website.objects.create(
+        user=user, url="https://b.example.com", next_check_at=now() + timedelta(seconds=30)
+    )
+    Website.objects.create(
+        user=user, url="https://c.example.com", next_check_at=now() + timedelta(minutes=5)
+    )
+
+    check_due_websites()
+
+    countdowns = {call.args[0][0]: call.kwargs["countdown"] for call in mock_apply.call_args_list}
+    assert set(countdowns) == {overdue.id, upcoming.id}
+    assert countdowns[overdue.id] == 0
+    assert 25 < countdowns[upcoming.id] <= 30
+
+# ---------------------------------------------------
+# Chunked dispatch
+# ---------------------------------------------------
+
+
+@pytest.mark.django_db
+@override_settings(CHECK_ENGINE="legacy", CHECK_DISPATCH_MODE="chunked", CHECK_DISPATCH_CHUNK_SIZE=2)
+@patch('monitor.tasks.check_single_website.apply_async')
+@patch('monitor.tasks.queue_website_checks.apply_async')
+def test_check_due_websites_chunked_dispatch(mock_chunk, mock_single):
+    """
+    Chunked mode publishes one message per chunk; workers fan them out.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    for i in range(5):
+        Website.objects.create(user=user, url=f"https://{i}.example.com", next_check_at=now())
+
+    result = check_due_websites()
+
+    chunks = [call.args[0][0] for call in mock_chunk.call_args_list]
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert "Queued 5 websites for checking in 3 messages" in result
+    mock_single.assert_not_called()
+
+    queue_website_checks(chunks[0])
+    assert mock_single.call_count == 2
+    assert mock_single.call_args.kwargs["countdown"] == 0
+
+
+@pytest.mark.django_db
+@override_settings(CHECK_DISPATCH_MODE="chunked", CHECK_DISPATCH_CHUNK_SIZE=2)
+@patch('monitor.tasks.handle_alert')
+@patch('monitor.tasks.check_heartbeat_chunk.apply_async')
+def test_check_due_heartbeats_chunked_dispatch(mock_chunk, mock_alert):
+    """
+    Due heartbeats go out in chunks, and each chunk marks its heartbeats down.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    for i in range(3):
+        HeartBeat.objects.create(
+            user=user,
+            name=f"job-{i}",
+            interval=60,
+            last_ping=now() - timedelta(minutes=10),
+            next_due=now() - timedelta(minutes=5),
+        )
+
+    result = check_due_heartbeats()
+
+    chunks = [call.args[0][0] for call in mock_chunk.call_args_list]
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    assert "Queued 3 heartbeats for checking in 2 messages" in result
+
+    check_heartbeat_chunk(chunks[0])
+    assert HeartBeat.objects.filter(status="down").count() == 2
+    assert mock_alert.call_count == 2
+
+# ---------------------------------------------------
+# Schedule rebalancing
+# ---------------------------------------------------
+
+
+@pytest.mark.django_db
+def test_rebalance_check_schedule_moves_minute_aligned_checks():
+    """
+    Checks aligned to the minute move onto each website's offset slot
+    without waiting longer than one interval.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    aligned = now().replace(second=0, microsecond=0) + timedelta(minutes=1)
+    sites = [
+        Website.objects.create(
+            user=user, url=f"https://{i}.example.com", check_interval=5, next_check_at=aligned
+        )
+        for i in range(10)
+    ]
+
+    call_command("rebalance_check_schedule", stdout=StringIO())
+
+    for site in sites:
+        previous = site.next_check_at
+        site.refresh_from_db()
+        assert site.next_check_at <= previous
+        assert int(site.next_check_at.timestamp()) % 300 == site.schedule_offset_seconds
+
+# ---------------------------------------------------
+# Benchmark
+# ---------------------------------------------------
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("engine", ["legacy", "async"])
+def test_benchmark_checks_reports_against_fake_targets(engine):
+    """
+    An eager benchmark run checks every seeded website once, reports its
+    figures and removes what it seeded.
+    """
+    out = StringIO()
+
+    call_command(
+        "benchmark_checks", "--websites", "6", "--mix", "ok=2,error=1",
+        "--engine", engine, "--eager", "--timeout-ms", "1000", stdout=out
+    )
+
+    report = out.getvalue()
+    assert f"Checked 6 websites ({engine} engine, eager)" in report
+    assert "DB queries per check" in report
+    assert "error 0 up / 2 down, ok 4 up / 0 down" in report
+    assert not Website.objects.exists()
+
+
+@pytest.mark.django_db
+def test_benchmark_checks_refuses_a_database_with_real_websites():
+    """
+    The benchmark won't run where it would check customers' websites.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    Website.objects.create(user=user, url="https://example.com")
+
+    with pytest.raises(CommandError):
+        call_command("benchmark_checks", "--eager", stdout=StringIO())
+
+# ---------------------------------------------------
+# Backlog
+# ---------------------------------------------------
+
+
+@pytest.mark.django_db
+def test_check_backlog_buckets_overdue_checks_by_state():
+    """
+    Unclaimed, queued and lost checks are counted by how overdue their slot is.
+    """
+    user = User.objects.create(email="tester@gmail.com")
+    current_time = now()
+    Website.objects.create(  # unclaimed, 2 minutes late
+        user=user, url="https://a.example.com", check_interval=5,
+        next_check_at=current_time - timedelta(minutes=2)
+    )
+    Website.objects.create(  # queued 20 minutes ago for a slot not run yet
+        user=user, url="https://b.example.com", check_interval=60,
+        next_check_at=current_time + timedelta(minutes=40),
+        lease_expires_at=current_time + timedelta(minutes=1)
+    )
+    Website.objects.create(  # on time
+        user=user, url="https://c.example.com", next_check_at=current_time + timedelta(minutes=1)
+    )
+
+    out = StringIO()
+    call_command("check_backlog", stdout=out)
+
+    rows = {line.split()[0]: line.split()[1:] for line in out.getvalue().splitlines()[2:]}
+    assert rows["1-5m"] == ["1", "0", "0"]
+    assert rows["15-60m"] == ["0", "1", "0"]
+    assert rows["total"] == ["1", "1", "0"]
@@ -1,35 +1,434 @@
+from dataclasses import dataclass, field
+from typing import Optional
+from datetime import datetime, timedelta
 from django.utils import timezone
+from django.db import transaction
+from django.db.models import Q
 import requests
+import urllib3
+import os
+import re
+import socket
+import ssl
 import time
-from .models import Website, HeartBeat
+from collections import Counter
+from .models import Website, HeartBeat, CHECK_INTERVAL_CHOICES
+from .http_pool import get_session
+from .sharding import in_shards
+from .cert_cache import cert_target, certificate_expiry, remember_certificate
 
 
-def get_due_websites():
-    """Return a queryset of active websites that are due for a check."""
-    now = timezone.now()
+@dataclass
+class ProbeResult:
+    """Outcome of a single website probe, shared by both check engines."""
+    status_code: int  # 0 = failed to connect
+    response_time_ms: float
+    error_message: str = ""
+    connection_reused: Optional[bool] = None  # None = no response received
+    ip: Optional[str] = None  # address actually connected to
+    # {phase: ms} for dns, connect, tls, ttfb, download (None = phase not run)
+    timings: dict = field(default_factory=dict)
+    cert_expires_at: Optional[datetime] = None  # new TLS connections only
+
+    @property
+    def failure_reason(self):
+        """Short failure label for metrics, or None if the check passed."""
+        if self.status_code == 200:
+            # A 200 can still fail its content assertion
+            return "content_mismatch" if self.error_message else None
+        if self.status_code:
+            return f"http_{self.status_code}"
+        if "timed out" in self.error_message.lower():
+            return "timeout"
+        return "connection_error"
+
+
+# "<urllib3.connection.HTTPConnection object at 0x7f...>: " prefixes
+OBJECT_REPR = re.compile(r"<[^<>]* object at 0x[0-9a-fA-F]+>:?\s*")
+
+
+def root_cause(exc):
+    """The innermost exception `exc` wraps (requests/urllib3 reasons, then causes)."""
+    seen = {id(exc)}
+    while True:
+        inner = next((
+            candidate for candidate in (
+                getattr(exc, "reason", None),
+                exc.args[0] if exc.args else None,
+                exc.__cause__,
+                exc.__context__,
+            )
+            if isinstance(candidate, BaseException) and id(candidate) not in seen
+        ), None)
+        if inner is None:
+            return exc
+        seen.add(id(inner))
+        exc = inner
+
+
+def failure_message(exc):
+    """
+    Error message for a check that failed with `exc`: its class and root
+    reason, e.g. "ConnectionError: [Errno 111] Connection refused". The same
+    failure always reads the same, without object addresses or retry
+    counts, so repeats share one ErrorMessage row.
+    """
+    root = root_cause(exc)
+    if isinstance(root, OSError) and root.errno is not None and not isinstance(root, ssl.SSLError):
+        # getaddrinfo errors are negative and only described by strerror
+        text = root.strerror if isinstance(root, socket.gaierror) else os.strerror(root.errno)
+        reason = f"[Errno {root.errno}] {text}"
+    else:
+        reason = OBJECT_REPR.sub("", str(root))
+    return f"{type(exc).__name__}: {reason}" if reason else type(exc).__name__
+
+
+def get_due_websites(lookahead_seconds=0):
+    """
+    Return a queryset of active websites due for a check, soonest first.
+    `lookahead_seconds` also includes websites due within that window, so
+    they can be queued ahead with a countdown to their own slot.
+    """
+    due_by = timezone.now() + timedelta(seconds=lookahead_seconds)
     return Website.objects.filter(
         is_active=True,
-        next_check_at__lte=now
-    ).only('id', 'url', 'check_interval')
+        next_check_at__lte=due_by
+    ).order_by('next_check_at').only(
+        'id', 'url', 'check_interval', 'check_interval_seconds', 'next_check_at'
+    )
+
+
+# (upper bound in seconds, label) of the overdue backlog's buckets
+OVERDUE_BUCKETS = [
+    (60, "< 1m"),
+    (300, "1-5m"),
+    (900, "5-15m"),
+    (3600, "15-60m"),
+    (None, "> 1h"),
+]
+
+# States of an overdue check, see overdue_backlog
+OVERDUE_STATES = ["due", "queued", "lost"]
+
+
+def overdue_bucket(seconds):
+    """Label of the OVERDUE_BUCKETS bucket `seconds` falls into."""
+    for limit, label in OVERDUE_BUCKETS:
+        if limit is None or seconds < limit:
+            return label
+
+
+def overdue_backlog(current_time=None):
+    """
+    Count active websites whose check slot has passed without a result, by
+    (state, interval in seconds, overdue bucket). States:
+
+    - "due": not claimed yet, the dispatcher is behind,
+    - "queued": claimed and queued but not run yet, the workers are behind,
+    - "lost": claimed, but the lease expired without a result.
+
+    Claiming moves next_check_at one interval on, so a claimed website's
+    slot is taken to be next_check_at minus its interval.
+    """
+    current_time = current_time or timezone.now()
+    longest_interval = max(minutes for minutes, _ in CHECK_INTERVAL_CHOICES) * 60
+    rows = Website.objects.filter(
+        is_active=True,
+        next_check_at__lte=current_time + timedelta(seconds=longest_interval),
+    ).values_list('next_check_at', 'lease_expires_at', 'check_interval', 'check_interval_seconds')
+
+    backlog = Counter()
+    for next_check_at, lease_expires_at, minutes, seconds in rows.iterator():
+        interval = seconds or minutes * 60
+        if lease_expires_at is None:
+            state, slot = "due", next_check_at
+        else:
+            state = "queued" if lease_expires_at > current_time else "lost"
+            slot = next_check_at - timedelta(seconds=interval)
+        overdue = (current_time - slot).total_seconds()
+        if overdue > 0:
+            backlog[state, interval, overdue_bucket(overdue)] += 1
+    return backlog
+
+
+@dataclass
+class CheckClaim:
+    """A website claimed by the dispatcher, and when its check should run."""
+    website: Website
+    run_at: datetime
+    reclaimed: bool = False  # an earlier lease expired without a result
+
+
+def claim_due_websites(due_by, lease_until, limit=1000, shards=None):
+    """
+    Atomically claim up to `limit` active websites due by `due_by`, plus
+    any whose lease has expired, and lease them until `lease_until`.
+    `shards` restricts the claim to this scheduler's shards (None = all).
+
+    Claiming advances next_check_at past the claimed slot, so no other
+    dispatcher run (or later beat) can queue the same check again. Rows
+    locked by a concurrent claim are skipped. A lease is released when the
+    result is recorded; if the check is lost, it is reclaimed once the
+    lease expires and queued to run right away.
+
+    Returns CheckClaims ordered by run_at, then URL (so monitors of the
+    same URL end up next to each other and can share a probe).
+    """
+    current_time = timezone.now()
+    due = Q(lease_expires_at__isnull=True, next_check_at__lte=due_by)
+    lease_expired = Q(lease_expires_at__lt=current_time)
+    claimable = in_shards(Website.objects.filter(is_active=True), shards).filter(
+        due | lease_expired
+    )
+    with transaction.atomic():
+        websites = list(
+            claimable.select_for_update(skip_locked=True).order_by('next_check_at').only(
+                'id', 'url', 'check_interval', 'check_interval_seconds',
+                'next_check_at', 'lease_expires_at'
+            )[:limit]
+        )
+
+        claims = [
+            _claim(website, current_time, due_by, lease_until) for website in websites
+        ]
+        Website.objects.bulk_update(websites, ['next_check_at', 'lease_expires_at'])
 
+    return sorted(claims, key=lambda claim: (claim.run_at, claim.website.url))
 
-def check_website_uptime(url: str, timeout=5):
-    """Check the uptime of a website by sending an HTTP GET request."""
+
+def claim_scheduled_websites(scheduled, due_by, lease_until):
+    """
+    Claim websites popped from the Redis schedule (see schedule_wheel).
+    `scheduled` maps website id -> scheduled run time. Returns CheckClaims
+    ordered by run_at, like claim_due_websites.
+    """
+    current_time = timezone.now()
+    with transaction.atomic():
+        websites = list(
+            Website.objects.select_for_update(skip_locked=True).filter(
+                pk__in=list(scheduled),
+                is_active=True,
+                next_check_at__isnull=False,
+            ).only(
+                'id', 'url', 'check_interval', 'check_interval_seconds',
+                'next_check_at', 'lease_expires_at'
+            )
+        )
+        claims = [
+            _claim(website, current_time, due_by, lease_until, scheduled[website.id])
+            for website in websites
+        ]
+        Website.objects.bulk_update(websites, ['next_check_at', 'lease_expires_at'])
+
+    return sorted(claims, key=lambda claim: (claim.run_at, claim.website.url))
+
+
+def _claim(website, current_time, due_by, lease_until, run_at=None):
+    """Advance a locked website past its due slot and lease it."""
+    reclaimed = website.lease_expires_at is not None
+    if run_at is None:
+        run_at = current_time if reclaimed else website.next_check_at
+    if website.next_check_at <= due_by:
+        # A check started ahead of its slot still serves that slot
+        served_slot = max(current_time, website.next_check_at)
+        website.next_check_at = website.next_check_after(served_slot)
+    website.lease_expires_at = lease_until
+    return CheckClaim(website, run_at, reclaimed)
+
+
+def parse_lease(lease):
+    """Lease token (ISO timestamp) passed to check tasks -> datetime."""
+    return datetime.fromisoformat(lease) if lease is not None else None
+
+
+def get_leased_websites(website_ids, lease):
+    """
+    Active websites from `website_ids` still held by `lease`.
+    Websites whose lease was reclaimed by a later dispatch are left out.
+    Without a lease (tasks queued before leases existed) all active ones count.
+    """
+    websites = Website.objects.filter(pk__in=website_ids, is_active=True)
+    if lease is not None:
+        websites = websites.filter(lease_expires_at=parse_lease(lease))
+    return list(websites)
+
+
+def _peer_ip(response):
+    """IP address a streamed response is being read from."""
+    connection = getattr(response.raw, "connection", None)
+    sock = getattr(connection, "sock", None)
+    if sock is None:
+        return None
+    try:
+        return sock.getpeername()[0]
+    except OSError:
+        return None
+
+
+def _note_certificate(url, response):
+    """
+    Cache the certificate of the new TLS connection a streamed response came
+    over. Returns its expiry if it is `url`'s own certificate (not that of a
+    host it redirected to).
+    """
+    target = cert_target(response.url)
+    connection = getattr(response.raw, "connection", None)
+    sock = getattr(connection, "sock", None)
+    if target is None or not hasattr(sock, "getpeercert"):
+        return None
+    metadata = remember_certificate(target, sock)
+    return certificate_expiry(metadata) if target == cert_target(url) else None
+
+
+# Bodies are streamed in chunks of this size and never held whole
+BODY_CHUNK_BYTES = 16 * 1024
+
+
+class KeywordMatcher:
+    """
+    Evaluates a website's keyword assertion over a streamed body. Chunks are
+    scanned as they arrive and only the last len(keyword) - 1 bytes are kept,
+    so a keyword split across two chunks is still found.
+    """
+
+    def __init__(self, keyword, must_contain=True):
+        self.keyword = keyword
+        self.needle = keyword.encode()
+        self.must_contain = must_contain
+        self.found = False
+        self._tail = b""
+
+    @classmethod
+    def for_website(cls, website):
+        """The website's matcher, or None if it has no keyword check."""
+        if not website.keyword:
+            return None
+        return cls(website.keyword, website.keyword_assertion == "MUST_CONTAIN")
+
+    def feed(self, chunk):
+        """Scan the next chunk. Returns True once the outcome is decided."""
+        window = self._tail + chunk
+        if self.needle in window:
+            self.found = True
+            self._tail = b""
+            return True
+        keep = len(self.needle) - 1
+        self._tail = window[-keep:] if keep else b""
+        return False
+
+    @property
+    def error_message(self):
+        """Why the assertion failed, or "" if it passed."""
+        if self.found and not self.must_contain:
+            return f"Keyword '{self.keyword}' found in response body"
+        if not self.found and self.must_contain:
+            return f"Keyword '{self.keyword}' not found in response body"
+        return ""
+
+
+def read_body_capped(response, max_bytes, deadline, matcher=None):
+    """
+    Stream at most `max_bytes` of the response body, chunk by chunk, and
+    give up once `deadline` (a time.time() value) has passed. With a
+    `matcher`, reading stops as soon as it has decided.
+    Returns the number of bytes read.
+    """
+    read = 0
+    while read < max_bytes:
+        if time.time() > deadline:
+            raise requests.Timeout("Deadline passed while reading the body")
+        # read1 returns whatever has arrived instead of waiting for a full chunk
+        chunk = response.raw.read1(
+            min(BODY_CHUNK_BYTES, max_bytes - read), decode_content=True
+        )
+        if not chunk:
+            break
+        read += len(chunk)
+        if matcher is not None and matcher.feed(chunk):
+            break
+    return read
+
+
+def check_website_uptime(url: str, timeout_ms=5000, request_method="GET_CAPPED",
+                         max_body_bytes=64 * 1024, matcher=None):
+    """
+    Check the uptime of a website over this worker's pooled keep-alive session.
+
+    `request_method` is HEAD, GET (headers only, the body is never read) or
+    GET_CAPPED (read at most `max_body_bytes` of the body). The whole check,
+    body included, must finish within `timeout_ms`. A KeywordMatcher is fed
+    the body as it is read and its failure becomes the error message.
+    """
     start = time.time()
+    deadline = start + timeout_ms / 1000
+    error_message = ""
+    connection_reused = None
+    ip = None
+    timings = {}
+    cert_expires_at = None
     try:
-        response = requests.get(url, timeout=timeout)
-        status_code = response.status_code
-    except requests.RequestException:
+        response = get_session().request(
+            "HEAD" if request_method == "HEAD" else "GET",
+            url,
+            timeout=timeout_ms / 1000,
+            stream=True,
+        )
+        try:
+            status_code = response.status_code
+            connection_reused = getattr(response, "connection_reused", None)
+            ip = _peer_ip(response)
+            if connection_reused is False:
+                # Only a new connection has just been through a handshake
+                cert_expires_at = _note_certificate(url, response)
+            if request_method == "GET_CAPPED":
+                read_body_capped(response, max_body_bytes, deadline, matcher)
+        finally:
+            # Releases the connection if the body was read to the end,
+            # otherwise closes it rather than downloading the rest
+            response.close()
+
+        if time.time() > deadline:
+            raise requests.Timeout("Deadline passed")
+        if matcher is not None:
+            error_message = matcher.error_message
+
+        # requests only times up to the response headers, which includes any
+        # DNS/connect/TLS time on a new connection.
+        ttfb_ms = response.elapsed.total_seconds() * 1000
+        timings = {
+            "dns": None,
+            "connect": None,
+            "tls": None,
+            "ttfb": round(ttfb_ms),
+            "download": round(max((time.time() - start) * 1000 - ttfb_ms, 0)),
+        }
+    # Body reads go through urllib3, whose errors requests does not wrap
+    except (requests.Timeout, urllib3.exceptions.ReadTimeoutError):
         status_code = 0  # 0 = failed to connect
+        error_message = f"Timed out after {timeout_ms}ms"
+    except (requests.RequestException, urllib3.exceptions.HTTPError) as e:
+        status_code = 0
+        error_message = failure_message(e)
 
     elapsed_ms = (time.time() - start) * 1000
-    return status_code, round(elapsed_ms, 2)
+    return ProbeResult(
+        status_code=status_code,
+        response_time_ms=round(elapsed_ms, 2),
+        error_message=error_message,
+        connection_reused=connection_reused,
+        ip=ip,
+        timings=timings,
+        cert_expires_at=cert_expires_at,
+    )
 
 
-def get_due_heartbeats():
-    """Return heartbeats that are past their next_due timestamp."""
+def get_due_heartbeats(shards=None):
+    """
+    Return heartbeats that are past their next_due timestamp,
+    optionally only those in the given scheduler shards.
+    """
     now = timezone.now()
-    return HeartBeat.objects.filter(
+    return in_shards(HeartBeat.objects.all(), shards).filter(
         is_active=True,
         last_ping__isnull=False,
         next_due__lte=now
@@ -23,6 +23,7 @@ from .models import (
     PingLog
 )
 from .tasks import process_ping
+from .rollups import PASSED_CHECK, check_series, series_resolution, total_of
 from .alerts import (
     send_welcome_email_task,
     send_contact_form_email_task
@@ -253,42 +254,66 @@ class WebsiteViewSet(viewsets.ModelViewSet):
             .first()
         )
 
-        # ✅ Calculate uptime for selected date range (not hardcoded 24h)
-        recent_checks = UptimeCheckResult.objects.filter(
-            website=website,
-            checked_at__gte=start_date,
-            checked_at__lte=end_date
-        )
-        
-        total_checks = recent_checks.count()
-        successful_checks = recent_checks.filter(
-            status_code__gte=200,
-            status_code__lt=300
-        ).count()
-        
+        # Short ranges chart every check, longer ones hourly / daily rollups
+        resolution = series_resolution(start_date, end_date)
+        response_time_data = []
+        if resolution == "raw":
+            # ✅ Calculate uptime for selected date range (not hardcoded 24h)
+            recent_checks = UptimeCheckResult.objects.filter(
+                website=website,
+                checked_at__gte=start_date,
+                checked_at__lte=end_date
+            )
+
+            total_checks = recent_checks.count()
+            successful_checks = recent_checks.filter(PASSED_CHECK).count()
+
+            # ✅ Response time chart - filtered by date range
+            for check in recent_checks.order_by('checked_at'):
+                response_time_data.append({
+                    "time": check.checked_at.isoformat(),
+                    "response_time": round(check.response_time_ms, 2),
+                    "status_code": check.status_code,
+                })
+        else:
+            buckets = check_series(start_date, end_date, resolution, website=website)
+            totals = total_of(buckets.values())
+            total_checks = totals.checks
+            successful_checks = totals.successes
+
+            for bucket_start, bucket in buckets.items():
+                response_time_data.append({
+                    "time": bucket_start.isoformat(),
+                    "response_time": round(bucket.avg_ms, 2),
+                    "min": round(bucket.min_ms, 2),
+                    "max": round(bucket.max_ms, 2),
+                    "p95": round(bucket.percentile(95), 2),
+                    "checks": bucket.checks,
+                    "uptime": round(bucket.uptime_percentage, 2),
+                })
+
         uptime_percentage = (
-            (successful_checks / total_checks * 100) 
+            (successful_checks / total_checks * 100)
             if total_checks > 0 else 0
         )
 
-        # ✅ Response time chart - filtered by date range
-        response_time_data = []
-        for check in recent_checks.order_by('checked_at'):
-            response_time_data.append({
-                "time": check.checked_at.isoformat(),
-                "response_time": round(check.response_time_ms, 2),
-                "status_code": check.status_code,
-            })
-
         # Recent check history (last 20, regardless of date range)
         recent_history = []
-        for check in UptimeCheckResult.objects.filter(website=website).order_by('-checked_at')[:20]:
+        for check in UptimeCheckResult.objects.filter(website=website).select_related('error').order_by('-checked_at')[:20]:
             recent_history.append({
                 "checked_at": check.checked_at,
                 "status_code": check.status_code,
                 "response_time": round(check.response_time_ms, 2),
                 "error_message": check.error_message,
                 "ip": check.ip,
+                "connection_reused": check.connection_reused,
+                "timings": {
+                    "dns": check.dns_ms,
+                    "connect": check.connect_ms,
+                    "tls": check.tls_ms,
+                    "ttfb": check.ttfb_ms,
+                    "download": check.download_ms,
+                },
             })
 
         # Get notification preferences
@@ -319,6 +344,7 @@ class WebsiteViewSet(viewsets.ModelViewSet):
             "total_checks_24h": total_checks,  # Actually for selected range
             "successful_checks_24h": successful_checks,  # Actually for selected range
             "response_time_chart": response_time_data,
+            "resolution": resolution,
             "recent_history": recent_history,
             "notifications": notification_list,
             "date_range": {  # ✅ Return the date range used
@@ -645,22 +671,32 @@ class DashboardMetricsView(APIView):
             })
 
         # Response Time Chart Data - FILTERED BY DATE RANGE
-        response_time_checks = (
-            UptimeCheckResult.objects.filter(
-                website__user=user,
-                checked_at__gte=start_date,
-                checked_at__lte=end_date
+        resolution = series_resolution(start_date, end_date)
+        response_time_chart = []
+        if resolution == "raw":
+            response_time_checks = (
+                UptimeCheckResult.objects.filter(
+                    website__user=user,
+                    checked_at__gte=start_date,
+                    checked_at__lte=end_date
+                )
+                .values('checked_at', 'response_time_ms')
+                .order_by('checked_at')
             )
-            .values('checked_at', 'response_time_ms')
-            .order_by('checked_at')
-        )
 
-        response_time_chart = []
-        for check in response_time_checks:
-            response_time_chart.append({
-                "time": check['checked_at'].isoformat(),
-                "response_time": round(check['response_time_ms'], 2)
-            })
+            for check in response_time_checks:
+                response_time_chart.append({
+                    "time": check['checked_at'].isoformat(),
+                    "response_time": round(check['response_time_ms'], 2)
+                })
+        else:
+            # One point per hour / day: the average over all the user's websites
+            buckets = check_series(start_date, end_date, resolution, website__user=user)
+            for bucket_start, bucket in buckets.items():
+                response_time_chart.append({
+                    "time": bucket_start.isoformat(),
+                    "response_time": round(bucket.avg_ms, 2)
+                })
 
         # Recent Incidents - FILTERED BY DATE RANGE
         recent_incidents = []
@@ -671,7 +707,7 @@ class DashboardMetricsView(APIView):
                 checked_at__gte=start_date,
                 checked_at__lte=end_date
             )
-            .select_related('website')
+            .select_related('website', 'error')
             .order_by('-checked_at')[:10]
         )
 
@@ -693,6 +729,7 @@ class DashboardMetricsView(APIView):
             "recent_monitors": recent_monitors,
             "recent_heartbeats": recent_heartbeats_list,
             "response_time_chart": response_time_chart,
+            "resolution": resolution,
             "recent_incidents": recent_incidents,
             "date_range": {
                 "start_date": start_date.isoformat(),
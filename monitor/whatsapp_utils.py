@@ -141,6 +141,21 @@ def send_website_recovered_alert(to_number, website_name, website_url, downtime_
     )
 
 
+def send_certificate_expiry_alert(to_number, website_name, website_url, days_left, expires_at):
+    """Send TLS certificate expiry alert using template"""
+    return send_whatsapp_template(
+        to_number=to_number,
+        template_name="certificate_expiry",
+        parameters=[
+            website_name,
+            website_url,
+            str(days_left),
+            expires_at,
+            "https://alivechecks.com/dashboard"
+        ]
+    )
+
+
 def send_heartbeat_missed_alert(to_number, heartbeat_name, expected_interval, last_ping, missed_at):
     """Send heartbeat missed alert using template"""
     return send_whatsapp_template(
@@ -24,8 +24,29 @@ app.conf.beat_schedule = {
         'task': 'monitor.tasks.check_due_heartbeats',
         'schedule': crontab(),  # every minute
     },
+    'flush-check-results': {
+        'task': 'monitor.tasks.flush_check_results',
+        'schedule': float(os.getenv('CHECK_RESULT_FLUSH_SECONDS', 2)),
+    },
+    'check-certificate-expiry-daily': {
+        'task': 'monitor.tasks.check_certificate_expiry',
+        'schedule': crontab(hour=6, minute=0),
+    },
+    'rollup-check-results': {
+        'task': 'monitor.tasks.rollup_check_results',
+        'schedule': crontab(minute='*/5'),
+    },
+    'maintain-log-partitions-daily': {
+        'task': 'monitor.tasks.maintain_log_partitions',
+        'schedule': crontab(hour=1, minute=0),
+    },
 }
 
+# run_scheduler nodes dispatch due websites and heartbeats themselves
+if os.getenv('CHECK_DISPATCHER', 'beat') == 'run_scheduler':
+    del app.conf.beat_schedule['check-due-websites-every-minute']
+    del app.conf.beat_schedule['check_heartbeats-every-minute']
+
 
 # =====================================================
 # CELERY BEAT SCHEDULE
@@ -329,6 +329,117 @@ else:
 # Redis Config for rate limiting
 REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 
+# Uptime check engine: "legacy" queues one task per website, "async" checks
+# batches of websites concurrently inside one event loop per task.
+CHECK_ENGINE = os.getenv('CHECK_ENGINE', 'legacy')
+CHECK_BATCH_SIZE = int(os.getenv('CHECK_BATCH_SIZE', 200))
+CHECK_BATCH_CONCURRENCY = int(os.getenv('CHECK_BATCH_CONCURRENCY', 100))
+
+# Each monitor checks at its own offset within its interval. The dispatcher
+# queues checks due within the lookahead with a countdown to their slot, and
+# async batches only group slots at most CHECK_BATCH_WINDOW_SECONDS apart.
+CHECK_DISPATCH_LOOKAHEAD_SECONDS = int(os.getenv('CHECK_DISPATCH_LOOKAHEAD_SECONDS', 60))
+CHECK_BATCH_WINDOW_SECONDS = int(os.getenv('CHECK_BATCH_WINDOW_SECONDS', 5))
+
+# Claimed checks are leased until their slot plus CHECK_LEASE_SECONDS; a check
+# that has not recorded a result by then is assumed lost and queued again.
+CHECK_LEASE_SECONDS = int(os.getenv('CHECK_LEASE_SECONDS', 300))
+
+# Where due websites come from: "database" scans next_check_at, "redis" pops
+# them from a sorted set (needed for 10s/30s intervals; run run_scheduler with a
+# short tick and lookahead).
+CHECK_SCHEDULER_BACKEND = os.getenv('CHECK_SCHEDULER_BACKEND', 'database')
+
+# Dispatchers publish every due monitor over one broker connection. "chunked"
+# sends one task per CHECK_DISPATCH_CHUNK_SIZE legacy websites / heartbeats.
+CHECK_DISPATCH_MODE = os.getenv('CHECK_DISPATCH_MODE', 'single')
+CHECK_DISPATCH_CHUNK_SIZE = int(os.getenv('CHECK_DISPATCH_CHUNK_SIZE', 500))
+
+# Sharded scheduler (manage.py run_scheduler): nodes split SCHEDULER_SHARDS
+# shards between them through Redis leases renewed every tick. Heartbeats
+# have no claim, so they are dispatched every SCHEDULER_HEARTBEAT_SECONDS.
+# With CHECK_DISPATCHER="run_scheduler" celery beat leaves the check-due
+# dispatching to the scheduler nodes ("beat" keeps the per-minute entries).
+CHECK_DISPATCHER = os.getenv('CHECK_DISPATCHER', 'beat')
+SCHEDULER_SHARDS = int(os.getenv('SCHEDULER_SHARDS', 64))
+SCHEDULER_NODE_ID = os.getenv('SCHEDULER_NODE_ID', '')
+SCHEDULER_TICK_SECONDS = int(os.getenv('SCHEDULER_TICK_SECONDS', 10))
+SCHEDULER_HEARTBEAT_SECONDS = int(os.getenv('SCHEDULER_HEARTBEAT_SECONDS', 60))
+SCHEDULER_LEASE_SECONDS = int(os.getenv('SCHEDULER_LEASE_SECONDS', 30))
+SCHEDULER_WHEEL_TICK_SECONDS = float(os.getenv('SCHEDULER_WHEEL_TICK_SECONDS', 1))
+
+# Per-host politeness budget shared by all workers through Redis (0 = off).
+# Checks wait up to CHECK_HOST_MAX_WAIT_SECONDS for a slot, then run anyway.
+CHECK_HOST_MAX_CONCURRENCY = int(os.getenv('CHECK_HOST_MAX_CONCURRENCY', 4))
+CHECK_HOST_MAX_RPS = int(os.getenv('CHECK_HOST_MAX_RPS', 5))
+CHECK_HOST_MAX_WAIT_SECONDS = float(os.getenv('CHECK_HOST_MAX_WAIT_SECONDS', 2))
+CHECK_HOST_SLOT_TTL_SECONDS = int(os.getenv('CHECK_HOST_SLOT_TTL_SECONDS', 60))
+
+# Buffer check results in Redis and write them in bulk ('none' or 'redis').
+# Flushed every CHECK_RESULT_FLUSH_SECONDS or once CHECK_RESULT_FLUSH_SIZE are waiting.
+CHECK_RESULT_BUFFER = os.getenv('CHECK_RESULT_BUFFER', 'none')
+CHECK_RESULT_FLUSH_SIZE = int(os.getenv('CHECK_RESULT_FLUSH_SIZE', 500))
+CHECK_RESULT_FLUSH_SECONDS = float(os.getenv('CHECK_RESULT_FLUSH_SECONDS', 2))
+
+# After a failed check, re-check up to CHECK_CONFIRM_RECHECKS times (0 = off),
+# CHECK_CONFIRM_DELAY_SECONDS apart, instead of waiting whole intervals to reach
+# failure_threshold. Set CHECK_CONFIRM_QUEUE to run re-checks on other workers
+# (e.g. another region).
+CHECK_CONFIRM_RECHECKS = int(os.getenv('CHECK_CONFIRM_RECHECKS', 2))
+CHECK_CONFIRM_DELAY_SECONDS = int(os.getenv('CHECK_CONFIRM_DELAY_SECONDS', 5))
+CHECK_CONFIRM_QUEUE = os.getenv('CHECK_CONFIRM_QUEUE', '')
+
+# TLS certificates seen on new connections are cached per host:port for
+# CHECK_CERT_CACHE_TTL_SECONDS and checked for expiry once a day.
+CHECK_CERT_CACHE_TTL_SECONDS = int(os.getenv('CHECK_CERT_CACHE_TTL_SECONDS', 2 * 24 * 3600))
+
+# Uptime and response-time series up to ROLLUP_RAW_MAX_HOURS long are read
+# from raw check results, up to ROLLUP_HOURLY_MAX_DAYS from hourly rollups and
+# longer ones from daily rollups. rollup_check_results folds new results in.
+ROLLUP_RAW_MAX_HOURS = int(os.getenv('ROLLUP_RAW_MAX_HOURS', 48))
+ROLLUP_HOURLY_MAX_DAYS = int(os.getenv('ROLLUP_HOURLY_MAX_DAYS', 31))
+ROLLUP_BATCH_SIZE = int(os.getenv('ROLLUP_BATCH_SIZE', 20000))
+
+# Once converted by manage.py partition_logs (PostgreSQL), check results and
+# ping logs are partitioned by day or week and expire by dropping partitions.
+# maintain_log_partitions keeps LOG_PARTITIONS_AHEAD partitions ready.
+LOG_PARTITION_INTERVAL = os.getenv('LOG_PARTITION_INTERVAL', 'day')
+LOG_PARTITIONS_AHEAD = int(os.getenv('LOG_PARTITIONS_AHEAD', 7))
+
+# cleanup_old_logs expires ping logs and resolved alerts too (0 = keep). Rows
+# are deleted RETENTION_CHUNK_SIZE at a time, RETENTION_PAUSE_SECONDS apart,
+# for at most RETENTION_MAX_SECONDS per run; the next run resumes.
+PING_LOG_RETENTION_DAYS = int(os.getenv('PING_LOG_RETENTION_DAYS', 90))
+ALERT_RETENTION_DAYS = int(os.getenv('ALERT_RETENTION_DAYS', 180))
+RETENTION_CHUNK_SIZE = int(os.getenv('RETENTION_CHUNK_SIZE', 5000))
+RETENTION_PAUSE_SECONDS = float(os.getenv('RETENTION_PAUSE_SECONDS', 0.2))
+RETENTION_MAX_SECONDS = int(os.getenv('RETENTION_MAX_SECONDS', 900))
+
+# With ARCHIVE_EXPIRED_LOGS on, expired check results and ping logs are written
+# to Parquet (one file per website and day) before they are deleted. Files go
+# to the ARCHIVE_STORAGE backend: the local filesystem under ARCHIVE_ROOT, or
+# e.g. storages.backends.s3.S3Storage with ARCHIVE_STORAGE_BACKEND.
+ARCHIVE_EXPIRED_LOGS = os.getenv("ARCHIVE_EXPIRED_LOGS", default="False").lower() == "true"
+ARCHIVE_ROOT = os.getenv('ARCHIVE_ROOT', str(BASE_DIR / 'archive'))
+ARCHIVE_STORAGE = {
+    "BACKEND": os.getenv('ARCHIVE_STORAGE_BACKEND', 'django.core.files.storage.FileSystemStorage'),
+    "OPTIONS": {"location": ARCHIVE_ROOT},
+}
+
+# Worker-lifetime keep-alive connection pools used by both check engines
+CHECK_POOL_MAX_HOSTS = int(os.getenv('CHECK_POOL_MAX_HOSTS', 500))
+CHECK_POOL_MAX_PER_HOST = int(os.getenv('CHECK_POOL_MAX_PER_HOST', 4))
+CHECK_POOL_MAX_CONNECTIONS = int(os.getenv('CHECK_POOL_MAX_CONNECTIONS', 500))
+CHECK_POOL_KEEPALIVE_SECONDS = int(os.getenv('CHECK_POOL_KEEPALIVE_SECONDS', 75))
+CHECK_POOL_MAX_AGE_SECONDS = int(os.getenv('CHECK_POOL_MAX_AGE_SECONDS', 3600))
+
+# Per-worker DNS cache for the async check engine (TTLs in seconds)
+CHECK_DNS_CACHE_MAX_ENTRIES = int(os.getenv('CHECK_DNS_CACHE_MAX_ENTRIES', 10000))
+CHECK_DNS_MIN_TTL = int(os.getenv('CHECK_DNS_MIN_TTL', 5))
+CHECK_DNS_MAX_TTL = int(os.getenv('CHECK_DNS_MAX_TTL', 3600))
+CHECK_DNS_NEGATIVE_TTL = int(os.getenv('CHECK_DNS_NEGATIVE_TTL', 60))
+CHECK_DNS_TIMEOUT_SECONDS = int(os.getenv('CHECK_DNS_TIMEOUT_SECONDS', 5))
+
 # Frontend URL
 FRONTEND_BASE_URL = os.getenv('FRONTEND_BASE_URL', 'http://localhost:3000')
 
@@ -357,6 +468,22 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'monitor.tasks.check_due_heartbeats',
         'schedule': crontab(),
     },
+    'flush-check-results': {
+        'task': 'monitor.tasks.flush_check_results',
+        'schedule': CHECK_RESULT_FLUSH_SECONDS,
+    },
+    'check-certificate-expiry-daily': {
+        'task': 'monitor.tasks.check_certificate_expiry',
+        'schedule': crontab(hour=6, minute=0),
+    },
+    'rollup-check-results': {
+        'task': 'monitor.tasks.rollup_check_results',
+        'schedule': crontab(minute='*/5'),
+    },
+    'maintain-log-partitions-daily': {
+        'task': 'monitor.tasks.maintain_log_partitions',
+        'schedule': crontab(hour=1, minute=0),
+    },
 
     # Metrics collection
     'collect-business-metrics': {
@@ -380,3 +507,8 @@ CELERY_BEAT_SCHEDULE = {
         'schedule': crontab(minute='*/2'),
     },
 }
+
+# run_scheduler nodes dispatch due websites and heartbeats themselves
+if CHECK_DISPATCHER == 'run_scheduler':
+    del CELERY_BEAT_SCHEDULE['check-due-websites-every-minute']
+    del CELERY_BEAT_SCHEDULE['check-heartbeats-every-minute']